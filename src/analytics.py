@@ -0,0 +1,316 @@
+"""
+Receivables aging and days sales/payables outstanding, computed on NumPy arrays.
+
+aging_table buckets open invoices by days past due with one np.searchsorted
+and sums them per business with np.bincount. Its input comes from
+invoice_columns: for a ledger.Ledger the columns are slices of the ledger's own
+arrays, and for plain businesses they are read once from their open invoices.
+days_outstanding turns a series of balances and daily flows into DSO or DPO
+with a rolling window.
+
+AgingTracker is an events.EventSink that keeps all of this up to date during
+start_simulation. It keeps its own columns of open invoices, adding
+invoices and updating balances as the invoice_issued, payment_made and
+invoice_cleared events arrive, and records the network aging, DSO and DPO
+each day, plus DSO and DPO per business. Example:
+
+    tracker = AgingTracker(businesses, num_days, path='run.aging.npz')
+    start_simulation(businesses, num_days, verbose=False, sink=tracker)
+    tracker.aging(by='issuer')  # Receivables aging per business on the last day
+    tracker.dso                 # Network DSO on each day
+
+Days past due are counted from the due date, so with the default buckets the
+aging groups are 'current' (not yet due), '1-30', '31-60' and '60+'. The
+tracker needs invoice events, which the object and event engines send and the
+vectorized engine does not.
+"""
+import numpy as np
+
+from events import EventSink
+import ledger as ledger_module
+from models import to_day
+
+DEFAULT_BUCKETS = (30, 60)
+COLUMNS = ('issuer', 'recipient', 'due_day', 'outstanding_balance')
+
+def bucket_labels(buckets=DEFAULT_BUCKETS):
+    """Names of the aging groups: 'current', one per bucket, and the open-ended last one."""
+    labels = ['current']
+    lower = 1
+    for upper in buckets:
+        labels.append(f"{lower}-{upper}")
+        lower = upper + 1
+    labels.append(f"{buckets[-1]}+")
+    return labels
+
+def invoice_columns(source):
+    """
+    Returns the open invoices of source as a dict of arrays: issuer and
+    recipient business ids, due_day (day ordinal) and outstanding_balance.
+
+    :param source: A ledger.Ledger, or a list of businesses whose open invoices are read.
+    """
+    if isinstance(source, ledger_module.Ledger):
+        invoices = source.invoices
+        status = invoices['status']
+        open_rows = (status == ledger_module.ISSUED) | (status == ledger_module.PARTIALLY_PAID)
+        return {
+            'issuer': invoices['issuer'][open_rows],
+            'recipient': invoices['recipient'][open_rows],
+            'due_day': invoices['due_day'][open_rows].astype(np.int64),
+            'outstanding_balance': invoices['outstanding_balance'][open_rows],
+        }
+    invoices = [invoice for business in source for invoice in business.open_invoices]
+    count = len(invoices)
+    return {
+        'issuer': np.fromiter((invoice.issuer.id for invoice in invoices), dtype=np.int64, count=count),
+        'recipient': np.fromiter((invoice.recipient.id for invoice in invoices), dtype=np.int64, count=count),
+        'due_day': np.fromiter((invoice.due_date for invoice in invoices), dtype=np.int64, count=count),
+        'outstanding_balance': np.fromiter((invoice.outstanding_balance for invoice in invoices), dtype=np.float64,
+                                           count=count),
+    }
+
+def bucket_index(days_past_due, buckets=DEFAULT_BUCKETS):
+    """Aging group of each invoice: 0 for current, then one per bucket, the last open-ended."""
+    days_past_due = np.asarray(days_past_due)
+    bucket = np.searchsorted(np.asarray(buckets), days_past_due, side='left') + 1
+    return np.where(days_past_due <= 0, 0, bucket)
+
+def aging_table(columns, as_of, by=None, buckets=DEFAULT_BUCKETS):
+    """
+    Ages open invoices as of a date.
+
+    :param columns: Arrays as returned by invoice_columns.
+    :param as_of: A date or a day ordinal.
+    :param by: None for the network, 'issuer' for each business's receivables or
+               'recipient' for each business's payables.
+    :return: dict with 'labels', 'business_id' (the groups' business ids, or None
+             for the network) and 'count' and 'balance' arrays of shape
+             (groups, len(labels)).
+    """
+    if by not in (None, 'issuer', 'recipient'):
+        raise ValueError(f"Invalid grouping: {by}")
+    as_of = to_day(as_of)
+    labels = bucket_labels(buckets)
+    bucket = bucket_index(as_of - columns['due_day'], buckets)
+    if by is None:
+        business_id, group = None, np.zeros(len(bucket), dtype=np.int64)
+    else:
+        business_id, group = np.unique(columns[by], return_inverse=True)
+    num_groups = 1 if business_id is None else len(business_id)
+    cell = group * len(labels) + bucket
+    size = num_groups * len(labels)
+    return {
+        'labels': labels,
+        'business_id': business_id,
+        'count': np.bincount(cell, minlength=size).reshape(num_groups, len(labels)),
+        'balance': np.bincount(cell, weights=columns['outstanding_balance'],
+                               minlength=size).reshape(num_groups, len(labels)),
+    }
+
+def days_outstanding(balance, flow, window=30):
+    """
+    Days outstanding on each day: balance divided by the average daily flow over
+    the last window days (fewer at the start). DSO is receivables over sales,
+    DPO payables over purchases. Days without any flow in the window are NaN.
+
+    :param balance: Array of end-of-day balances, days along the first axis.
+    :param flow: Array of daily flows with the same shape.
+    """
+    balance = np.asarray(balance, dtype=np.float64)
+    flow = np.asarray(flow, dtype=np.float64)
+    total = np.cumsum(flow, axis=0)
+    total[window:] -= total[:-window].copy()
+    days = np.minimum(np.arange(1, len(flow) + 1), window).reshape((-1,) + (1,) * (flow.ndim - 1))
+    daily = total / days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(daily > 0, balance / daily, np.nan)
+
+class AgingTracker(EventSink):
+    """
+    Keeps the aging of open invoices and DSO/DPO up to date during a run of
+    days first_day to num_days.
+
+    Every day it records, network-wide, the open balance and invoice count in
+    each aging group (aging_balance and aging_count, one row per day), the
+    invoiced amount (sales), total receivables and payables, and DSO and DPO.
+    With per_business=True it also records each business's DSO and DPO
+    (business_dso and business_dpo, days x businesses), from its balance sheet
+    and the invoices it sent and received over the last window days.
+
+    :param path: Where close() saves the arrays as .npz; None to keep them in memory only.
+    """
+
+    def __init__(self, businesses, num_days, first_day=1, buckets=DEFAULT_BUCKETS, window=30, per_business=True,
+                 path=None):
+        num_rows = num_days - first_day + 1
+        if num_rows <= 0:
+            raise ValueError("num_days must not be before first_day")
+        self.buckets = tuple(buckets)
+        self.labels = bucket_labels(self.buckets)
+        self.window = window
+        self.path = path
+        self.day = np.arange(first_day, num_days + 1)
+        self.business_id = np.array([business.id for business in businesses])
+        self._position = {id(business): i for i, business in enumerate(businesses)}
+        n = len(businesses)
+
+        self.aging_balance = np.zeros((num_rows, len(self.labels)))
+        self.aging_count = np.zeros((num_rows, len(self.labels)), dtype=np.int64)
+        self.sales = np.zeros(num_rows)
+        self.receivable = np.zeros(num_rows)
+        self.payable = np.zeros(num_rows)
+        self.dso = np.full(num_rows, np.nan)
+        self.dpo = np.full(num_rows, np.nan)
+        self.per_business = per_business
+        if per_business:
+            self.business_dso = np.full((num_rows, n), np.nan)
+            self.business_dpo = np.full((num_rows, n), np.nan)
+            # The last window days of sales and purchases per business, as ring buffers
+            self._sales_window = np.zeros((window, n))
+            self._purchases_window = np.zeros((window, n))
+
+        # Invoices seen and not yet dropped, one slot each in every column; slots whose balance has reached zero
+        # are dropped once they make up half the columns
+        self._columns = {name: np.zeros(1024, dtype=np.float64 if name in ('outstanding_balance', 'amount')
+                                        else np.int64) for name in COLUMNS + ('amount',)}
+        self._invoices = []  # Invoice in each slot
+        self._slots = {}  # invoice id -> slot, for the open invoices
+        self._size = 0
+        self._closed = 0  # Slots whose balance has reached zero
+        self._first_new = 0  # First slot issued today
+        self._failed = np.zeros(n, dtype=bool)  # Businesses already failed at the end of the last day
+        self._row = 0  # Row of the day in progress
+        self._as_of = None
+
+    def invoice_issued(self, simulation_day, invoice):
+        slot = self._size
+        if slot == len(self._columns['amount']):
+            self._columns = {name: np.concatenate((column, np.zeros_like(column)))
+                             for name, column in self._columns.items()}
+        columns = self._columns
+        columns['issuer'][slot] = self._position[id(invoice.issuer)]
+        columns['recipient'][slot] = self._position[id(invoice.recipient)]
+        columns['due_day'][slot] = invoice.due_date
+        columns['outstanding_balance'][slot] = invoice.amount
+        columns['amount'][slot] = invoice.amount
+        self._invoices.append(invoice)
+        self._slots[invoice.id] = slot
+        self._size += 1
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        for invoice in payment.invoices:
+            self._update_balance(invoice)
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        self._update_balance(invoice)
+
+    def _update_balance(self, invoice):
+        """Copies an invoice's outstanding balance into its slot; closes the slot once nothing is left."""
+        slot = self._slots.get(invoice.id)
+        if slot is None:
+            return
+        balance = invoice.outstanding_balance
+        self._columns['outstanding_balance'][slot] = balance
+        if balance <= 0:
+            del self._slots[invoice.id]
+            self._closed += 1
+
+    def _compact(self):
+        """Drops the closed slots."""
+        keep = np.flatnonzero(self._columns['outstanding_balance'][:self._size] > 0)
+        for column in self._columns.values():
+            column[:len(keep)] = column[keep]
+        self._invoices = [self._invoices[slot] for slot in keep.tolist()]
+        self._slots = {invoice.id: slot for slot, invoice in enumerate(self._invoices)}
+        self._size = len(keep)
+        self._closed = 0
+
+    def _open_columns(self):
+        """The COLUMNS of the open invoices."""
+        is_open = self._columns['outstanding_balance'][:self._size] > 0
+        return {name: self._columns[name][:self._size][is_open] for name in COLUMNS}
+
+    def end_of_day(self, day, simulation_day, businesses):
+        row = self._row
+        self._as_of = simulation_day
+        n = len(businesses)
+
+        # contagion.propagate_defaults writes down a failing business's invoices without sending events, so the
+        # balances of the invoices owed by businesses failed since yesterday are read again
+        failed = np.fromiter((business.failed for business in businesses), dtype=bool, count=n)
+        if (failed & ~self._failed).any():
+            owed = (failed & ~self._failed)[self._columns['recipient'][:self._size]]
+            for slot in np.flatnonzero(owed).tolist():
+                self._update_balance(self._invoices[slot])
+            self._failed = failed
+
+        new = slice(self._first_new, self._size)
+        issuer = self._columns['issuer'][new]
+        recipient = self._columns['recipient'][new]
+        amount = self._columns['amount'][new]
+        self.sales[row] = amount.sum()
+        if self.per_business:
+            slot = row % self.window
+            self._sales_window[slot] = np.bincount(issuer, weights=amount, minlength=n)
+            self._purchases_window[slot] = np.bincount(recipient, weights=amount, minlength=n)
+        if self._closed > self._size // 2:
+            self._compact()
+        self._first_new = self._size
+
+        columns = self._open_columns()
+        bucket = bucket_index(self._as_of - columns['due_day'], self.buckets)
+        self.aging_count[row] = np.bincount(bucket, minlength=len(self.labels))
+        self.aging_balance[row] = np.bincount(bucket, weights=columns['outstanding_balance'],
+                                              minlength=len(self.labels))
+
+        balance_sheets = [business.balance_sheet for business in businesses]
+        receivable = np.fromiter((sheet.accounts_receivable for sheet in balance_sheets), dtype=np.float64, count=n)
+        payable = np.fromiter((sheet.accounts_payable for sheet in balance_sheets), dtype=np.float64, count=n)
+        self.receivable[row] = receivable.sum()
+        self.payable[row] = payable.sum()
+        # Every sale is a purchase of another business, so network sales and purchases are equal
+        rows = slice(max(row + 1 - self.window, 0), row + 1)
+        self.dso[row] = days_outstanding(self.receivable[rows], self.sales[rows], self.window)[-1]
+        self.dpo[row] = days_outstanding(self.payable[rows], self.sales[rows], self.window)[-1]
+
+        if self.per_business:
+            days = min(row + 1, self.window)
+            daily_sales = self._sales_window.sum(axis=0) / days
+            daily_purchases = self._purchases_window.sum(axis=0) / days
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.business_dso[row] = np.where(daily_sales > 0, receivable / daily_sales, np.nan)
+                self.business_dpo[row] = np.where(daily_purchases > 0, payable / daily_purchases, np.nan)
+        self._row += 1
+
+    def aging(self, by=None):
+        """
+        The aging table of the open invoices at the end of the last recorded day,
+        as returned by aging_table. Groups are positions in the businesses
+        passed to the tracker, reported by business id.
+        """
+        if self._as_of is None:
+            raise ValueError("No day has been recorded yet")
+        table = aging_table(self._open_columns(), self._as_of, by=by, buckets=self.buckets)
+        if table['business_id'] is not None:
+            table['business_id'] = self.business_id[table['business_id']]
+        return table
+
+    def to_dict(self):
+        """All recorded arrays, trimmed to the days recorded so far."""
+        rows = self._row
+        arrays = {'day': self.day[:rows], 'business_id': self.business_id, 'labels': np.array(self.labels)}
+        names = ['aging_balance', 'aging_count', 'sales', 'receivable', 'payable', 'dso', 'dpo']
+        if self.per_business:
+            names += ['business_dso', 'business_dpo']
+        for name in names:
+            arrays[name] = getattr(self, name)[:rows]
+        return arrays
+
+    def save(self, path):
+        """Writes all recorded arrays to one .npz file."""
+        np.savez(path, **self.to_dict())
+
+    def close(self):
+        if self.path is not None:
+            self.save(self.path)
@@ -0,0 +1,389 @@
+"""
+Non-interactive entry point for scripted runs.
+
+Reads a JSON or TOML config file and/or command line flags, builds the businesses
+from AttributesMenu presets, connects them and runs start_simulation. Example:
+
+    python batch.py --config sweep.toml --seed 7 --quiet
+
+A config file looks like:
+
+    {
+        "businesses": 200,
+        "presets": {"A3": 3, "C2": 1},
+        "topology": {"kind": "dense", "max_customers": 20},
+        "days": 365,
+        "seed": 42
+    }
+
+"presets" is either a list of preset names assigned to businesses in turn, or a
+mapping of preset name to relative weight drawn at random. "topology" names one
+of TOPOLOGIES plus the keyword parameters of its generator in topology.py, e.g.
+{"kind": "scale_free", "edges_per_business": 3}. "events" takes the keyword
+arguments of events.FileEventSink, e.g. {"prefix": "out/run", "format": "csv"}.
+"checkpoint" takes the arguments of checkpoint.Checkpointer, e.g.
+{"path": "out/run-{day}.ckpt", "interval": 30}, and "resume" names a checkpoint
+file to continue from instead of building a new network; "days" is then the
+last day to run to. "clearing" takes the arguments of netting.ClearingHook,
+e.g. {"interval": 7}, to net the open invoices on a schedule; its totals are
+added to the printed summary. "contagion" likewise takes the arguments of
+contagion.ContagionHook, e.g. {"interval": 1, "credit_limit": 50000}, to fail
+the businesses that cannot pay their due invoices from their cash and unused
+credit and propagate their defaults; without its own "credit_limit" it uses
+the financing one. "financing" takes the arguments of financing.FinancingHook,
+e.g. {"credit_limit": 50000}, to fund cash shortfalls with credit lines and
+factoring (which cannot be combined with "checkpoint" or "resume"). "metrics"
+takes the keyword arguments of metrics.MetricsRecorder, e.g. {"path": "out/run.npz"},
+to save the daily balance sheets and network aggregates as arrays, "aging"
+the keyword arguments of analytics.AgingTracker, e.g. {"path": "out/aging.npz"},
+to save the receivables aging and DSO/DPO series, and
+"database" the keyword arguments of sqlstore.SQLiteSink, e.g.
+{"path": "out/run.db", "prune_interval": 30}, to keep the invoice and payment
+history in SQLite.
+"visualize" is true to draw the network in a window each day, or an output
+path such as "frames/day-{day:04d}.png" or "run.gif" to render it headless.
+"profile" takes {"path": ..., "memory": ...} to time the phases of every day with
+profiling.RunProfiler and save the breakdown to path (.json or .csv).
+"""
+import argparse
+import functools
+import json
+import random
+import sys
+
+from business_attributes import AttributesMenu
+from main import build_businesses, connect_businesses, start_simulation
+import topology
+
+DEFAULT_CONFIG = {
+    'businesses': 10,
+    'presets': ['A3'],
+    'topology': {'kind': 'dense'},
+    'days': 30,
+    'seed': None,
+    'engine': 'object',
+    'ledger': False,
+    'business_rng': False,
+    'events': None,
+    'metrics': None,
+    'aging': None,
+    'database': None,
+    'profile': None,
+    'checkpoint': None,
+    'clearing': None,
+    'contagion': None,
+    'financing': None,
+    'resume': None,
+    'quiet': False,
+    'visualize': False,
+}
+
+# Topology kind -> function(businesses, rng=..., **params) establishing customer relationships
+TOPOLOGIES = {
+    'dense': connect_businesses,
+    **{
+        kind: functools.partial(topology.connect_network, kind=kind)
+        for kind in topology.GENERATORS if kind != 'dense'
+    },
+}
+
+def load_config(path):
+    """Loads a run config from a .json or .toml file."""
+    if path.endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+def assign_presets(presets, num_businesses, rng=random):
+    """Expands a preset list or a {preset: weight} mapping into one preset name per business."""
+    if isinstance(presets, str):
+        presets = [presets]
+    if isinstance(presets, dict):
+        names = list(presets)
+        weights = [presets[name] for name in names]
+        assigned = rng.choices(names, weights=weights, k=num_businesses)
+    else:
+        names = list(presets)
+        if not names:
+            raise ValueError("presets must not be empty")
+        assigned = [names[i % len(names)] for i in range(num_businesses)]
+    for name in names:
+        if name not in AttributesMenu.presets:
+            raise ValueError(f"Unknown preset: {name}")
+    return assigned
+
+def build_network(config, rng=random):
+    """Builds and connects the businesses described by config."""
+    num_businesses = int(config['businesses'])
+    if num_businesses <= 0:
+        raise ValueError("Number of businesses must be a positive integer.")
+    ledger = None
+    if config.get('ledger'):
+        from ledger import Ledger
+        ledger = Ledger()
+    businesses = build_businesses(assign_presets(config['presets'], num_businesses, rng), ledger=ledger)
+
+    topology = dict(config.get('topology') or {})
+    kind = topology.pop('kind', 'dense')
+    if kind not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology: {kind}")
+    TOPOLOGIES[kind](businesses, rng=rng, **topology)
+    return businesses
+
+HOOK_KEYS = ('clearing', 'financing', 'contagion')
+
+def check_hooks(config):
+    """
+    Raises ValueError if the config's hooks cannot run as configured. They work
+    on the invoices the businesses hold, which the vectorized engine does not
+    fill, so they need the object or event engine. For the same reason a
+    vectorized run cannot be checkpointed or resumed: its open invoices would
+    not be saved. Financing with factoring cannot be checkpointed or resumed
+    either, since checkpoints do not hold the invoices sold to the factor.
+    """
+    vectorized = config.get('engine', 'object') == 'vectorized'
+    keys = [key for key in HOOK_KEYS if config.get(key)]
+    if keys and vectorized:
+        raise ValueError(f"{', '.join(keys)} needs the object or event engine, not the vectorized one")
+    if vectorized and (config.get('checkpoint') or config.get('resume')):
+        raise ValueError("vectorized runs cannot be checkpointed or resumed; use the object or event engine")
+    factoring = (config.get('financing') or {}).get('factoring_discount') is not None
+    if factoring and (config.get('checkpoint') or config.get('resume')):
+        raise ValueError("financing with factoring_discount cannot be checkpointed or resumed")
+
+def build_hooks(config, sink=None):
+    """
+    Builds the end-of-day hooks the config asks for (HOOK_KEYS), keyed by
+    config key in the order they run, after check_hooks.
+
+    :param sink: Optional events.EventSink receiving the hooks' events, e.g. invoice_cleared.
+    """
+    check_hooks(config)
+    hooks = {}
+    if config.get('clearing'):
+        from netting import ClearingHook
+        hooks['clearing'] = ClearingHook(sink=sink, **config['clearing'])
+    # Financing runs before contagion so that credit lines are drawn before solvency is assessed
+    if config.get('financing'):
+        from financing import FinancingHook
+        hooks['financing'] = FinancingHook(**config['financing'])
+    if config.get('contagion'):
+        from contagion import ContagionHook
+        contagion = dict(config['contagion'])
+        # Solvency counts the credit line the financing hook gives
+        if 'credit_limit' in (config.get('financing') or {}):
+            contagion.setdefault('credit_limit', config['financing']['credit_limit'])
+        hooks['contagion'] = ContagionHook(**contagion)
+    return hooks
+
+def run(config, rng=None, hooks=(), config_hooks=None, sink=None):
+    """
+    Runs one simulation from a complete config dict and returns the businesses.
+
+    Unless rng is given, the run draws from its own random.Random seeded with
+    config['seed'] rather than from the global random module. A run resumed
+    from config['resume'] continues the checkpoint's own random stream.
+
+    The hooks of build_hooks(config) run each day before hooks, sending their
+    events to the run's sinks. Pass an empty dict as config_hooks to receive
+    them, keyed by config key, and read their summaries after the run. sink is
+    an optional events.EventSink receiving the run's events alongside the sinks
+    of the config.
+    """
+    check_hooks(config)
+    start_date, first_day = None, 1
+    if config.get('resume'):
+        from checkpoint import load_checkpoint
+        saved = load_checkpoint(config['resume'])
+        businesses = saved.restore()
+        rng = rng or saved.rng()
+        start_date, first_day = saved.start_date, saved.day + 1
+    else:
+        if rng is None:
+            rng = random.Random(config.get('seed'))
+        businesses = build_network(config, rng)
+        if config.get('business_rng'):
+            from buffered_rng import seed_businesses
+            seed_businesses(businesses, config.get('seed'))
+
+    num_days = int(config['days'])
+    if num_days <= 0:
+        raise ValueError("The number of days must be a positive integer.")
+    if config.get('events'):
+        from events import FileEventSink, combine_sinks
+        sink = combine_sinks(sink, FileEventSink(**config['events']))
+    if config.get('metrics'):
+        from events import combine_sinks
+        from metrics import MetricsRecorder
+        sink = combine_sinks(sink, MetricsRecorder(businesses, num_days, first_day=first_day, **config['metrics']))
+    if config.get('aging'):
+        from analytics import AgingTracker
+        from events import combine_sinks
+        sink = combine_sinks(sink, AgingTracker(businesses, num_days, first_day=first_day, **config['aging']))
+    if config.get('database'):
+        from events import combine_sinks
+        from sqlstore import SQLiteSink
+        sink = combine_sinks(sink, SQLiteSink(**config['database']))
+    built = build_hooks(config, sink=sink)
+    if config_hooks is not None:
+        config_hooks.update(built)
+    hooks = (*built.values(), *hooks)
+    if config.get('checkpoint'):
+        from checkpoint import Checkpointer
+        hooks = (*hooks, Checkpointer(rng=rng, **config['checkpoint']))
+    profiler = None
+    if config.get('profile'):
+        from profiling import RunProfiler
+        profile = dict(config['profile'])
+        profile_path = profile.pop('path', None)
+        profiler = RunProfiler(**profile)
+    start_simulation(
+        businesses, num_days,
+        engine=config.get('engine', 'object'),
+        seed=config.get('seed'),
+        verbose=not config.get('quiet', False),
+        visualize=config.get('visualize', False),
+        rng=rng,
+        hooks=hooks,
+        sink=sink,
+        start_date=start_date,
+        first_day=first_day,
+        profiler=profiler,
+    )
+    if profiler is not None and profile_path:
+        profiler.save(profile_path)
+    return businesses
+
+def summarize(businesses):
+    """Network-wide balance-sheet totals."""
+    return {
+        'businesses': len(businesses),
+        'cash': sum(b.balance_sheet.cash for b in businesses),
+        'accounts_receivable': sum(b.balance_sheet.accounts_receivable for b in businesses),
+        'accounts_payable': sum(b.balance_sheet.accounts_payable for b in businesses),
+        'debt': sum(b.balance_sheet.debt for b in businesses),
+        'failed': sum(b.failed for b in businesses),
+    }
+
+def parse_preset_args(values):
+    """Parses ["A1", "C3"] into a list, or ["A1=2", "C3=1"] into a weight mapping."""
+    if all('=' in value for value in values):
+        return {name.upper(): float(weight) for name, weight in (value.split('=', 1) for value in values)}
+    return [value.upper() for value in values]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a credit network simulation without prompts.")
+    parser.add_argument('--config', help="JSON or TOML run config; flags override its values")
+    parser.add_argument('--businesses', type=int, help="number of businesses")
+    parser.add_argument('--presets', nargs='+', help="preset names (A1 C3) or weights (A1=2 C3=1)")
+    parser.add_argument('--topology', dest='topology_kind', choices=sorted(TOPOLOGIES), help="network topology")
+    parser.add_argument('--max-customers', type=int, help="cap on customers per business (dense topology)")
+    parser.add_argument('--topology-param', action='append', default=[], metavar='NAME=VALUE',
+                        help="topology generator parameter, e.g. mean_customers=5; repeatable")
+    parser.add_argument('--days', type=int, help="number of days to simulate")
+    parser.add_argument('--seed', type=int, help="random seed")
+    parser.add_argument('--engine', choices=['object', 'vectorized', 'event'], help="simulation engine")
+    parser.add_argument('--ledger', action='store_true', default=None,
+                        help="store invoices and payments in compact arrays")
+    parser.add_argument('--business-rng', action='store_true', default=None,
+                        help="give each business its own buffered NumPy random stream seeded from --seed")
+    parser.add_argument('--events', metavar='PREFIX', help="write events and snapshots to PREFIX.events.* files")
+    parser.add_argument('--events-format', choices=['csv', 'ndjson', 'parquet'], help="event file format")
+    parser.add_argument('--metrics', metavar='PATH', help="save the daily time series to PATH as .npz")
+    parser.add_argument('--aging', metavar='PATH', help="save the receivables aging and DSO/DPO series to PATH as .npz")
+    parser.add_argument('--database', metavar='PATH', help="record invoices and payments in the SQLite database PATH")
+    parser.add_argument('--prune-interval', type=int, metavar='DAYS',
+                        help="drop closed invoices from memory every DAYS days once they are in the database")
+    parser.add_argument('--profile', metavar='PATH', help="save a per-day, per-phase timing breakdown to PATH")
+    parser.add_argument('--profile-memory', action='store_true', help="also sample memory use with tracemalloc")
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help="save a checkpoint to PATH every --checkpoint-interval days; PATH may contain {day}")
+    parser.add_argument('--checkpoint-interval', type=int, help="days between checkpoints (default 30)")
+    parser.add_argument('--resume', metavar='PATH', help="continue the run saved in checkpoint PATH")
+    parser.add_argument('--clearing-interval', type=int, metavar='DAYS',
+                        help="net the due open invoices multilaterally every DAYS days")
+    parser.add_argument('--contagion-interval', type=int, metavar='DAYS',
+                        help="fail insolvent businesses and propagate their defaults every DAYS days")
+    parser.add_argument('--credit-limit', type=float, metavar='AMOUNT',
+                        help="give every business a credit line of AMOUNT drawn when its cash goes negative")
+    parser.add_argument('--quiet', action='store_true', default=None, help="suppress all console output")
+    parser.add_argument('--visualize', action='store_true', default=None, help="draw the network each day")
+    parser.add_argument('--render', metavar='PATH',
+                        help="render the network headless to PATH, a pattern with {day} or a .gif animation")
+    return parser.parse_args(argv)
+
+def config_from_args(args):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if args.config:
+        config.update(load_config(args.config))
+    for key in ('businesses', 'days', 'seed', 'engine', 'ledger', 'business_rng', 'resume', 'quiet', 'visualize'):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    if args.presets:
+        config['presets'] = parse_preset_args(args.presets)
+    topology_config = dict(config.get('topology') or {})
+    if args.topology_kind and args.topology_kind != topology_config.get('kind', 'dense'):
+        topology_config = {'kind': args.topology_kind}
+    if args.max_customers is not None:
+        topology_config['max_customers'] = args.max_customers
+    for param in args.topology_param:
+        name, value = param.split('=', 1)
+        topology_config[name] = json.loads(value)
+    config['topology'] = topology_config
+    if args.events or args.events_format:
+        events = dict(config.get('events') or {})
+        if args.events:
+            events['prefix'] = args.events
+        if args.events_format:
+            events['format'] = args.events_format
+        config['events'] = events
+    if args.credit_limit is not None:
+        config['financing'] = {**(config.get('financing') or {}), 'credit_limit': args.credit_limit}
+    if args.profile or args.profile_memory:
+        profile = dict(config.get('profile') or {})
+        if args.profile:
+            profile['path'] = args.profile
+        if args.profile_memory:
+            profile['memory'] = True
+        config['profile'] = profile
+    if args.render:
+        config['visualize'] = args.render
+    if args.database or args.prune_interval:
+        database = dict(config.get('database') or {})
+        if args.database:
+            database['path'] = args.database
+        if args.prune_interval:
+            database['prune_interval'] = args.prune_interval
+        config['database'] = database
+    if args.metrics:
+        config['metrics'] = {**(config.get('metrics') or {}), 'path': args.metrics}
+    if args.aging:
+        config['aging'] = {**(config.get('aging') or {}), 'path': args.aging}
+    if args.checkpoint or args.checkpoint_interval:
+        checkpoint = dict(config.get('checkpoint') or {})
+        if args.checkpoint:
+            checkpoint['path'] = args.checkpoint
+        if args.checkpoint_interval:
+            checkpoint['interval'] = args.checkpoint_interval
+        config['checkpoint'] = checkpoint
+    if args.clearing_interval:
+        config['clearing'] = {**(config.get('clearing') or {}), 'interval': args.clearing_interval}
+    if args.contagion_interval:
+        config['contagion'] = {**(config.get('contagion') or {}), 'interval': args.contagion_interval}
+    return config
+
+def main(argv=None):
+    config = config_from_args(parse_args(argv))
+    hooks = {}
+    businesses = run(config, config_hooks=hooks)
+    summary = summarize(businesses)
+    for name, hook in hooks.items():
+        summary[name] = hook.summary()
+    json.dump(summary, sys.stdout)
+    print()
+
+if __name__ == "__main__":
+    main()
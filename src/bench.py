@@ -0,0 +1,208 @@
+"""
+Benchmarks for the simulation hot paths at increasing scale.
+
+Every case runs with fixed seeds in a fresh worker process, so the reported peak
+memory (max RSS) belongs to that case alone. Results are written as JSON and
+can be compared with an earlier run:
+
+    python bench.py --sizes 10 100 1000 --days 30 365 --output before.json
+    python bench.py --sizes 10 100 1000 --days 30 365 --output after.json --compare before.json
+
+The full matrix (--sizes 10 100 1000 10000 --days 30 365 1095) takes hours with
+the object engine at 10k businesses; cases can be narrowed with --cases.
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from business_attributes import AttributesMenu
+from main import build_businesses, connect_businesses, issue_invoices, process_payments, start_simulation
+from models import EPOCH
+import topology
+
+PRESETS = list(AttributesMenu.presets)
+WARMUP_DAYS = 40  # Long enough for the first invoices to fall due
+EPOCH_DAY = EPOCH.toordinal()
+
+def build(size, seed, dense_limit):
+    """Builds a connected network: dense up to dense_limit businesses, sparse random beyond."""
+    rng = random.Random(seed)
+    businesses = build_businesses([PRESETS[i % len(PRESETS)] for i in range(size)])
+    if size <= dense_limit:
+        connect_businesses(businesses, rng=rng)
+    else:
+        topology.connect_network(businesses, 'sparse_random', rng=rng, mean_customers=10)
+    return businesses, rng
+
+def simulation_day(day):
+    return EPOCH_DAY + day
+
+def count_invoices(businesses):
+    return sum(len(b.sent_invoices) for b in businesses)
+
+def count_payments(businesses):
+    return sum(len(b.payments_made) for b in businesses)
+
+def run_days(businesses, rng, first_day, num_days):
+    for day in range(first_day, first_day + num_days):
+        issue_invoices(businesses, simulation_day(day), rng)
+        process_payments(businesses, simulation_day(day), verbose=False, rng=rng)
+
+def bench_setup_network(size, days, seed, dense_limit):
+    start = time.perf_counter()
+    businesses, _ = build(size, seed, dense_limit)
+    elapsed = time.perf_counter() - start
+    edges = sum(len(b.customer_list) for b in businesses)
+    return {'seconds': elapsed, 'edges': edges, 'edges_per_sec': edges / elapsed}
+
+def bench_issue_invoices(size, days, seed, dense_limit):
+    businesses, rng = build(size, seed, dense_limit)
+    start = time.perf_counter()
+    for day in range(1, days + 1):
+        issue_invoices(businesses, simulation_day(day), rng)
+    elapsed = time.perf_counter() - start
+    invoices = count_invoices(businesses)
+    return {'seconds': elapsed, 'invoices': invoices, 'invoices_per_sec': invoices / elapsed,
+            'sim_days_per_sec': days / elapsed}
+
+def bench_process_payments(size, days, seed, dense_limit):
+    businesses, rng = build(size, seed, dense_limit)
+    run_days(businesses, rng, 1, WARMUP_DAYS)
+    payments_before = count_payments(businesses)
+    elapsed = 0.0
+    for day in range(WARMUP_DAYS + 1, WARMUP_DAYS + days + 1):
+        issue_invoices(businesses, simulation_day(day), rng)
+        start = time.perf_counter()
+        process_payments(businesses, simulation_day(day), verbose=False, rng=rng)
+        elapsed += time.perf_counter() - start
+    payments = count_payments(businesses) - payments_before
+    return {'seconds': elapsed, 'payments': payments, 'payments_per_sec': payments / elapsed,
+            'sim_days_per_sec': days / elapsed}
+
+def bench_issue_payment(size, days, seed, dense_limit):
+    businesses, rng = build(size, seed, dense_limit)
+    due_date = simulation_day(30)
+    invoices = []
+    for business in businesses:
+        for customer in business.customer_list[:10]:
+            invoices.append(business.issue_invoice(customer, due_date, rng))
+    start = time.perf_counter()
+    for invoice in invoices:
+        invoice.recipient.issue_payment([invoice], invoice.outstanding_balance, due_date)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'payments': len(invoices), 'payments_per_sec': len(invoices) / elapsed}
+
+def bench_update_network_graph(size, days, seed, dense_limit):
+    from network import create_network_graph, update_network_graph
+    businesses, rng = build(size, seed, dense_limit)
+    run_days(businesses, rng, 1, min(days, WARMUP_DAYS))
+    graph = create_network_graph(businesses)
+    start = time.perf_counter()
+    update_network_graph(graph, businesses)
+    elapsed = time.perf_counter() - start
+    edges = graph.number_of_edges()
+    return {'seconds': elapsed, 'edges': edges, 'edges_per_sec': edges / elapsed}
+
+def bench_start_simulation(size, days, seed, dense_limit, engine='object'):
+    businesses, rng = build(size, seed, dense_limit)
+    start = time.perf_counter()
+    start_simulation(businesses, days, engine=engine, seed=seed, verbose=False, rng=rng)
+    elapsed = time.perf_counter() - start
+    result = {'seconds': elapsed, 'sim_days_per_sec': days / elapsed}
+    if engine == 'object':
+        invoices = count_invoices(businesses)
+        result.update(invoices=invoices, invoices_per_sec=invoices / elapsed)
+    return result
+
+def bench_start_simulation_vectorized(size, days, seed, dense_limit):
+    return bench_start_simulation(size, days, seed, dense_limit, engine='vectorized')
+
+# Case name -> (function, whether it is run for every entry of --days or only the first)
+CASES = {
+    'setup_network': (bench_setup_network, False),
+    'issue_invoices': (bench_issue_invoices, False),
+    'process_payments': (bench_process_payments, False),
+    'issue_payment': (bench_issue_payment, False),
+    'update_network_graph': (bench_update_network_graph, False),
+    'start_simulation': (bench_start_simulation, True),
+    'start_simulation_vectorized': (bench_start_simulation_vectorized, True),
+}
+
+def run_case(name, size, days, seed, dense_limit):
+    result = CASES[name][0](size, days, seed, dense_limit)
+    # ru_maxrss is in kilobytes on Linux
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(cases, sizes, days_list, seed=0, dense_limit=1000):
+    results = []
+    for name in cases:
+        per_days = CASES[name][1]
+        for size in sizes:
+            for days in (days_list if per_days else days_list[:1]):
+                # A fresh process per case keeps peak memory and warm caches separate
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    result = pool.submit(run_case, name, size, days, seed, dense_limit).result()
+                result.update(case=name, businesses=size, days=days)
+                results.append(result)
+                print(format_result(result), flush=True)
+    return {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'results': results,
+    }
+
+def format_result(result):
+    rates = ', '.join(f"{key}={result[key]:,.0f}" for key in sorted(result) if key.endswith('_per_sec'))
+    return (f"{result['case']:<28} n={result['businesses']:<6} days={result['days']:<5} "
+            f"{result['seconds']:9.3f}s  peak={result['peak_rss_mb']:8.1f}MB  {rates}")
+
+def compare(current, baseline):
+    """Prints the speed ratio of each case against a baseline results file."""
+    key = lambda r: (r['case'], r['businesses'], r['days'])
+    before = {key(r): r for r in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in current['results']:
+        old = before.get(key(result))
+        if old:
+            print(f"{result['case']:<28} n={result['businesses']:<6} days={result['days']:<5} "
+                  f"speedup x{old['seconds'] / result['seconds']:.2f}  "
+                  f"memory x{result['peak_rss_mb'] / old['peak_rss_mb']:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths.")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000])
+    parser.add_argument('--days', nargs='+', type=int, default=[30, 365])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dense-limit', type=int, default=1000,
+                        help="largest network wired densely like setup_network; larger ones are sparse")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.cases, args.sizes, args.days, args.seed, args.dense_limit)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import itertools
+import math
+
+import numpy as np
+
+class BufferedRNG:
+    """
+    Drop-in source of randomness for the rng parameters of the simulation that
+    draws its numbers from NumPy in blocks.
+
+    Each call to normalvariate() or randint() in the random module runs several
+    Python-level steps for one number. BufferedRNG instead fills a block of
+    block_size uniform or standard normal variates with one NumPy call, the
+    first time one is needed and again whenever the block is used up, and hands
+    them out one at a time. random() is the __next__ of an iterator over the
+    blocks, so a uniform costs no more than random.random(). It implements the
+    part of the random.Random API the simulation uses.
+    """
+
+    def __init__(self, seed=None, block_size=1024):
+        """
+        :param seed: A seed, numpy.random.SeedSequence or numpy.random.Generator.
+        :param block_size: Number of variates drawn from NumPy at a time.
+        """
+        if isinstance(seed, np.random.Generator):
+            self.generator = seed
+        else:
+            self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self._start_streams([], [])
+
+    def _start_streams(self, uniforms, normals):
+        # The block each stream is handing out, as [values, iterator over them]
+        self._uniform_block = [uniforms, iter(uniforms)]
+        self._normal_block = [normals, iter(normals)]
+        self.random = itertools.chain.from_iterable(self._blocks(self.generator.random, self._uniform_block)).__next__
+        self._next_normal = itertools.chain.from_iterable(
+            self._blocks(self.generator.standard_normal, self._normal_block)).__next__
+
+    def _blocks(self, draw, current):
+        yield current[1]
+        while True:
+            values = draw(self.block_size).tolist()
+            current[:] = values, iter(values)
+            yield current[1]
+
+    def normalvariate(self, mu=0.0, sigma=1.0):
+        """Returns a normally distributed float with mean mu and standard deviation sigma."""
+        return mu + sigma * self._next_normal()
+
+    gauss = normalvariate
+
+    def randint(self, a, b):
+        """Returns an integer in [a, b], both included."""
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        """Returns a random element of a non-empty sequence."""
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[int(self.random() * len(seq))]
+
+    def bernoulli_indices(self, n, probability):
+        """
+        Runs n independent trials succeeding with probability and returns the
+        indices of the successes. Instead of one draw per trial, the gaps between
+        successes are drawn from the geometric distribution, so the cost grows
+        with the number of successes rather than with n.
+        """
+        if probability >= 1:
+            return list(range(n))
+        if probability <= 0:
+            return []
+        log_failure = math.log1p(-probability)
+        random = self.random
+        indices = []
+        i = int(math.log(1.0 - random()) / log_failure)
+        while i < n:
+            indices.append(i)
+            i += 1 + int(math.log(1.0 - random()) / log_failure)
+        return indices
+
+    def getrandbits(self, k):
+        """Returns an integer with k random bits, read directly from the generator."""
+        return int.from_bytes(self.generator.bytes((k + 7) // 8), 'little') >> (-k % 8)
+
+    @staticmethod
+    def _remaining(block):
+        values, iterator = block
+        return values[len(values) - iterator.__length_hint__():]
+
+    def getstate(self):
+        """Returns the generator state and the variates drawn but not handed out yet."""
+        return (self.generator.bit_generator.state, self._remaining(self._uniform_block),
+                self._remaining(self._normal_block))
+
+    def setstate(self, state):
+        generator_state, uniforms, normals = state
+        self.generator.bit_generator.state = generator_state
+        self._start_streams(list(uniforms), list(normals))
+
+def seed_businesses(businesses, seed=None, block_size=1024):
+    """
+    Gives every business its own BufferedRNG as business.rng.
+
+    The streams are spawned from one numpy.random.SeedSequence, so each
+    business's draws depend only on seed and its position in businesses, not
+    on how the draws of different businesses interleave.
+    """
+    children = np.random.SeedSequence(seed).spawn(len(businesses))
+    for business, child in zip(businesses, children):
+        business.rng = BufferedRNG(child, block_size)
@@ -1,185 +1,155 @@
 # business_attributes.py
-from models import BusinessAttributes
+from models import PresetAttributes
 
 class AttributesMenu:
     presets = {
-        "A1": BusinessAttributes(
+        "A1": PresetAttributes(
             invoices_per_year=91,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=100,
             max_payment_delay=0
         ),
-        "A2": BusinessAttributes(
+        "A2": PresetAttributes(
             invoices_per_year=123,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=100,
             max_payment_delay=0
         ),
-        "A3": BusinessAttributes(
+        "A3": PresetAttributes(
             invoices_per_year=365,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=100,
             max_payment_delay=0
         ),
-        "A4": BusinessAttributes(
+        "A4": PresetAttributes(
             invoices_per_year=730,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=100,
             max_payment_delay=0
         ),
-        "A5": BusinessAttributes(
+        "A5": PresetAttributes(
             invoices_per_year=1095,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=100,
             max_payment_delay=0
         ),
-        "B1": BusinessAttributes(
+        "B1": PresetAttributes(
             invoices_per_year=91,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=90,
             max_payment_delay=10
         ),
-        "B2": BusinessAttributes(
+        "B2": PresetAttributes(
             invoices_per_year=123,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=90,
             max_payment_delay=10
         ),
-        "B3": BusinessAttributes(
+        "B3": PresetAttributes(
             invoices_per_year=365,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=90,
             max_payment_delay=10
         ),
-        "B4": BusinessAttributes(
+        "B4": PresetAttributes(
             invoices_per_year=730,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=90,
             max_payment_delay=10
         ),
-        "B5": BusinessAttributes(
+        "B5": PresetAttributes(
             invoices_per_year=1095,
-            customer_averages={},  # Adjust as needed; possibly a placeholder for now
             on_time_payment_percentage=90,
             max_payment_delay=10
         ),
-        "C1": BusinessAttributes(
+        "C1": PresetAttributes(
             invoices_per_year=91,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=80,
             max_payment_delay=20
         ),
-        "C2": BusinessAttributes(
+        "C2": PresetAttributes(
             invoices_per_year=123,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=80,
             max_payment_delay=20
         ),
-        "C3": BusinessAttributes(
+        "C3": PresetAttributes(
             invoices_per_year=365,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=80,
             max_payment_delay=20
         ),
-        "C4": BusinessAttributes(
+        "C4": PresetAttributes(
             invoices_per_year=730,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=80,
             max_payment_delay=20
         ),
-        "C5": BusinessAttributes(
+        "C5": PresetAttributes(
             invoices_per_year=1095,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=80,
             max_payment_delay=20
         ),
-        "D1": BusinessAttributes(
+        "D1": PresetAttributes(
             invoices_per_year=91,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=70,
             max_payment_delay=30
         ),
-        "D2": BusinessAttributes(
+        "D2": PresetAttributes(
             invoices_per_year=123,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=70,
             max_payment_delay=30
         ),
-        "D3": BusinessAttributes(
+        "D3": PresetAttributes(
             invoices_per_year=365,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=70,
             max_payment_delay=30
         ),
-        "D4": BusinessAttributes(
+        "D4": PresetAttributes(
             invoices_per_year=730,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=70,
             max_payment_delay=30
         ),
-        "D5": BusinessAttributes(
+        "D5": PresetAttributes(
             invoices_per_year=1095,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=70,
             max_payment_delay=30
         ),
-        "E1": BusinessAttributes(
+        "E1": PresetAttributes(
             invoices_per_year=91,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=60,
             max_payment_delay=40
         ),
-       "E2": BusinessAttributes(
+       "E2": PresetAttributes(
             invoices_per_year=123,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=60,
             max_payment_delay=40
         ),
-        "E3": BusinessAttributes(
+        "E3": PresetAttributes(
             invoices_per_year=365,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=60,
             max_payment_delay=40
         ),
-        "E4": BusinessAttributes(
+        "E4": PresetAttributes(
             invoices_per_year=730,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=60,
             max_payment_delay=40
         ),
-        "E5": BusinessAttributes(
+        "E5": PresetAttributes(
             invoices_per_year=1095,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=60,
             max_payment_delay=40
         ),
-        "F1": BusinessAttributes(
+        "F1": PresetAttributes(
             invoices_per_year=91,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=50,
             max_payment_delay=50
         ),
-        "F2": BusinessAttributes(
+        "F2": PresetAttributes(
             invoices_per_year=123,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=50,
             max_payment_delay=50
         ),
-        "F3": BusinessAttributes(
+        "F3": PresetAttributes(
             invoices_per_year=365,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=50,
             max_payment_delay=50
         ),
-        "F4": BusinessAttributes(
+        "F4": PresetAttributes(
             invoices_per_year=730,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=50,
             max_payment_delay=50
         ),
-        "F5": BusinessAttributes(
+        "F5": PresetAttributes(
             invoices_per_year=1095,
-            customer_averages={},  # Adjust as needed
             on_time_payment_percentage=50,
             max_payment_delay=50
         )
@@ -187,4 +157,10 @@ class AttributesMenu:
 
     @staticmethod
     def get_attribute(preset_name):
-        return AttributesMenu.presets.get(preset_name, None)
+        """
+        Returns new BusinessAttributes for one business from the named preset, or
+        None for an unknown name. The preset's parameters are shared, not copied,
+        and every business gets its own customer averages.
+        """
+        preset = AttributesMenu.presets.get(preset_name, None)
+        return None if preset is None else preset.new_attributes()
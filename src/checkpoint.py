@@ -0,0 +1,356 @@
+"""
+Checkpoint and restore of a running object-engine simulation.
+
+A checkpoint holds everything start_simulation needs to carry on: the
+businesses with their attributes, customer relationships and balance sheets,
+the invoices and payments, the Invoice/Payment id counters and the state of
+the random.Random (or random module) driving the run, as well as each
+business's own buffered_rng.BufferedRNG if it has one. Example:
+
+    start_simulation(businesses, 365, rng=rng, hooks=[Checkpointer('run-{day}.ckpt', rng, interval=30)])
+    ...
+    businesses = resume('run-180.ckpt', 365, verbose=False)
+
+The businesses, invoices and payments reference each other, so instead of
+pickling the object graph every field is written as a typed NumPy column,
+with objects referring to each other by row index. A file is an 8-byte magic
+string, the length of a JSON header, the header (scalars, business names and
+the name, dtype, shape and offset of each column) and the columns themselves,
+each aligned to 64 bytes. load_checkpoint memory-maps the file, so opening
+one is cheap and only the columns that are read get paged in.
+"""
+import datetime
+import json
+import os
+import random
+import struct
+
+import numpy as np
+
+from buffered_rng import BufferedRNG
+from models import Business, BusinessAttributes, Invoice, Payment, to_day
+
+MAGIC = b'FCSCKPT\x01'
+ALIGNMENT = 64
+NO_DAY = -1  # Day ordinal stored when a date is not set
+STATUS_CODES = {'issued': 0, 'partially_paid': 1, 'paid': 2, 'written_off': 3}
+STATUS_NAMES = ('issued', 'partially_paid', 'paid', 'written_off')
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _to_day(value):
+    return NO_DAY if value is None else value
+
+def _from_day(day):
+    return None if day == NO_DAY else day
+
+def save_checkpoint(path, businesses, day, start_date, rng=None, include_history=True):
+    """
+    Writes the state of a simulation at the end of day to path.
+
+    :param start_date: The date (or day ordinal) before day 1, as passed to start_simulation.
+    :param rng: The random module or random.Random instance driving the run; its
+                state is saved so a resumed run draws the same numbers.
+    :param include_history: Also save paid invoices and all payments. Without
+                            them only the open invoices are kept, which is all a
+                            resumed run needs, but the restored businesses then
+                            lack their earlier invoices and payments.
+    """
+    for business in businesses:
+        if business.ledger is not None:
+            raise ValueError("Checkpoints of ledger-backed businesses are not supported")
+    index = {id(business): i for i, business in enumerate(businesses)}
+
+    # Attribute objects may be shared between businesses; keep them shared
+    attribute_index = {}
+    attributes = []
+    for business in businesses:
+        if id(business.attributes) not in attribute_index:
+            attribute_index[id(business.attributes)] = len(attributes)
+            attributes.append(business.attributes)
+    average_rows = []
+    for i, business_attributes in enumerate(attributes):
+        for customer, average in business_attributes.customer_averages.items():
+            # Skip averages for customers that are not part of this network
+            if id(customer) in index:
+                average_rows.append((i, index[id(customer)], average))
+
+    edges = [(i, index[id(customer)]) for i, business in enumerate(businesses) for customer in business.customer_list]
+
+    if include_history:
+        invoices = [invoice for business in businesses for invoice in business.sent_invoices]
+        payments = [payment for business in businesses for payment in business.payments_made]
+    else:
+        invoices = [invoice for business in businesses for invoice in business.open_invoices]
+        payments = []
+    invoices.sort(key=lambda invoice: invoice.id)
+    payments.sort(key=lambda payment: payment.id)
+    allocations = [(invoice.id, percentage) for payment in payments
+                   for invoice, percentage in zip(payment.invoices, payment.distribution_percentages)]
+    payees = [(payee_id, amount) for payment in payments for payee_id, amount in payment.payee_amounts.items()]
+
+    balance_sheets = [(b.balance_sheet.cash, b.balance_sheet.accounts_receivable,
+                       b.balance_sheet.accounts_payable, b.balance_sheet.debt) for b in businesses]
+    arrays = {
+        'business_id': np.array([business.id for business in businesses], dtype=np.int64),
+        'business_attributes': np.array([attribute_index[id(b.attributes)] for b in businesses], dtype=np.int64),
+        'business_failed': np.array([business.failed for business in businesses], dtype=np.bool_),
+        'balance_sheet': np.array(balance_sheets, dtype=np.float64).reshape(len(businesses), 4),
+        'invoices_per_year': np.array([a.invoices_per_year for a in attributes], dtype=np.float64),
+        'on_time_payment_percentage': np.array([a.on_time_payment_percentage for a in attributes], dtype=np.float64),
+        'max_payment_delay': np.array([a.max_payment_delay for a in attributes], dtype=np.int64),
+        'average_attributes': np.array([row[0] for row in average_rows], dtype=np.int64),
+        'average_customer': np.array([row[1] for row in average_rows], dtype=np.int64),
+        'average_amount': np.array([row[2] for row in average_rows], dtype=np.float64),
+        'edge_issuer': np.array([edge[0] for edge in edges], dtype=np.int64),
+        'edge_customer': np.array([edge[1] for edge in edges], dtype=np.int64),
+        'invoice_id': np.array([invoice.id for invoice in invoices], dtype=np.int64),
+        'invoice_issuer': np.array([index[id(invoice.issuer)] for invoice in invoices], dtype=np.int64),
+        'invoice_recipient': np.array([index[id(invoice.recipient)] for invoice in invoices], dtype=np.int64),
+        'invoice_amount': np.array([invoice.amount for invoice in invoices], dtype=np.float64),
+        'invoice_outstanding': np.array([invoice.outstanding_balance for invoice in invoices], dtype=np.float64),
+        'invoice_due_day': np.array([_to_day(invoice.due_date) for invoice in invoices], dtype=np.int32),
+        'invoice_paid_day': np.array([_to_day(invoice.paid_date) for invoice in invoices], dtype=np.int32),
+        'invoice_status': np.array([STATUS_CODES[invoice.status] for invoice in invoices], dtype=np.uint8),
+        'payment_id': np.array([payment.id for payment in payments], dtype=np.int64),
+        'payment_payer': np.array([index[id(payment.payer)] for payment in payments], dtype=np.int64),
+        'payment_amount': np.array([payment.amount for payment in payments], dtype=np.float64),
+        'payment_day': np.array([_to_day(payment.payment_date) for payment in payments], dtype=np.int32),
+        'payment_allocations': np.array([len(payment.invoices) for payment in payments], dtype=np.int64),
+        'allocation_invoice': np.array([row[0] for row in allocations], dtype=np.int64),
+        'allocation_percentage': np.array([row[1] for row in allocations], dtype=np.float64),
+        'payment_payees': np.array([len(payment.payee_amounts) for payment in payments], dtype=np.int64),
+        'payee_id': np.array([row[0] for row in payees], dtype=np.int64),
+        'payee_amount': np.array([row[1] for row in payees], dtype=np.float64),
+    }
+
+    rng_state = None
+    if rng is not None:
+        version, state, gauss_next = rng.getstate()
+        arrays['rng_state'] = np.array(state, dtype=np.uint32)
+        rng_state = {'version': version, 'gauss_next': gauss_next}
+
+    business_rngs = None
+    if any(business.rng is not None for business in businesses):
+        business_rngs = []
+        uniforms, normals = [], []
+        for business in businesses:
+            if business.rng is None:
+                business_rngs.append(None)
+                uniforms.append([])
+                normals.append([])
+                continue
+            if not isinstance(business.rng, BufferedRNG):
+                raise ValueError("Only BufferedRNG business streams can be checkpointed")
+            generator_state, business_uniforms, business_normals = business.rng.getstate()
+            business_rngs.append({'generator': generator_state, 'block_size': business.rng.block_size})
+            uniforms.append(business_uniforms)
+            normals.append(business_normals)
+        # The variates each stream has drawn but not handed out yet
+        arrays['business_rng_uniforms'] = np.array([x for values in uniforms for x in values], dtype=np.float64)
+        arrays['business_rng_uniform_count'] = np.array([len(values) for values in uniforms], dtype=np.int64)
+        arrays['business_rng_normals'] = np.array([x for values in normals for x in values], dtype=np.float64)
+        arrays['business_rng_normal_count'] = np.array([len(values) for values in normals], dtype=np.int64)
+
+    header = {
+        'day': day,
+        'start_date': to_day(start_date),
+        'names': [business.name for business in businesses],
+        'history': include_history,
+        'invoice_counter': Invoice._id_counter,
+        'payment_counter': Payment._id_counter,
+        'rng': rng_state,
+        'business_rngs': business_rngs,
+        'arrays': {},
+    }
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    # Written next to the target and renamed, so a crash never leaves a torn checkpoint
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temporary_path, path)
+
+def load_checkpoint(path):
+    """Opens a checkpoint written by save_checkpoint; its columns are memory-mapped, not read."""
+    return Checkpoint(path)
+
+class Checkpoint:
+    """
+    A saved simulation state. day and start_date say where the run stopped;
+    restore() rebuilds the businesses and rng() the random number generator.
+    Each call to restore() builds an independent copy, so one checkpoint can
+    be forked into several what-if branches.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a simulation checkpoint")
+            header_length, = struct.unpack('<Q', f.read(8))
+            self.header = json.loads(f.read(header_length))
+        data_start = _align(len(MAGIC) + 8 + header_length)
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.arrays = {}
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            start = data_start + spec['offset']
+            size = int(np.prod(spec['shape'])) * dtype.itemsize
+            self.arrays[name] = data[start:start + size].view(dtype).reshape(spec['shape'])
+        self.day = self.header['day']
+        self.start_date = datetime.date.fromordinal(self.header['start_date'])
+
+    def rng(self, seed=None):
+        """
+        Returns a random.Random in the saved state, or, for a what-if branch that
+        should draw differently from the original run, one seeded with seed.
+        """
+        if seed is not None or self.header['rng'] is None:
+            return random.Random(seed)
+        rng = random.Random()
+        rng.setstate((self.header['rng']['version'], tuple(int(x) for x in self.arrays['rng_state']),
+                      self.header['rng']['gauss_next']))
+        return rng
+
+    def restore(self):
+        """Rebuilds the businesses with their invoices and payments and returns them as a list."""
+        arrays = self.arrays
+        invoice_counter, payment_counter = Invoice._id_counter, Payment._id_counter
+        attributes = [
+            BusinessAttributes(
+                invoices_per_year=float(invoices_per_year),
+                customer_averages=None,
+                on_time_payment_percentage=float(on_time),
+                max_payment_delay=int(max_delay)
+            )
+            for invoices_per_year, on_time, max_delay in zip(
+                arrays['invoices_per_year'], arrays['on_time_payment_percentage'], arrays['max_payment_delay'])
+        ]
+        businesses = [
+            Business(id=int(business_id), name=name, attributes=attributes[attribute])
+            for business_id, name, attribute in zip(
+                arrays['business_id'].tolist(), self.header['names'], arrays['business_attributes'].tolist())
+        ]
+        for business, failed in zip(businesses, arrays['business_failed'].tolist()):
+            business.failed = failed
+        for business, (cash, receivable, payable, debt) in zip(businesses, arrays['balance_sheet'].tolist()):
+            business.balance_sheet.cash = cash
+            business.balance_sheet.accounts_receivable = receivable
+            business.balance_sheet.accounts_payable = payable
+            business.balance_sheet.debt = debt
+        for attribute, customer, average in zip(arrays['average_attributes'].tolist(),
+                                                arrays['average_customer'].tolist(),
+                                                arrays['average_amount'].tolist()):
+            attributes[attribute].customer_averages[businesses[customer]] = average
+        if self.header.get('business_rngs') is not None:
+            uniforms = arrays['business_rng_uniforms'].tolist()
+            normals = arrays['business_rng_normals'].tolist()
+            uniform_end = np.cumsum(arrays['business_rng_uniform_count']).tolist()
+            normal_end = np.cumsum(arrays['business_rng_normal_count']).tolist()
+            uniform_start = normal_start = 0
+            for i, (business, state) in enumerate(zip(businesses, self.header['business_rngs'])):
+                if state is not None:
+                    business.rng = BufferedRNG(block_size=state['block_size'])
+                    business.rng.setstate((state['generator'], uniforms[uniform_start:uniform_end[i]],
+                                           normals[normal_start:normal_end[i]]))
+                uniform_start, normal_start = uniform_end[i], normal_end[i]
+        for issuer, customer in zip(arrays['edge_issuer'].tolist(), arrays['edge_customer'].tolist()):
+            businesses[issuer].add_customer(businesses[customer])
+
+        # Rows are in id order, which is the order the invoices were issued in
+        invoices = {}
+        for row in zip(arrays['invoice_id'].tolist(), arrays['invoice_issuer'].tolist(),
+                       arrays['invoice_recipient'].tolist(), arrays['invoice_amount'].tolist(),
+                       arrays['invoice_outstanding'].tolist(), arrays['invoice_due_day'].tolist(),
+                       arrays['invoice_paid_day'].tolist(), arrays['invoice_status'].tolist()):
+            invoice_id, issuer, recipient, amount, outstanding, due_day, paid_day, status = row
+            invoice = Invoice(issuer=businesses[issuer], recipient=businesses[recipient], amount=amount,
+                              due_date=_from_day(due_day))
+            invoice.id = invoice_id
+            invoice.outstanding_balance = outstanding
+            invoice.paid_date = _from_day(paid_day)
+            invoice.status = STATUS_NAMES[status]
+            invoices[invoice_id] = invoice
+            businesses[issuer]._record_invoice(invoice)
+
+        allocation_invoices = arrays['allocation_invoice'].tolist()
+        allocation_percentages = arrays['allocation_percentage'].tolist()
+        payee_ids = arrays['payee_id'].tolist()
+        payee_amounts = arrays['payee_amount'].tolist()
+        start = payee_start = 0
+        for payment_id, payer, amount, payment_day, count, payee_count in zip(
+                arrays['payment_id'].tolist(), arrays['payment_payer'].tolist(), arrays['payment_amount'].tolist(),
+                arrays['payment_day'].tolist(), arrays['payment_allocations'].tolist(),
+                arrays['payment_payees'].tolist()):
+            paid_invoices = [invoices[invoice_id] for invoice_id in allocation_invoices[start:start + count]]
+            payment = Payment(businesses[payer], amount, _from_day(payment_day), paid_invoices,
+                              allocation_percentages[start:start + count])
+            payment.id = payment_id
+            payment.payee_amounts = dict(zip(payee_ids[payee_start:payee_start + payee_count],
+                                             payee_amounts[payee_start:payee_start + payee_count]))
+            for invoice in paid_invoices:
+                invoice.payments.append(payment)
+            businesses[payer]._record_payment(payment)
+            start += count
+            payee_start += payee_count
+
+        # Never hand out an id that a restored invoice or payment already has
+        Invoice._id_counter = max(invoice_counter, self.header['invoice_counter'])
+        Payment._id_counter = max(payment_counter, self.header['payment_counter'])
+        return businesses
+
+class Checkpointer:
+    """
+    End-of-day hook for start_simulation saving a checkpoint every interval days.
+
+    path may contain {day}, e.g. 'run-{day}.ckpt', to keep one file per
+    checkpoint instead of overwriting the last one. rng must be the rng passed
+    to start_simulation. Only the object engine keeps its invoices on the
+    businesses, so checkpoints of vectorized runs are not supported.
+    """
+
+    def __init__(self, path, rng=random, interval=30, include_history=True):
+        if interval <= 0:
+            raise ValueError("interval must be a positive number of days")
+        self.path = path
+        self.rng = rng
+        self.interval = interval
+        self.include_history = include_history
+
+    def __call__(self, day, simulation_day, businesses):
+        if day % self.interval == 0:
+            start_day = simulation_day - day
+            save_checkpoint(self.path.format(day=day), businesses, day, start_day, self.rng, self.include_history)
+
+def resume(path, num_days, seed=None, **kwargs):
+    """
+    Restores a checkpoint and runs it on from the day after it was saved up to
+    day num_days. Without seed the run continues exactly as the original would
+    have; with one it draws a different future. Further keyword arguments go
+    to start_simulation. Returns the businesses.
+    """
+    from main import start_simulation
+    checkpoint = load_checkpoint(path)
+    businesses = checkpoint.restore()
+    start_simulation(businesses, num_days, rng=checkpoint.rng(seed), start_date=checkpoint.start_date,
+                     first_day=checkpoint.day + 1, **kwargs)
+    return businesses
+
+def fork(path, seeds):
+    """
+    Restores one independent (businesses, rng) branch per seed from a
+    checkpoint, for what-if runs; a seed of None continues the saved stream.
+    """
+    checkpoint = load_checkpoint(path)
+    return [(checkpoint.restore(), checkpoint.rng(seed)) for seed in seeds]
@@ -0,0 +1,214 @@
+"""
+Default propagation over the invoice network with the Eisenberg-Noe clearing vector.
+
+A business must pay the open invoices it owes that have fallen due. It can
+pay them from its cash, from the unused part of its credit line and from what
+its own debtors pay it. If the debtors
+cannot pay in full, the business may be unable to pay in full either, and so
+on around the network. The clearing vector is the fixed point
+
+    p = min(obligations, max(0, cash + Pi^T p))
+
+where Pi[i, j] is the share of i's due obligations owed to j. Every business
+paying less than its obligations in the clearing vector fails. It stops
+trading, and each of its open invoices is written down to its recovery rate,
+payments / obligations. That loss comes off the creditors' accounts
+receivable and the failed business's accounts payable.
+
+The fixed point is found by iterating from full payment. Each iteration is two
+np.bincount calls over the invoice arrays, so a round costs O(invoices) per
+iteration without any recursive walk, and it handles tens of thousands of
+businesses. Example, checking solvency every day of a run, with a credit line of
+10,000 per business:
+
+    contagion = ContagionHook(credit_limit=10_000)
+    start_simulation(businesses, 365, hooks=[contagion])
+    print(contagion.summary())
+"""
+import numpy as np
+
+def clearing_vector(payers, payees, amounts, external_assets, tolerance=1e-9, max_iterations=10_000):
+    """
+    Computes the Eisenberg-Noe clearing payments.
+
+    :param payers: Index of the business owing each obligation.
+    :param payees: Index of the business owed each obligation.
+    :param amounts: Amount of each obligation.
+    :param external_assets: Cash available to each business besides what its debtors pay it.
+    :return: Tuple (payments, obligations, iterations), with one entry of the
+             first two per business.
+    """
+    n = len(external_assets)
+    obligations = np.bincount(payers, weights=amounts, minlength=n)
+    # Share of its payer's obligations each obligation makes up
+    shares = amounts / np.where(obligations > 0, obligations, 1)[payers]
+    payments = obligations.copy()
+    limit = tolerance * max(float(obligations.max(initial=0)), 1.0)
+    for iteration in range(1, max_iterations + 1):
+        inflows = np.bincount(payees, weights=shares * payments[payers], minlength=n)
+        updated = np.minimum(obligations, np.maximum(external_assets + inflows, 0))
+        # Payments only go down from full payment, so the largest drop bounds the change
+        converged = float((payments - updated).max(initial=0)) <= limit
+        payments = updated
+        if converged:
+            break
+    return payments, obligations, iteration
+
+class ContagionResult:
+    """
+    Outcome of one default-propagation round.
+
+    failed lists the businesses failing in this round. Those that could not pay
+    even if all their debtors paid in full are in fundamental; the rest fail
+    because of others' defaults. recovery_rates maps each failed business to the
+    share of its obligations it can pay, and write_downs is the total amount
+    written off.
+    """
+
+    def __init__(self, failed, fundamental, recovery_rates, write_downs, iterations):
+        self.failed = failed
+        self.fundamental = fundamental
+        self.recovery_rates = recovery_rates
+        self.write_downs = write_downs
+        self.iterations = iterations
+
+    @property
+    def contagious(self):
+        """Businesses failing only because of other businesses' defaults."""
+        fundamental = set(map(id, self.fundamental))
+        return [business for business in self.failed if id(business) not in fundamental]
+
+    def to_dict(self):
+        return {
+            'failed': len(self.failed),
+            'fundamental': len(self.fundamental),
+            'contagious': len(self.failed) - len(self.fundamental),
+            'write_downs': self.write_downs,
+            'iterations': self.iterations,
+        }
+
+    def __repr__(self):
+        return (f"ContagionResult(failed={len(self.failed)}, fundamental={len(self.fundamental)}, "
+                f"write_downs={self.write_downs})")
+
+def available_assets(businesses, credit_limit=0.0):
+    """
+    Returns the cash each business can pay with besides what its debtors pay it:
+    its cash plus its credit line less the debt drawn on it, floored at zero.
+    Negative cash is an overdraft and uses up the credit line like debt does.
+
+    :param credit_limit: Credit line of each business, a number or an array with
+                         one entry per business, as in financing.FinancingHook.
+    """
+    n = len(businesses)
+    cash = np.fromiter((b.balance_sheet.cash for b in businesses), dtype=np.float64, count=n)
+    debt = np.fromiter((b.balance_sheet.debt for b in businesses), dtype=np.float64, count=n)
+    limit = np.broadcast_to(np.asarray(credit_limit, dtype=np.float64), (n,))
+    return np.maximum(cash + limit - debt, 0)
+
+def propagate_defaults(businesses, due_by=None, external_assets=None, credit_limit=0.0, tolerance=1e-9):
+    """
+    Fails every business that cannot pay the obligations due by due_by and
+    writes down the invoices of the failed businesses.
+
+    Obligations are the open invoices between businesses that have not failed
+    yet, due on or before due_by (all open invoices if None). Businesses that
+    have already failed are not assessed again.
+
+    A failed business pays nothing more: its invoices stay open at their
+    written-down balance and it neither invoices nor pays in later days.
+
+    :param external_assets: Optional array of the cash available to each
+                            business. By default it is available_assets(businesses, credit_limit).
+    :param credit_limit: Credit line of each business counted in the default
+                         external assets. Businesses start with no cash and
+                         pay their invoices late, so with no credit line every
+                         business with an overdue invoice and no debtor paying
+                         it fails.
+    :return: A ContagionResult.
+    """
+    n = len(businesses)
+    position = {id(business): i for i, business in enumerate(businesses)}
+    payers, payees, amounts = [], [], []
+    for i, business in enumerate(businesses):
+        if business.failed:
+            continue
+        for invoice in business.open_invoices:
+            if (due_by is None or invoice.due_date <= due_by) and id(invoice.issuer) in position:
+                payers.append(i)
+                payees.append(position[id(invoice.issuer)])
+                amounts.append(invoice.outstanding_balance)
+    payers = np.array(payers, dtype=np.int64)
+    payees = np.array(payees, dtype=np.int64)
+    amounts = np.array(amounts, dtype=np.float64)
+
+    if external_assets is None:
+        external_assets = available_assets(businesses, credit_limit)
+    payments, obligations, iterations = clearing_vector(payers, payees, amounts, external_assets, tolerance)
+    shortfall = obligations - payments
+    failing = np.flatnonzero((obligations > 0) & (shortfall > tolerance * np.maximum(obligations, 1.0)))
+
+    # Businesses short even if everyone paid them in full
+    full_inflows = np.bincount(payees, weights=amounts, minlength=n)
+    fundamental = failing[external_assets[failing] + full_inflows[failing] < obligations[failing]]
+
+    recovery_rates = {}
+    write_downs = 0.0
+    for i in failing.tolist():
+        business = businesses[i]
+        recovery_rate = float(payments[i] / obligations[i])
+        business.failed = True
+        recovery_rates[business] = recovery_rate
+        # Every open invoice of the failed business is written down, not only the due ones
+        for invoice in list(business.open_invoices):
+            loss = invoice.outstanding_balance * (1 - recovery_rate)
+            invoice.write_down(loss)
+            invoice.issuer.balance_sheet.update_accounts_receivable(-loss)
+            business.balance_sheet.update_accounts_payable(-loss)
+            write_downs += loss
+
+    return ContagionResult(
+        failed=[businesses[i] for i in failing.tolist()],
+        fundamental=[businesses[i] for i in fundamental.tolist()],
+        recovery_rates=recovery_rates,
+        write_downs=write_downs,
+        iterations=iterations,
+    )
+
+class ContagionHook:
+    """
+    End-of-day hook for start_simulation running propagate_defaults every
+    interval days on the obligations due within horizon days. The results are
+    kept in self.results as (day, ContagionResult).
+
+    :param credit_limit: Credit line of each business, a number or an array with
+                         one entry per business, counted in its assets; see
+                         available_assets.
+    """
+
+    def __init__(self, interval=1, horizon=0, credit_limit=0.0):
+        if interval <= 0:
+            raise ValueError("interval must be a positive number of days")
+        self.interval = interval
+        self.horizon = horizon
+        self.credit_limit = credit_limit
+        self.results = []
+
+    def __call__(self, day, simulation_day, businesses):
+        if day % self.interval:
+            return
+        due_by = simulation_day + self.horizon
+        self.results.append((day, propagate_defaults(businesses, due_by=due_by, credit_limit=self.credit_limit)))
+
+    def summary(self):
+        """Totals over all rounds so far."""
+        failed = sum(len(result.failed) for _, result in self.results)
+        fundamental = sum(len(result.fundamental) for _, result in self.results)
+        return {
+            'rounds': len(self.results),
+            'failed': failed,
+            'fundamental': fundamental,
+            'contagious': failed - fundamental,
+            'write_downs': sum(result.write_downs for _, result in self.results),
+            'first_failure_day': next((day for day, result in self.results if result.failed), None),
+        }
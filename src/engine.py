@@ -0,0 +1,160 @@
+import numpy as np
+
+class VectorizedEngine:
+    """
+    Array-backed alternative to the per-object day loop in main.start_simulation.
+
+    Businesses, customer edges and open invoices are held in NumPy arrays and one
+    simulated day is drawn for the whole network with batched operations. The
+    accounting mirrors Business.issue_invoice and Business.issue_payment, so the
+    resulting balance sheets can be compared with runs of the object model.
+    """
+
+    def __init__(self, businesses, rng=None, payment_terms=30):
+        """
+        Initializes the engine from already connected Business instances.
+
+        :param businesses: List of Business instances with customer relationships set up.
+        :param rng: A numpy.random.Generator; a fresh unseeded one is used if omitted.
+        :param payment_terms: Number of days between issuing an invoice and its due date.
+        """
+        self.businesses = businesses
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.payment_terms = payment_terms
+
+        n = len(businesses)
+        position = {business: i for i, business in enumerate(businesses)}
+
+        self.invoices_per_year = np.array([b.attributes.invoices_per_year for b in businesses], dtype=np.float64)
+        self.on_time_payment_percentage = np.array([b.attributes.on_time_payment_percentage for b in businesses], dtype=np.float64)
+        self.max_payment_delay = np.array([b.attributes.max_payment_delay for b in businesses], dtype=np.int64)
+
+        self.cash = np.array([b.balance_sheet.cash for b in businesses], dtype=np.float64)
+        self.accounts_receivable = np.array([b.balance_sheet.accounts_receivable for b in businesses], dtype=np.float64)
+        self.accounts_payable = np.array([b.balance_sheet.accounts_payable for b in businesses], dtype=np.float64)
+        self.debt = np.array([b.balance_sheet.debt for b in businesses], dtype=np.float64)
+
+        # Customer edges (issuer -> customer) and their average invoice amounts
+        sources, targets, averages = [], [], []
+        for business in businesses:
+            for customer in business.customer_list:
+                average = business.attributes.customer_averages.get(customer, 0)
+                if average == 0:
+                    raise ValueError(f"No average invoice amount defined for customer {customer}")
+                sources.append(position[business])
+                targets.append(position[customer])
+                averages.append(average)
+        self.edge_issuer = np.array(sources, dtype=np.int64)
+        self.edge_recipient = np.array(targets, dtype=np.int64)
+        self.edge_average = np.array(averages, dtype=np.float64)
+
+        # Same uniform spread of invoices_per_year over customers and days as issue_invoices
+        customer_counts = np.bincount(self.edge_issuer, minlength=n)
+        self.edge_daily_probability = (
+            self.invoices_per_year[self.edge_issuer] / customer_counts[self.edge_issuer] / 365.0
+        )
+
+        # Open (not fully paid) invoices
+        self.invoice_issuer = np.empty(0, dtype=np.int64)
+        self.invoice_recipient = np.empty(0, dtype=np.int64)
+        self.invoice_outstanding = np.empty(0, dtype=np.float64)
+        self.invoice_due_day = np.empty(0, dtype=np.int64)
+
+        self.invoices_issued = 0
+        self.payments_made = 0
+        self.defaults = 0
+
+    @property
+    def num_open_invoices(self):
+        return len(self.invoice_outstanding)
+
+    def issue_invoices(self, day):
+        """Draws every edge's invoice decision for the day in one batch. Returns the number issued."""
+        issued = self.rng.random(len(self.edge_issuer)) < self.edge_daily_probability
+        issuers = self.edge_issuer[issued]
+        recipients = self.edge_recipient[issued]
+        averages = self.edge_average[issued]
+        amounts = self.rng.normal(averages, 0.2 * averages)
+
+        n = len(self.businesses)
+        self.accounts_receivable += np.bincount(issuers, weights=amounts, minlength=n)
+        self.accounts_payable += np.bincount(recipients, weights=amounts, minlength=n)
+
+        self.invoice_issuer = np.concatenate((self.invoice_issuer, issuers))
+        self.invoice_recipient = np.concatenate((self.invoice_recipient, recipients))
+        self.invoice_outstanding = np.concatenate((self.invoice_outstanding, amounts))
+        self.invoice_due_day = np.concatenate(
+            (self.invoice_due_day, np.full(len(amounts), day + self.payment_terms, dtype=np.int64))
+        )
+
+        self.invoices_issued += len(amounts)
+        return len(amounts)
+
+    def process_payments(self, day):
+        """
+        Draws the payment decision for every due or overdue invoice in one batch.
+        Returns a tuple (payments made, invoices past their maximum payment delay).
+        """
+        due = np.flatnonzero(self.invoice_due_day <= day)
+        payers = self.invoice_recipient[due]
+        days_overdue = day - self.invoice_due_day[due]
+
+        payment_probability = self.on_time_payment_percentage[payers].copy()
+        late = (days_overdue > 0) & (days_overdue <= self.max_payment_delay[payers])
+        payment_probability[late] /= 2
+        pays = self.rng.integers(1, 101, size=len(due)) <= payment_probability
+        defaulted = int(np.count_nonzero(~pays & (days_overdue > self.max_payment_delay[payers])))
+
+        paid = due[pays]
+        amounts = self.invoice_outstanding[paid]
+        issuers = self.invoice_issuer[paid]
+        payers = payers[pays]
+
+        n = len(self.businesses)
+        paid_by = np.bincount(payers, weights=amounts, minlength=n)
+        received_by = np.bincount(issuers, weights=amounts, minlength=n)
+        self.cash += received_by - paid_by
+        self.accounts_payable -= paid_by
+        self.accounts_receivable -= received_by
+
+        if len(paid):
+            keep = np.ones(len(self.invoice_outstanding), dtype=bool)
+            keep[paid] = False
+            self.invoice_issuer = self.invoice_issuer[keep]
+            self.invoice_recipient = self.invoice_recipient[keep]
+            self.invoice_outstanding = self.invoice_outstanding[keep]
+            self.invoice_due_day = self.invoice_due_day[keep]
+
+        self.payments_made += len(paid)
+        self.defaults += defaulted
+        return len(paid), defaulted
+
+    def defaulted_businesses(self, day):
+        """Returns a boolean array marking businesses holding an invoice past their maximum payment delay."""
+        overdue = day - self.invoice_due_day > self.max_payment_delay[self.invoice_recipient]
+        defaulted = np.zeros(len(self.businesses), dtype=bool)
+        defaulted[self.invoice_recipient[overdue]] = True
+        return defaulted
+
+    def step(self, day):
+        """Simulates one day: invoice issuance followed by payments, as in start_simulation."""
+        self.issue_invoices(day)
+        self.process_payments(day)
+
+    def balance_sheets(self):
+        """Returns the current balance sheets as a dict of arrays aligned with self.businesses."""
+        return {
+            'cash': self.cash.copy(),
+            'accounts_receivable': self.accounts_receivable.copy(),
+            'accounts_payable': self.accounts_payable.copy(),
+            'debt': self.debt.copy(),
+        }
+
+    def sync_balance_sheets(self):
+        """Writes the array balance sheets back onto each Business.balance_sheet."""
+        for i, business in enumerate(self.businesses):
+            balance_sheet = business.balance_sheet
+            balance_sheet.cash = float(self.cash[i])
+            balance_sheet.accounts_receivable = float(self.accounts_receivable[i])
+            balance_sheet.accounts_payable = float(self.accounts_payable[i])
+            balance_sheet.debt = float(self.debt[i])
@@ -0,0 +1,236 @@
+import csv
+import json
+
+from models import to_date
+
+class EventSink:
+    """
+    Receives simulation events. Every method is a no-op; subclasses override the
+    ones they need. start_simulation, issue_invoices and process_payments call:
+
+    - invoice_issued(simulation_day, invoice)
+    - payment_made(simulation_day, payment, days_overdue)
+    - invoice_defaulted(simulation_day, invoice, days_overdue), every day an
+      invoice past its payer's max_payment_delay goes unpaid
+    - invoice_cleared(simulation_day, invoice, amount), when netting.clear
+      settles amount of an invoice without a payment
+    - end_of_day(day, simulation_day, businesses)
+    - close(), once the run is over
+    """
+
+    def invoice_issued(self, simulation_day, invoice):
+        pass
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        pass
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        pass
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        pass
+
+    def end_of_day(self, day, simulation_day, businesses):
+        pass
+
+    def close(self):
+        pass
+
+class MultiSink(EventSink):
+    """Forwards every event to several sinks."""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def invoice_issued(self, simulation_day, invoice):
+        for sink in self.sinks:
+            sink.invoice_issued(simulation_day, invoice)
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        for sink in self.sinks:
+            sink.payment_made(simulation_day, payment, days_overdue)
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        for sink in self.sinks:
+            sink.invoice_defaulted(simulation_day, invoice, days_overdue)
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        for sink in self.sinks:
+            sink.invoice_cleared(simulation_day, invoice, amount)
+
+    def end_of_day(self, day, simulation_day, businesses):
+        for sink in self.sinks:
+            sink.end_of_day(day, simulation_day, businesses)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+def combine_sinks(*sinks):
+    """Returns None, the single sink, or a MultiSink for the sinks that are not None."""
+    sinks = [sink for sink in sinks if sink is not None]
+    if not sinks:
+        return None
+    return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
+
+class ConsoleSink(EventSink):
+    """The original per-event console messages of process_payments."""
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        payment_status = "on time" if days_overdue == 0 else "late"
+        for invoice in payment.invoices:
+            print(f"Day {to_date(simulation_day)}: {payment.payer.name} paid {payment_status} invoice #{invoice.id}.")
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        print(f"Day {to_date(simulation_day)}: {invoice.recipient.name} has defaulted on invoice #{invoice.id}.")
+
+EVENT_FIELDS = ('event', 'date', 'invoice_id', 'payment_id', 'issuer_id', 'recipient_id', 'amount', 'days_overdue')
+SNAPSHOT_FIELDS = ('day', 'date', 'business_id', 'cash', 'accounts_receivable', 'accounts_payable', 'debt')
+# Column types, used where the format has a schema
+FIELD_TYPES = {
+    'event': 'string', 'date': 'string', 'invoice_id': 'int64', 'payment_id': 'int64', 'issuer_id': 'int64',
+    'recipient_id': 'int64', 'amount': 'float64', 'days_overdue': 'int64', 'day': 'int64', 'business_id': 'int64',
+    'cash': 'float64', 'accounts_receivable': 'float64', 'accounts_payable': 'float64', 'debt': 'float64',
+}
+
+class _CsvWriter:
+    extension = 'csv'
+
+    def __init__(self, path, fields):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fields)
+
+    def write(self, columns):
+        self.writer.writerows(zip(*columns))
+
+    def close(self):
+        self.file.close()
+
+class _NdjsonWriter:
+    extension = 'ndjson'
+
+    def __init__(self, path, fields):
+        self.file = open(path, 'w')
+        self.fields = fields
+
+    def write(self, columns):
+        fields = self.fields
+        self.file.write(''.join(json.dumps(dict(zip(fields, row))) + '\n' for row in zip(*columns)))
+
+    def close(self):
+        self.file.close()
+
+class _ParquetWriter:
+    extension = 'parquet'
+
+    def __init__(self, path, fields):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The parquet format requires the pyarrow package") from None
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(field, pyarrow.type_for_alias(FIELD_TYPES[field])) for field in fields])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, columns):
+        self.writer.write_table(self.pyarrow.table(list(columns), schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {
+    'csv': _CsvWriter,
+    'ndjson': _NdjsonWriter,
+    'parquet': _ParquetWriter,
+}
+
+class _RecordBuffer:
+    """Column-wise record buffer flushed to a writer every buffer_size records."""
+
+    def __init__(self, writer, fields, buffer_size):
+        self.writer = writer
+        self.columns = tuple([] for _ in fields)
+        self.buffer_size = buffer_size
+        self.size = 0
+
+    def append(self, *values):
+        for column, value in zip(self.columns, values):
+            column.append(value)
+        self.size += 1
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.size:
+            self.writer.write(self.columns)
+            for column in self.columns:
+                column.clear()
+            self.size = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+class FileEventSink(EventSink):
+    """
+    Streams events and balance-sheet snapshots to files.
+
+    Events go to <prefix>.events.<ext> and snapshots to <prefix>.snapshots.<ext>,
+    where the format is 'csv', 'ndjson' or 'parquet' (which needs pyarrow).
+    Records are buffered column-wise and written in batches of buffer_size, so
+    memory stays bounded however long the run. A snapshot of every business is
+    taken every snapshot_interval days; 0 disables snapshots.
+    """
+
+    def __init__(self, prefix, format='ndjson', buffer_size=10_000, snapshot_interval=1):
+        if format not in WRITERS:
+            raise ValueError(f"Invalid format: {format}")
+        writer_class = WRITERS[format]
+        self.snapshot_interval = snapshot_interval
+        self.events = _RecordBuffer(
+            writer_class(f"{prefix}.events.{writer_class.extension}", EVENT_FIELDS), EVENT_FIELDS, buffer_size)
+        self.snapshots = None
+        if snapshot_interval:
+            self.snapshots = _RecordBuffer(
+                writer_class(f"{prefix}.snapshots.{writer_class.extension}", SNAPSHOT_FIELDS), SNAPSHOT_FIELDS,
+                buffer_size)
+        self._day = self._date = None  # Last day ordinal written and its date string
+
+    def _date_of(self, simulation_day):
+        if simulation_day != self._day:
+            self._day, self._date = simulation_day, str(to_date(simulation_day))
+        return self._date
+
+    def invoice_issued(self, simulation_day, invoice):
+        self.events.append('invoice_issued', self._date_of(simulation_day), invoice.id, None, invoice.issuer.id,
+                           invoice.recipient.id, invoice.amount, None)
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        payer_id = payment.payer.id
+        for invoice, percentage in zip(payment.invoices, payment.distribution_percentages):
+            self.events.append('payment', self._date_of(simulation_day), invoice.id, payment.id, invoice.issuer.id,
+                               payer_id, payment.amount * (percentage / 100), days_overdue)
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        self.events.append('default', self._date_of(simulation_day), invoice.id, None, invoice.issuer.id,
+                           invoice.recipient.id, invoice.outstanding_balance, days_overdue)
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        self.events.append('cleared', self._date_of(simulation_day), invoice.id, None, invoice.issuer.id,
+                           invoice.recipient.id, amount, None)
+
+    def end_of_day(self, day, simulation_day, businesses):
+        if self.snapshots is None or day % self.snapshot_interval:
+            return
+        date = self._date_of(simulation_day)
+        for business in businesses:
+            balance_sheet = business.balance_sheet
+            self.snapshots.append(day, date, business.id, balance_sheet.cash, balance_sheet.accounts_receivable,
+                                  balance_sheet.accounts_payable, balance_sheet.debt)
+
+    def close(self):
+        self.events.close()
+        if self.snapshots is not None:
+            self.snapshots.close()
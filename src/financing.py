@@ -0,0 +1,151 @@
+"""
+Bank credit lines, overdraft interest and factoring of receivables, driven by BalanceSheet.debt.
+
+Payments never check a business's cash, so cash goes negative whenever a
+business pays more than it has collected. FinancingHook runs at the end of each
+day and funds those shortfalls from outside the network:
+
+1. Interest accrues on the debt drawn on each credit line.
+2. Businesses with cash above target_cash repay their debt with the surplus.
+3. Businesses below target_cash draw on their credit line, up to credit_limit,
+   or up to borrowing_base times their accounts receivable if that is lower.
+4. With factoring_discount set, a shortfall the credit line cannot cover is
+   raised by selling open receivables to a factor, which pays the face value
+   less the discount.
+5. Cash still negative pays overdraft interest.
+
+All the decisions for a day are made at once, on arrays of every business's
+cash, accounts receivable and debt. Balance sheets are only written for
+businesses whose position changed. Only factoring touches invoices: it
+sells the open invoices with the latest due dates that the selling business's
+customers owe it until the shortfall is covered.
+Example:
+
+    financing = FinancingHook(credit_limit=50_000, borrowing_base=0.8, factoring_discount=0.03)
+    start_simulation(businesses, 365, hooks=[financing])
+    print(financing.summary())
+
+Interest and discounts leave the network, so total cash no longer sums to zero
+once financing is used. Factoring is with recourse: payments on a sold invoice
+are passed on to the factor at the next day's run, and amounts written off by
+contagion.propagate_defaults are charged back to the seller. The hook only
+sees balance sheets, so it applies to the object and event engines.
+"""
+import numpy as np
+
+DAYS_PER_YEAR = 365
+
+class FinancingHook:
+    """
+    End-of-day hook for start_simulation financing the businesses' cash shortfalls.
+
+    :param credit_limit: Credit line of each business, a number or an array with
+                         one entry per business.
+    :param borrowing_base: If set, also limits the credit line to this share of
+                           the business's accounts receivable.
+    :param credit_rate: Annual interest rate on the debt, accrued daily onto the debt.
+    :param overdraft_rate: Annual interest rate on negative cash, charged daily to cash.
+    :param factoring_discount: Share of the face value the factor keeps, or None for no factoring.
+    :param target_cash: Cash each business tries to hold.
+    """
+
+    def __init__(self, credit_limit=0.0, borrowing_base=None, credit_rate=0.08, overdraft_rate=0.2,
+                 factoring_discount=None, target_cash=0.0):
+        if factoring_discount is not None and not 0 <= factoring_discount < 1:
+            raise ValueError("factoring_discount must be at least 0 and less than 1")
+        self.credit_limit = credit_limit
+        self.borrowing_base = borrowing_base
+        self.credit_rate = credit_rate
+        self.overdraft_rate = overdraft_rate
+        self.factoring_discount = factoring_discount
+        self.target_cash = target_cash
+        self.totals = dict.fromkeys(('drawn', 'repaid', 'interest', 'overdraft_interest', 'factored', 'factoring_fees'),
+                                    0.0)
+        self.totals['invoices_factored'] = 0
+        self._factored = {}  # invoice id -> [invoice, outstanding balance last passed on to the factor]
+
+    def __call__(self, day, simulation_day, businesses):
+        n = len(businesses)
+        balance_sheets = [business.balance_sheet for business in businesses]
+        cash = np.fromiter((sheet.cash for sheet in balance_sheets), dtype=np.float64, count=n)
+        receivable = np.fromiter((sheet.accounts_receivable for sheet in balance_sheets), dtype=np.float64, count=n)
+        debt = np.fromiter((sheet.debt for sheet in balance_sheets), dtype=np.float64, count=n)
+        start_cash, start_receivable, start_debt = cash.copy(), receivable.copy(), debt.copy()
+
+        if self._factored:
+            self._pass_on_collections(businesses, cash, receivable)
+
+        interest = debt * (self.credit_rate / DAYS_PER_YEAR)
+        debt += interest
+        repayment = np.minimum(debt, np.maximum(cash - self.target_cash, 0))
+        cash -= repayment
+        debt -= repayment
+
+        limit = np.broadcast_to(np.asarray(self.credit_limit, dtype=np.float64), (n,))
+        if self.borrowing_base is not None:
+            limit = np.minimum(limit, self.borrowing_base * np.maximum(receivable, 0))
+        shortfall = np.maximum(self.target_cash - cash, 0)
+        draw = np.minimum(shortfall, np.maximum(limit - debt, 0))
+        cash += draw
+        debt += draw
+
+        if self.factoring_discount is not None:
+            shortfall = np.maximum(self.target_cash - cash, 0)
+            for i in np.flatnonzero((shortfall > 0) & (receivable > 0)).tolist():
+                face = self._factor(businesses[i], shortfall[i] / (1 - self.factoring_discount))
+                cash[i] += face * (1 - self.factoring_discount)
+                receivable[i] -= face
+
+        overdraft_interest = np.maximum(-cash, 0) * (self.overdraft_rate / DAYS_PER_YEAR)
+        cash -= overdraft_interest
+
+        self.totals['drawn'] += float(draw.sum())
+        self.totals['repaid'] += float(repayment.sum())
+        self.totals['interest'] += float(interest.sum())
+        self.totals['overdraft_interest'] += float(overdraft_interest.sum())
+
+        # Bulk write-back, only for the businesses whose position changed
+        changed = (cash != start_cash) | (receivable != start_receivable) | (debt != start_debt)
+        for i in np.flatnonzero(changed).tolist():
+            sheet = balance_sheets[i]
+            sheet.update_cash(float(cash[i] - start_cash[i]))
+            sheet.update_accounts_receivable(float(receivable[i] - start_receivable[i]))
+            sheet.update_debt(float(debt[i] - start_debt[i]))
+
+    def _factor(self, business, amount):
+        """
+        Sells business's open receivables, latest due date first, until their face value reaches amount.
+        The receivables are read from its customers' open-invoice books, so the cost follows the open
+        invoices rather than the length of the business's history.
+        """
+        receivables = [invoice for customer in business.customer_list for invoice in customer.open_invoices
+                       if invoice.issuer is business and invoice.id not in self._factored]
+        receivables.sort(key=lambda invoice: invoice.due_date, reverse=True)
+        face = 0.0
+        for invoice in receivables:
+            if face >= amount:
+                break
+            self._factored[invoice.id] = [invoice, invoice.outstanding_balance]
+            face += invoice.outstanding_balance
+            self.totals['invoices_factored'] += 1
+        self.totals['factored'] += face
+        self.totals['factoring_fees'] += face * self.factoring_discount
+        return face
+
+    def _pass_on_collections(self, businesses, cash, receivable):
+        # Payments on sold invoices went to the seller's cash and receivables; move them to the factor
+        position = {id(business): i for i, business in enumerate(businesses)}
+        for invoice_id, entry in list(self._factored.items()):
+            invoice, balance = entry
+            collected = balance - invoice.outstanding_balance
+            if collected:
+                i = position[id(invoice.issuer)]
+                cash[i] -= collected
+                receivable[i] += collected
+                entry[1] = invoice.outstanding_balance
+            if invoice.outstanding_balance <= 0:
+                del self._factored[invoice_id]
+
+    def summary(self):
+        """Totals so far, plus the face value of sold invoices still open."""
+        return {**self.totals, 'factored_open': sum(balance for _, balance in self._factored.values())}
@@ -0,0 +1,401 @@
+from array import array
+from collections.abc import Sequence
+import numpy as np
+from models import Business, to_date
+
+ISSUED, PARTIALLY_PAID, PAID, WRITTEN_OFF = 0, 1, 2, 3
+STATUS_NAMES = ('issued', 'partially_paid', 'paid', 'written_off')
+NO_DAY = -1  # Day ordinal stored when a date is not set
+NO_ROW = -1  # Row stored when a link to another row is not set
+
+def day_to_column(value):
+    """Converts a day ordinal or None to the value stored in a day column."""
+    return NO_DAY if value is None else value
+
+def column_to_day(day):
+    """Converts a stored day column value back to a day ordinal, or None for NO_DAY."""
+    return None if day == NO_DAY else int(day)
+
+class _Table:
+    """Growable struct-of-arrays: one typed NumPy column per field."""
+
+    def __init__(self, dtypes, capacity):
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def append(self, **values):
+        row = self.size
+        if row == len(next(iter(self.columns.values()))):
+            for name, column in self.columns.items():
+                grown = np.zeros(2 * len(column), dtype=column.dtype)
+                grown[:row] = column
+                self.columns[name] = grown
+        for name, value in values.items():
+            self.columns[name][row] = value
+        self.size += 1
+        return row
+
+    def __getitem__(self, name):
+        """The filled part of a column."""
+        return self.columns[name][:self.size]
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+class RowList(Sequence):
+    """
+    List of ledger invoices or payments stored as row numbers.
+
+    Appending a proxy keeps only its row, 8 bytes in an array('q'); proxies are
+    made again when an item is read. Business uses these for its invoice and
+    payment lists and indexes when it is backed by a ledger.
+    """
+    __slots__ = ('_ledger', '_proxy', '_rows')
+
+    def __init__(self, ledger, proxy):
+        self._ledger = ledger
+        self._proxy = proxy  # LedgerInvoice or LedgerPayment
+        self._rows = array('q')
+
+    def append(self, item):
+        self._rows.append(item.row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._proxy(self._ledger, row) for row in self._rows[index]]
+        return self._proxy(self._ledger, self._rows[index])
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        ledger, proxy = self._ledger, self._proxy
+        for row in self._rows:
+            yield proxy(ledger, row)
+
+    def __reversed__(self):
+        ledger, proxy = self._ledger, self._proxy
+        for row in reversed(self._rows):
+            yield proxy(ledger, row)
+
+    def __contains__(self, item):
+        return isinstance(item, self._proxy) and item.ledger is self._ledger and item.row in self._rows
+
+    def __eq__(self, other):
+        return isinstance(other, (list, RowList)) and list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class Ledger:
+    """
+    Compact storage for invoice and payment histories.
+
+    Invoices and payments live in typed NumPy columns (integer ids, float64
+    amounts, int32 day ordinals, uint8 status codes) instead of one Python object
+    each. Businesses created with ledger=... issue LedgerInvoice and
+    LedgerPayment proxies, which expose the Invoice/Payment attribute API
+    by reading and writing those columns. Ids are row numbers + 1, so all
+    businesses of a run should share one ledger. The businesses keep row
+    numbers (see RowList), not proxies, and look invoices and payments up by
+    id in the ledger.
+    """
+
+    def __init__(self, capacity=1024):
+        self.businesses = {}  # Business id -> Business
+        self.invoices = _Table({
+            'issuer': np.int64,
+            'recipient': np.int64,
+            'amount': np.float64,
+            'outstanding_balance': np.float64,
+            'due_day': np.int32,
+            'paid_day': np.int32,
+            'status': np.uint8,
+            'payment_count': np.uint16,
+            'first_allocation': np.int64,  # First and last allocation row applied to the invoice, or NO_ROW
+            'last_allocation': np.int64,
+        }, capacity)
+        self.payments = _Table({
+            'payer': np.int64,
+            'amount': np.float64,
+            'payment_day': np.int32,
+            'first_allocation': np.int64,
+            'allocation_count': np.int32,
+            'first_payee': np.int64,
+            'payee_count': np.int32,
+        }, capacity)
+        # One row per (payment, invoice) pair, stored contiguously per payment and
+        # chained per invoice through next_allocation
+        self.allocations = _Table({
+            'payment': np.int64,
+            'invoice': np.int64,
+            'percentage': np.float64,
+            'next_allocation': np.int64,
+        }, capacity)
+        # One row per (payment, payee) pair with the netted amount credited to the payee
+        self.payees = _Table({
+            'payment': np.int64,
+            'payee': np.int64,
+            'amount': np.float64,
+        }, capacity)
+
+    def register(self, business):
+        self.businesses[business.id] = business
+
+    @property
+    def nbytes(self):
+        return self.invoices.nbytes + self.payments.nbytes + self.allocations.nbytes + self.payees.nbytes
+
+    def invoice(self, invoice_id):
+        """Returns a proxy for the invoice with the given id."""
+        if not 1 <= invoice_id <= self.invoices.size:
+            raise KeyError(invoice_id)
+        return LedgerInvoice(self, invoice_id - 1)
+
+    def payment(self, payment_id):
+        """Returns a proxy for the payment with the given id."""
+        if not 1 <= payment_id <= self.payments.size:
+            raise KeyError(payment_id)
+        return LedgerPayment(self, payment_id - 1)
+
+    def invoice_list(self):
+        """Returns an empty RowList of invoices."""
+        return RowList(self, LedgerInvoice)
+
+    def payment_list(self):
+        """Returns an empty RowList of payments."""
+        return RowList(self, LedgerPayment)
+
+    def find_invoice(self, invoice_id, issuer=None, recipient=None):
+        """
+        Returns a proxy for the invoice with the given id, or None if there is no
+        such invoice or it was not issued by issuer or sent to recipient.
+        """
+        if not 1 <= invoice_id <= self.invoices.size:
+            return None
+        row = invoice_id - 1
+        columns = self.invoices.columns
+        if issuer is not None and columns['issuer'][row] != issuer.id:
+            return None
+        if recipient is not None and columns['recipient'][row] != recipient.id:
+            return None
+        return LedgerInvoice(self, row)
+
+    def find_payment(self, payment_id, payer=None):
+        """Returns a proxy for the payment with the given id, or None if there is none made by payer."""
+        if not 1 <= payment_id <= self.payments.size:
+            return None
+        if payer is not None and self.payments.columns['payer'][payment_id - 1] != payer.id:
+            return None
+        return LedgerPayment(self, payment_id - 1)
+
+    def allocation_rows(self, invoice_row):
+        """Yields the allocation rows applied to an invoice, oldest first."""
+        next_allocation = self.allocations.columns['next_allocation']
+        row = int(self.invoices.columns['first_allocation'][invoice_row])
+        while row != NO_ROW:
+            yield row
+            row = int(next_allocation[row])
+
+    def add_invoice(self, issuer, recipient, amount, due_date):
+        if not isinstance(issuer, Business):
+            raise TypeError("issuer must be an instance of Business")
+        if not isinstance(recipient, Business):
+            raise TypeError("recipient must be an instance of Business")
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        self.businesses.setdefault(issuer.id, issuer)
+        self.businesses.setdefault(recipient.id, recipient)
+
+        row = self.invoices.append(
+            issuer=issuer.id,
+            recipient=recipient.id,
+            amount=amount,
+            outstanding_balance=amount,
+            due_day=day_to_column(due_date),
+            paid_day=NO_DAY,
+            status=ISSUED,
+            first_allocation=NO_ROW,
+            last_allocation=NO_ROW,
+        )
+        return LedgerInvoice(self, row)
+
+    def add_payment(self, payer, amount, payment_date, invoices, distribution_percentages, payee_amounts=None):
+        """:param payee_amounts: Optional dict of payee id -> amount credited, as Payment.payee_amounts."""
+        payee_amounts = payee_amounts or {}
+        row = self.payments.append(
+            payer=payer.id,
+            amount=amount,
+            payment_day=day_to_column(payment_date),
+            first_allocation=self.allocations.size,
+            allocation_count=len(invoices),
+            first_payee=self.payees.size,
+            payee_count=len(payee_amounts),
+        )
+        self.businesses.setdefault(payer.id, payer)
+        for invoice, percentage in zip(invoices, distribution_percentages):
+            allocation = self.allocations.append(payment=row, invoice=invoice.row, percentage=percentage,
+                                                 next_allocation=NO_ROW)
+            # Chain the allocation to the invoice's earlier ones
+            invoice_columns = self.invoices.columns
+            last = invoice_columns['last_allocation'][invoice.row]
+            if last == NO_ROW:
+                invoice_columns['first_allocation'][invoice.row] = allocation
+            else:
+                self.allocations.columns['next_allocation'][last] = allocation
+            invoice_columns['last_allocation'][invoice.row] = allocation
+        for payee_id, payee_amount in payee_amounts.items():
+            self.payees.append(payment=row, payee=payee_id, amount=payee_amount)
+        return LedgerPayment(self, row)
+
+class LedgerInvoice:
+    """Invoice proxy over one row of Ledger.invoices."""
+    __slots__ = ('ledger', 'row')
+
+    def __init__(self, ledger, row):
+        self.ledger = ledger
+        self.row = row
+
+    def _get(self, name):
+        return self.ledger.invoices.columns[name][self.row]
+
+    @property
+    def id(self):
+        return self.row + 1
+
+    @property
+    def issuer(self):
+        return self.ledger.businesses[int(self._get('issuer'))]
+
+    @property
+    def recipient(self):
+        return self.ledger.businesses[int(self._get('recipient'))]
+
+    @property
+    def amount(self):
+        return float(self._get('amount'))
+
+    @property
+    def outstanding_balance(self):
+        return float(self._get('outstanding_balance'))
+
+    @property
+    def due_date(self):
+        return column_to_day(self._get('due_day'))
+
+    @property
+    def paid_date(self):
+        return column_to_day(self._get('paid_day'))
+
+    @property
+    def status(self):
+        return STATUS_NAMES[self._get('status')]
+
+    @property
+    def payments(self):
+        """Payments applied to this invoice, oldest first."""
+        payment = self.ledger.allocations.columns['payment']
+        rows = dict.fromkeys(int(payment[row]) for row in self.ledger.allocation_rows(self.row))
+        return [LedgerPayment(self.ledger, row) for row in rows]
+
+    def make_payment(self, payment_amount, payment_date=None, payment=None):
+        """Apply a payment to this invoice, reducing the outstanding balance."""
+        columns = self.ledger.invoices.columns
+        row = self.row
+        outstanding = columns['outstanding_balance'][row] - payment_amount
+        if outstanding <= 0:
+            columns['outstanding_balance'][row] = 0  # Prevent negative balance
+            columns['status'][row] = PAID
+            columns['paid_day'][row] = day_to_column(payment_date)
+            self.recipient.open_invoices.discard(self)
+        else:
+            columns['outstanding_balance'][row] = outstanding
+            columns['status'][row] = PARTIALLY_PAID
+        if payment:
+            columns['payment_count'][row] += 1
+
+    def write_down(self, amount):
+        """Writes off part of the outstanding balance without any payment; see Invoice.write_down."""
+        columns = self.ledger.invoices.columns
+        outstanding = columns['outstanding_balance'][self.row] - amount
+        if outstanding <= 0:
+            columns['outstanding_balance'][self.row] = 0
+            columns['status'][self.row] = WRITTEN_OFF
+            self.recipient.open_invoices.discard(self)
+        else:
+            columns['outstanding_balance'][self.row] = outstanding
+
+    def __eq__(self, other):
+        return isinstance(other, LedgerInvoice) and other.ledger is self.ledger and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.ledger), self.row))
+
+    def __repr__(self):
+        return (f"Invoice(ID: {self.id}, Issuer: {self.issuer.name}, Recipient: {self.recipient.name}, "
+                f"Amount: {self.amount}, Outstanding: {self.outstanding_balance}, Due: {to_date(self.due_date)}, "
+                f"Status: {self.status}, Payments: {self._get('payment_count')})")
+
+class LedgerPayment:
+    """Payment proxy over one row of Ledger.payments and its allocation rows."""
+    __slots__ = ('ledger', 'row')
+
+    def __init__(self, ledger, row):
+        self.ledger = ledger
+        self.row = row
+
+    def _get(self, name):
+        return self.ledger.payments.columns[name][self.row]
+
+    def _allocations(self):
+        start = int(self._get('first_allocation'))
+        return slice(start, start + int(self._get('allocation_count')))
+
+    @property
+    def id(self):
+        return self.row + 1
+
+    @property
+    def payer(self):
+        return self.ledger.businesses[int(self._get('payer'))]
+
+    @property
+    def amount(self):
+        return float(self._get('amount'))
+
+    @property
+    def payment_date(self):
+        return column_to_day(self._get('payment_day'))
+
+    @property
+    def invoices(self):
+        rows = self.ledger.allocations.columns['invoice'][self._allocations()]
+        return [LedgerInvoice(self.ledger, int(row)) for row in rows]
+
+    @property
+    def distribution_percentages(self):
+        return self.ledger.allocations.columns['percentage'][self._allocations()].tolist()
+
+    @property
+    def payee_amounts(self):
+        start = int(self._get('first_payee'))
+        rows = slice(start, start + int(self._get('payee_count')))
+        columns = self.ledger.payees.columns
+        return dict(zip(columns['payee'][rows].tolist(), columns['amount'][rows].tolist()))
+
+    def apply_to_invoices(self):
+        amount = self.amount
+        payment_date = self.payment_date
+        for invoice, percentage in zip(self.invoices, self.distribution_percentages):
+            invoice.make_payment(amount * (percentage / 100), payment_date, self)
+
+    def __eq__(self, other):
+        return isinstance(other, LedgerPayment) and other.ledger is self.ledger and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.ledger), self.row))
+
+    def __repr__(self):
+        return (f"Payment(ID: {self.id}, Payer: {self.payer.name}, Amount: {self.amount}, "
+                f"Date: {to_date(self.payment_date)}, Payees: {list(self.payee_amounts.keys())})")
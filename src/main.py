@@ -1,11 +1,13 @@
 # main.py
 from business_attributes import AttributesMenu
-from models import Business, BusinessAttributes
-from network import create_network_graph, update_network_graph, visualize_network
+from models import EPOCH, Business, BusinessAttributes, to_date, to_day
+import topology
+from events import ConsoleSink, combine_sinks
+from profiling import NULL_PROFILER
+from buffered_rng import BufferedRNG
 import random
-import datetime
-import networkx as nx
-import matplotlib.pyplot as plt
+
+PAYMENT_TERMS = 30  # Days from issuing an invoice to its due date
 
 def create_businesses():
     while True:
@@ -17,7 +19,7 @@ def create_businesses():
         except ValueError as e:
             print(f"Invalid input: {e}. Please try again.")
     
-    businesses = []
+    preset_names = []
 
     for i in range(num_businesses):
         print("\nSelect attributes for Business #{}:".format(i + 1))
@@ -29,14 +31,27 @@ def create_businesses():
             else:
                 print("Invalid choice. Please choose from A1 to F5.")
         
-        attributes = AttributesMenu.get_attribute(selected_attr)
-        businesses.append(Business(id=i, name=f"Business {i + 1}", attributes=attributes))
+        preset_names.append(selected_attr)
+
+    return build_businesses(preset_names)
+
+def build_businesses(preset_names, ledger=None):
+    """
+    Creates one Business per preset name, without prompting.
 
+    :param ledger: Optional ledger.Ledger shared by all businesses to store invoices and payments compactly.
+    """
+    businesses = []
+    for i, preset_name in enumerate(preset_names):
+        attributes = AttributesMenu.get_attribute(preset_name)
+        if attributes is None:
+            raise ValueError(f"Unknown preset: {preset_name}")
+        businesses.append(Business(id=i, name=f"Business {i + 1}", attributes=attributes, ledger=ledger))
     return businesses
 
-def adjust_invoice_amount(issuer, recipient):
+def adjust_invoice_amount(issuer, recipient, rng=random):
     # Basic idea: Larger businesses can issue larger invoices, but also consider the recipient's size
-    base_amount = random.randint(1_000, 10_000)  # Base range for invoice amounts
+    base_amount = rng.randint(1_000, 10_000)  # Base range for invoice amounts
 
     # Adjust based on the issuer's volume: fewer invoices mean potentially larger amounts per invoice
     issuer_adjustment = 365 / issuer.attributes.invoices_per_year
@@ -65,25 +80,7 @@ def setup_network(businesses):
         # Implement specific error checking relevant to how you design this interaction
         pass
 
-
-    potential_customers_pairs = []
-    # Step 1: Gather potential customer pairs, avoiding mutual relationships
-    for business in businesses:
-        other_businesses = [b for b in businesses if b != business]
-        for potential_customer in other_businesses:
-            if (potential_customer, business) not in potential_customers_pairs:
-                potential_customers_pairs.append((business, potential_customer))
-
-    # Randomly shuffle the list to simulate random selection of customer relationships
-    random.shuffle(potential_customers_pairs)
-
-    # Step 2: Establish customer relationships from the shuffled list
-    for business, customer in potential_customers_pairs:
-        if customer not in business.customer_list and len(business.customer_list) < len(businesses) - 1:
-            business.add_customer(customer)
-            # Calculate a realistic average invoice amount based on both businesses
-            average_invoice_amount = adjust_invoice_amount(business, customer)
-            business.attributes.set_customer_average(customer, average_invoice_amount)
+    connect_businesses(businesses)
 
     # Debugging: Print relationships and average invoice amounts
     for business in businesses:
@@ -92,56 +89,97 @@ def setup_network(businesses):
             average = business.attributes.customer_averages.get(customer, 'N/A')
             print(f"    Average invoice for {customer.name}: {average}")
 
-def issue_invoices(businesses, simulation_day):
+def connect_businesses(businesses, max_customers=None, rng=random):
+    """
+    Establishes customer relationships without prompting.
+
+    :param max_customers: Optional cap on the number of customers per business;
+                          by default every business may take all others as customers.
+    :param rng: Source of randomness, the random module or a random.Random instance.
+    """
+    # Every pair is connected once, from the earlier business to the later one, in
+    # random order; see topology.dense. Generated as arrays instead of a pair list.
+    rng = topology.as_generator(rng)
+    issuers, customers = topology.dense(len(businesses), max_customers=max_customers, rng=rng)
+    topology.connect(businesses, issuers, customers, rng)
+
+def issue_invoices(businesses, simulation_day, rng=random, sink=None):
+    """
+    Issues each business's invoices for the day. A business with its own
+    business.rng draws from it, the others from rng. Failed businesses neither
+    issue nor receive invoices.
+    """
     for business in businesses:
-        # Iterate through each customer of the business
-        for customer in business.customer_list:
-            # Calculate the probability of issuing an invoice to this customer today
-            # This calculation assumes a uniform distribution over the year for simplicity
-            total_invoices = business.attributes.invoices_per_year
-            customer_invoices = total_invoices / len(business.customer_list)
-            daily_invoice_probability = customer_invoices / 365.0
-            
-            # Decide whether to issue an invoice based on the calculated probability
-            if random.random() < daily_invoice_probability:
-                # Determine the due date for the invoice
-                due_date = simulation_day + datetime.timedelta(days=30)  # Example: 30 days from now
-                
-                # Issue the invoice
-                new_invoice = business.issue_invoice(customer, due_date)
-                
-                # print(f"Day {simulation_day}: {business.name} issued an invoice to {customer.name}")
-                # print(f"Day {simulation_day}: Issued Invoice - ID: {new_invoice.id}, Issuer: {new_invoice.issuer.name}, "
-                #       f"Recipient: {new_invoice.recipient.name}, Amount: {new_invoice.amount}, "
-                #       f"Due Date: {new_invoice.due_date.strftime('%Y-%m-%d')}, Status: {new_invoice.status}")
-
-def process_payments(businesses, simulation_day):
+        if not business.customer_list or business.failed:
+            continue
+        business_rng = business.rng or rng
+        # Calculate the probability of issuing an invoice to each customer today
+        # This calculation assumes a uniform distribution over the year for simplicity
+        total_invoices = business.attributes.invoices_per_year
+        customer_invoices = total_invoices / len(business.customer_list)
+        daily_invoice_probability = customer_invoices / 365.0
+
+        # Iterate through the customers that get an invoice based on the calculated probability
+        for customer in invoiced_customers(business.customer_list, daily_invoice_probability, business_rng):
+            if customer.failed:
+                continue
+            # Determine the due date for the invoice
+            due_date = simulation_day + PAYMENT_TERMS
+
+            # Issue the invoice
+            new_invoice = business.issue_invoice(customer, due_date, business_rng)
+            if sink is not None:
+                sink.invoice_issued(simulation_day, new_invoice)
+
+def invoiced_customers(customer_list, probability, rng=random):
+    """
+    Yields the customers that get an invoice today, each one independently with
+    probability. A BufferedRNG decides for all of them with one NumPy draw;
+    other rngs draw once per customer, interleaved with the invoice amounts.
+    """
+    if isinstance(rng, BufferedRNG):
+        for i in rng.bernoulli_indices(len(customer_list), probability):
+            yield customer_list[i]
+        return
+    for customer in customer_list:
+        if rng.random() < probability:
+            yield customer
+
+def process_payments(businesses, simulation_day, verbose=True, rng=random, sink=None):
+    """
+    Pays due and overdue invoices. Payment and default events go to sink; without
+    one, verbose=True prints them to the console. A business with its own
+    business.rng decides with it, the others with rng. Failed businesses pay nothing.
+    """
+    if sink is None and verbose:
+        sink = ConsoleSink()
     for business in businesses:
-        # Filter out fully paid invoices before processing
-        unpaid_invoices = [invoice for invoice in business.received_invoices if invoice.status != 'paid']
+        if business.failed:
+            continue
+        # Only unpaid invoices that are due today or overdue, from the open-invoice index
+        unpaid_invoices = business.open_invoices.due_invoices(simulation_day)
+        business_rng = business.rng or rng
 
         for invoice in unpaid_invoices:
             # Calculate days overdue, if any
-            days_overdue = (simulation_day - invoice.due_date).days if simulation_day > invoice.due_date else 0
-
-            # If the invoice is due today or is overdue
-            if simulation_day >= invoice.due_date:
-                payment_probability = business.attributes.on_time_payment_percentage
-                # Adjust probability for late payments if overdue and not yet at max delay
-                if days_overdue > 0 and days_overdue <= business.attributes.max_payment_delay:
-                    payment_probability /= 2  # Halve the probability for late payments
-
-                # Decide to pay based on the (adjusted) probability
-                if random.randint(1, 100) <= payment_probability:
-                    # Determine amount to pay (full amount for new, outstanding balance for partial)
-                    amount_to_pay = invoice.outstanding_balance
-                    business.issue_payment([invoice], amount_to_pay)
-                    payment_status = "on time" if days_overdue == 0 else "late"
-                    print(f"Day {simulation_day}: {business.name} paid {payment_status} invoice #{invoice.id}.")
-
-                elif days_overdue > business.attributes.max_payment_delay:
-                    # Handle cases where the payment is defaulted
-                    print(f"Day {simulation_day}: {business.name} has defaulted on invoice #{invoice.id}.")
+            days_overdue = simulation_day - invoice.due_date if simulation_day > invoice.due_date else 0
+
+            payment_probability = business.attributes.on_time_payment_percentage
+            # Adjust probability for late payments if overdue and not yet at max delay
+            if days_overdue > 0 and days_overdue <= business.attributes.max_payment_delay:
+                payment_probability /= 2  # Halve the probability for late payments
+
+            # Decide to pay based on the (adjusted) probability
+            if business_rng.randint(1, 100) <= payment_probability:
+                # Determine amount to pay (full amount for new, outstanding balance for partial)
+                amount_to_pay = invoice.outstanding_balance
+                payment = business.issue_payment([invoice], amount_to_pay, simulation_day)
+                if sink is not None:
+                    sink.payment_made(simulation_day, payment, days_overdue)
+
+            elif days_overdue > business.attributes.max_payment_delay and sink is not None:
+                # Handle cases where the payment is defaulted
+                sink.invoice_defaulted(simulation_day, invoice, days_overdue)
 
 def print_business_details(businesses, day):
     print(f"\nEnd of Day {day}: Business Details and Balance Sheets\n" + "-"*60)
@@ -153,31 +191,132 @@ def print_business_details(businesses, day):
         # and assuming you want to print it separately, call its __repr__ too
         print(business.balance_sheet, "\n")
 
-def start_simulation(businesses, num_days):
-    simulation_start_date = datetime.datetime.now().date()  # Set the simulation's start date
-    print("Simulation starting...")
-    
+def start_simulation(businesses, num_days, engine='object', seed=None, verbose=True, visualize=False,
+                     rng=random, hooks=(), sink=None, start_date=None, first_day=1, profiler=None):
+    """
+    Runs the simulation for num_days.
+
+    engine='object' steps the Business/Invoice/Payment objects; engine='vectorized'
+    draws each day for the whole network with engine.VectorizedEngine and writes
+    the resulting balance sheets back onto the businesses. seed seeds the
+    vectorized engine's NumPy generator; if omitted it is drawn from rng.
+    engine='event' runs the objects with scheduler.EventScheduler, which draws
+    when each invoice and payment happens instead of rolling for every edge and
+    invoice every day, so sparse networks over long horizons run much faster.
+
+    verbose=False suppresses the daily console output. visualize=True rebuilds
+    and draws the network graph every day; networkx and matplotlib are only
+    imported in that case. visualize may instead be an output path, which renders
+    headless frames or an animation with network.NetworkRenderer, e.g.
+    'frames/day-{day:04d}.png' or 'run.gif'.
+
+    rng is the source of randomness for the object engine: the random module by
+    default, or a random.Random instance to give the run its own stream. Each of
+    hooks is called as hook(day, simulation_day, businesses) at the end of every day.
+
+    sink is an events.EventSink receiving invoice, payment and default events
+    (object and event engines) and end-of-day calls; it is closed when the run ends.
+    With verbose=False and no sink nothing is printed or recorded.
+
+    start_date is the date before day 1 (models.EPOCH by default) and first_day
+    the first day to run, so a run restored from a checkpoint (see checkpoint.py)
+    continues with first_day=checkpoint.day + 1 up to day num_days. Inside the
+    run every date is an integer day ordinal: simulation_day, passed to hooks
+    and sinks, is start_date.toordinal() + day, and invoice due and paid dates
+    and payment dates are ordinals too. models.to_date turns one back into a date.
+
+    profiler is an optional profiling.RunProfiler timing each phase of every day
+    and counting the day's invoices and payments.
+    """
+    if engine not in ('object', 'vectorized', 'event'):
+        raise ValueError(f"Invalid engine: {engine}")
+
+    # Day ordinal of the day before day 1
+    start_day = to_day(start_date if start_date is not None else EPOCH)
+    if verbose:
+        print("Simulation starting...")
     
+    if engine == 'vectorized':
+        import numpy as np
+        from engine import VectorizedEngine
+        if seed is None:
+            seed = rng.getrandbits(64)
+        vectorized_engine = VectorizedEngine(businesses, rng=np.random.default_rng(seed))
+    run_sink = sink
+    graph_tracker = renderer = layout = None
+    if isinstance(visualize, str):
+        from network import NetworkRenderer
+        renderer = NetworkRenderer(businesses, visualize)
+        visualize = False
+    elif visualize:
+        from network import IncrementalNetworkGraph, create_network_graph, update_network_graph, visualize_network
+        if engine != 'vectorized':
+            graph_tracker = IncrementalNetworkGraph(businesses, metric='outstanding_invoices')
+    sink = combine_sinks(ConsoleSink() if verbose else None, graph_tracker, renderer, sink)
+    if profiler is None:
+        profiler = NULL_PROFILER
+    elif engine != 'vectorized':
+        # The vectorized engine sends no events; its counts are read off the engine below
+        sink = combine_sinks(sink, profiler)
+    if engine == 'event':
+        from scheduler import EventScheduler
+        event_scheduler = EventScheduler(businesses, start_day, rng=rng, first_day=first_day, sink=sink)
     
-    for day in range(1, num_days + 1):
-        simulation_day = simulation_start_date + datetime.timedelta(days = day)
-        print(f"Day {day} of {num_days} ({simulation_day})")
+    for day in range(first_day, num_days + 1):
+        profiler.start_day(day)
+        simulation_day = start_day + day
+        if verbose:
+            print(f"Day {day} of {num_days} ({to_date(simulation_day)})")
+        profiler.lap('console')
         
         # Daily simulation activities
-        issue_invoices(businesses, simulation_day)
-        process_payments(businesses, simulation_day)
+        if engine == 'vectorized':
+            invoices_issued, payments_made = vectorized_engine.invoices_issued, vectorized_engine.payments_made
+            vectorized_engine.step(day)
+            if verbose or visualize or hooks or sink is not None or day == num_days:
+                vectorized_engine.sync_balance_sheets()
+            profiler.lap('vectorized_step')
+            profiler.count('invoices_issued', vectorized_engine.invoices_issued - invoices_issued)
+            profiler.count('invoices_paid', vectorized_engine.payments_made - payments_made)
+        elif engine == 'event':
+            event_scheduler.advance(day)
+            profiler.lap('event_scheduler')
+        else:
+            issue_invoices(businesses, simulation_day, rng, sink=sink)
+            profiler.lap('issue_invoices')
+            process_payments(businesses, simulation_day, verbose=False, rng=rng, sink=sink)
+            profiler.lap('process_payments')
         
         # Optional: Graph update and visualization
-        # network_graph = create_network_graph(businesses)
-        # update_network_graph(network_graph, businesses, metric='outstanding_invoices')
-        # visualize_network(network_graph, day)
+        if graph_tracker is not None:
+            graph_tracker.refresh()
+            layout = visualize_network(graph_tracker.graph, day, pos=layout)
+            profiler.lap('graph')
+        elif visualize:
+            network_graph = create_network_graph(businesses)
+            update_network_graph(network_graph, businesses, metric='outstanding_invoices')
+            layout = visualize_network(network_graph, day, pos=layout)
+            profiler.lap('graph')
     
- 
-        print_business_details(businesses, day)
-       
-    print("Simulation completed.")
+        for hook in hooks:
+            hook(day, simulation_day, businesses)
+        profiler.lap('hooks')
+        if sink is not None:
+            sink.end_of_day(day, simulation_day, businesses)
+        profiler.lap('sinks')
 
-# Example integration with visualization and dynamic graph update to be implemented as needed.
+        if verbose:
+            print_business_details(businesses, day)
+        profiler.lap('console')
+        profiler.end_day()
+       
+    if run_sink is not None:
+        run_sink.close()
+    if renderer is not None:
+        renderer.close()
+    profiler.close()
+    if verbose:
+        print("Simulation completed.")
 
 
 def main():
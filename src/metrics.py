@@ -0,0 +1,130 @@
+"""
+Daily time series of a run, kept in preallocated NumPy arrays.
+
+MetricsRecorder is an events.EventSink. Before the run it allocates one
+(days x businesses) array for each balance-sheet field and one array of length
+days for each network-wide aggregate. Each day's values are written in place,
+and close() saves everything in one np.savez call. Example:
+
+    metrics = MetricsRecorder(businesses, num_days, path='run.metrics.npz')
+    start_simulation(businesses, num_days, verbose=False, sink=metrics)
+    metrics.dso  # Network days sales outstanding on each day
+
+The balance sheets are recorded with every engine. The invoice and payment
+counts come from the sink events, which only the object and event engines
+send.
+"""
+import numpy as np
+
+from events import EventSink
+
+BALANCE_FIELDS = ('cash', 'accounts_receivable', 'accounts_payable', 'debt')
+# Network-wide aggregate -> dtype
+AGGREGATE_FIELDS = {
+    'invoices_issued': np.int64,
+    'amount_issued': np.float64,
+    'invoices_paid': np.int64,
+    'amount_paid': np.float64,
+    'invoices_overdue': np.int64,
+    'amount_overdue': np.float64,
+    'invoices_defaulted': np.int64,
+    'invoices_cleared': np.int64,
+    'amount_cleared': np.float64,
+    'dso': np.float64,
+}
+
+class MetricsRecorder(EventSink):
+    """
+    Records per-business balance sheets and network aggregates for days
+    first_day to num_days of a run.
+
+    invoices_issued and invoices_paid count the day's invoices and the invoices
+    settled by the day's payments. invoices_overdue is the number of open
+    invoices past their due date at the end of the day. invoices_defaulted
+    counts invoices going into default that day, each only once.
+    invoices_cleared and amount_cleared count the invoices netting settled that
+    day and the amount it settled on them. dso is the
+    network's days sales outstanding: total accounts receivable divided by the
+    average amount invoiced per day over the last dso_window days.
+
+    :param path: Where close() saves the arrays as .npz; None to keep them in memory only.
+    """
+
+    def __init__(self, businesses, num_days, first_day=1, dso_window=30, path=None):
+        num_rows = num_days - first_day + 1
+        if num_rows <= 0:
+            raise ValueError("num_days must not be before first_day")
+        self.day = np.arange(first_day, num_days + 1)
+        self.business_id = np.array([business.id for business in businesses])
+        # One row per day of (business, field) values, so each day is filled with a single assignment
+        self.balances = np.zeros((num_rows, len(businesses), len(BALANCE_FIELDS)))
+        for field, dtype in AGGREGATE_FIELDS.items():
+            setattr(self, field, np.zeros(num_rows, dtype=dtype))
+        self.dso_window = dso_window
+        self.path = path
+        self._row = 0  # Row of the day in progress
+        self._defaulted = set()
+
+    def __getattr__(self, name):
+        # cash, accounts_receivable, ... as (days x businesses) views of balances
+        if name in BALANCE_FIELDS:
+            return self.balances[:, :, BALANCE_FIELDS.index(name)]
+        raise AttributeError(name)
+
+    def invoice_issued(self, simulation_day, invoice):
+        self.invoices_issued[self._row] += 1
+        self.amount_issued[self._row] += invoice.amount
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        self.invoices_paid[self._row] += len(payment.invoices)
+        self.amount_paid[self._row] += payment.amount
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        # The object engine reports a defaulted invoice every day it stays unpaid
+        if invoice.id not in self._defaulted:
+            self._defaulted.add(invoice.id)
+            self.invoices_defaulted[self._row] += 1
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        self.invoices_cleared[self._row] += 1
+        self.amount_cleared[self._row] += amount
+
+    def end_of_day(self, day, simulation_day, businesses):
+        row = self._row
+        self.balances[row] = [
+            (balance_sheet.cash, balance_sheet.accounts_receivable, balance_sheet.accounts_payable,
+             balance_sheet.debt)
+            for balance_sheet in (business.balance_sheet for business in businesses)
+        ]
+        overdue = [
+            invoice.outstanding_balance
+            for business in businesses
+            for invoice in business.open_invoices.due_invoices(simulation_day)
+            if invoice.due_date < simulation_day
+        ]
+        self.invoices_overdue[row] = len(overdue)
+        self.amount_overdue[row] = sum(overdue)
+
+        window = self.amount_issued[max(row + 1 - self.dso_window, 0):row + 1]
+        daily_sales = window.sum() / len(window)
+        receivable = self.balances[row, :, 1].sum()
+        self.dso[row] = receivable / daily_sales if daily_sales > 0 else np.nan
+        self._row += 1
+
+    def to_dict(self):
+        """All recorded arrays, trimmed to the days recorded so far."""
+        rows = self._row
+        arrays = {'day': self.day[:rows], 'business_id': self.business_id}
+        for i, field in enumerate(BALANCE_FIELDS):
+            arrays[field] = self.balances[:rows, :, i]
+        for field in AGGREGATE_FIELDS:
+            arrays[field] = getattr(self, field)[:rows]
+        return arrays
+
+    def save(self, path):
+        """Writes all recorded arrays to one .npz file."""
+        np.savez(path, **self.to_dict())
+
+    def close(self):
+        if self.path is not None:
+            self.save(self.path)
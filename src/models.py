@@ -1,5 +1,20 @@
 import datetime
+import heapq
 import random
+from array import array
+from collections.abc import MutableMapping
+
+# The simulation keeps every date as an integer day ordinal (date.toordinal()),
+# so the inner loops only add and compare ints. Dates are made at output.
+EPOCH = datetime.date(2024, 1, 1)  # Default date before day 1 of a run
+
+def to_day(value):
+    """Converts a date or datetime to an integer day ordinal; day ordinals and None are returned as they are."""
+    return value.toordinal() if isinstance(value, datetime.date) else value
+
+def to_date(day):
+    """Converts a day ordinal to a date for output; None stays None."""
+    return None if day is None else datetime.date.fromordinal(int(day))
 
 class BalanceSheet:
     def __init__(self, cash=0.0, accounts_receivable=0.0, accounts_payable=0.0, debt=0.0):
@@ -24,21 +39,118 @@ class BalanceSheet:
         return (f"BalanceSheet(cash={self.cash}, accounts_receivable={self.accounts_receivable}, "
                 f"accounts_payable={self.accounts_payable}, debt={self.debt})")
 
+class CustomerAverages(MutableMapping):
+    """
+    Average invoice amount per customer of one business.
+
+    Stores the amounts in one flat array('d') and maps each customer to its
+    slot, so an edge costs a dict entry and 8 bytes rather than a dict entry
+    and a float object.
+    """
+    __slots__ = ('_slots', '_amounts')
+
+    def __init__(self, items=()):
+        self._slots = {}  # customer -> index in _amounts
+        self._amounts = array('d')
+        self.update(items)
+
+    def __getitem__(self, customer):
+        return self._amounts[self._slots[customer]]
+
+    def get(self, customer, default=None):
+        slot = self._slots.get(customer)
+        return default if slot is None else self._amounts[slot]
+
+    def __setitem__(self, customer, amount):
+        slot = self._slots.get(customer)
+        if slot is None:
+            self._slots[customer] = len(self._amounts)
+            self._amounts.append(amount)
+        else:
+            self._amounts[slot] = amount
+
+    def __delitem__(self, customer):
+        slot = self._slots.pop(customer)
+        last = len(self._amounts) - 1
+        if slot != last:
+            # Move the last amount into the freed slot
+            moved = next(key for key, index in self._slots.items() if index == last)
+            self._slots[moved] = slot
+            self._amounts[slot] = self._amounts[last]
+        self._amounts.pop()
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, customer):
+        return customer in self._slots
+
+    def __repr__(self):
+        return f"CustomerAverages({dict(self.items())})"
+
+class PresetAttributes:
+    """
+    Immutable parameters of an AttributesMenu preset, shared by every business
+    created from it. new_attributes() gives a business its own BusinessAttributes,
+    which reference these parameters and so cost no copy; changing one
+    business's attributes never changes the preset or the other businesses.
+    """
+    __slots__ = ('invoices_per_year', 'on_time_payment_percentage', 'max_payment_delay')
+
+    def __init__(self, invoices_per_year, on_time_payment_percentage, max_payment_delay):
+        object.__setattr__(self, 'invoices_per_year', invoices_per_year)
+        object.__setattr__(self, 'on_time_payment_percentage', on_time_payment_percentage)
+        object.__setattr__(self, 'max_payment_delay', max_payment_delay)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Presets are shared by many businesses and cannot be changed; "
+                             "change a business's own attributes instead")
+
+    def new_attributes(self):
+        """Returns BusinessAttributes for one business, starting from this preset."""
+        return BusinessAttributes(self.invoices_per_year, None, self.on_time_payment_percentage,
+                                  self.max_payment_delay, preset=self)
+
+    def __repr__(self):
+        return (f"PresetAttributes(invoices_per_year={self.invoices_per_year}, "
+                f"on_time_payment_percentage={self.on_time_payment_percentage}, "
+                f"max_payment_delay={self.max_payment_delay})")
+
 class BusinessAttributes:
-    def __init__(self, invoices_per_year, customer_averages, on_time_payment_percentage, max_payment_delay):
+    __slots__ = ('invoices_per_year', '_customer_averages', 'on_time_payment_percentage', 'max_payment_delay',
+                 'preset')
+
+    def __init__(self, invoices_per_year, customer_averages, on_time_payment_percentage, max_payment_delay,
+                 preset=None):
         """
         Initializes the BusinessAttributes.
 
         :param invoices_per_year: The average number of invoices the business sends per year.
         :param customer_averages: A dictionary where keys are customer IDs (or references),
                                    and values are the average invoice amounts for those customers.
+                                   None starts an empty CustomerAverages when first needed.
         :param on_time_payment_percentage: The percentage chance of making a payment on time.
         :param max_payment_delay: The maximum number of days a payment can be delayed.
+        :param preset: The PresetAttributes these attributes were created from, if any.
         """
         self.invoices_per_year = invoices_per_year
-        self.customer_averages = customer_averages
+        self._customer_averages = customer_averages
         self.on_time_payment_percentage = on_time_payment_percentage
         self.max_payment_delay = max_payment_delay
+        self.preset = preset
+
+    @property
+    def customer_averages(self):
+        if self._customer_averages is None:
+            self._customer_averages = CustomerAverages()
+        return self._customer_averages
+
+    @customer_averages.setter
+    def customer_averages(self, customer_averages):
+        self._customer_averages = customer_averages
 
     def set_customer_average(self, customer, average_amount):
         """
@@ -49,138 +161,387 @@ class BusinessAttributes:
         """
         self.customer_averages[customer] = average_amount
 
-    def generate_invoice_amount(self, customer):
+    def set_customer_averages(self, customers, average_amounts):
+        """
+        Sets the average invoice amounts for many customers at once.
+
+        :param customers: Iterable of customer IDs (or references).
+        :param average_amounts: Iterable of average amounts aligned with customers.
+        """
+        self.customer_averages.update(zip(customers, average_amounts))
+
+    def generate_invoice_amount(self, customer, rng=random):
         """
         Generates a random invoice amount based on the average for the given customer.
         This example assumes a ±20% variation around the average.
+
+        :param rng: Source of randomness, the random module or a random.Random instance.
         """
-        average = self.customer_averages.get(customer, 0)
+        averages = self._customer_averages
+        average = averages.get(customer, 0) if averages is not None else 0
         if average == 0:
             raise ValueError(f"No average invoice amount defined for customer {customer}")
 
         variation = 0.2 * average
-        return random.normalvariate(average, variation)
+        return rng.normalvariate(average, variation)
 
-    def decides_to_pay_on_time(self):
+    def decides_to_pay_on_time(self, rng=random):
         """
         Determines if a payment will be made on time based on on_time_payment_percentage.
         """
-        return random.random() * 100 <= self.on_time_payment_percentage
+        return rng.random() * 100 <= self.on_time_payment_percentage
 
-    def generate_payment_delay(self):
+    def generate_payment_delay(self, rng=random):
         """
         Generates a random number of days to delay a payment, up to max_payment_delay.
         """
-        return random.randint(1, self.max_payment_delay)
+        return rng.randint(1, self.max_payment_delay)
+
+class OpenInvoiceBook:
+    """
+    Index of the invoices a business has received and not yet fully paid, keyed by due date.
+
+    Invoices wait in per-due-date buckets until their due date is reached and then
+    move to the due set, where they stay until paid. Each day only the buckets that
+    have come due and the invoices already due or overdue are touched.
+    """
+
+    def __init__(self):
+        self._pending = {}  # due_date -> {invoice id: invoice} for invoices not yet due
+        self._due_dates = []  # Heap of the due dates in _pending
+        self._due = {}  # invoice id -> invoice for invoices that are due or overdue
+
+    def add(self, invoice):
+        bucket = self._pending.get(invoice.due_date)
+        if bucket is None:
+            bucket = self._pending[invoice.due_date] = {}
+            heapq.heappush(self._due_dates, invoice.due_date)
+        bucket[invoice.id] = invoice
+
+    def discard(self, invoice):
+        """Removes an invoice from the book if present."""
+        if self._due.pop(invoice.id, None) is not None:
+            return
+        bucket = self._pending.get(invoice.due_date)
+        if bucket is not None:
+            bucket.pop(invoice.id, None)
+            if not bucket:
+                del self._pending[invoice.due_date]
+
+    def due_invoices(self, day):
+        """Returns the open invoices whose due date is on or before day, oldest first."""
+        while self._due_dates and self._due_dates[0] <= day:
+            bucket = self._pending.pop(heapq.heappop(self._due_dates), None)
+            if bucket:
+                self._due.update(bucket)
+        return list(self._due.values())
+
+    def __len__(self):
+        return len(self._due) + sum(len(bucket) for bucket in self._pending.values())
+
+    def __iter__(self):
+        yield from self._due.values()
+        for bucket in self._pending.values():
+            yield from bucket.values()
+
+    def __contains__(self, invoice):
+        return invoice.id in self._due or invoice.id in self._pending.get(invoice.due_date, ())
 
 class Business:
-    def __init__(self, id, name, attributes: BusinessAttributes):
+    def __init__(self, id, name, attributes: BusinessAttributes, ledger=None):
+        """
+        :param ledger: Optional ledger.Ledger; if given, the invoices and payments this
+                       business issues are stored in its arrays instead of as objects.
+        """
         self.id = id
         self.name = name
         self.attributes = attributes
+        self.ledger = ledger
         self.balance_sheet = BalanceSheet()
         self.connections = []  # Potential partners or suppliers
         self.customer_list = []  # Stores references to customer Businesses
-        self.sent_invoices = []  # Invoices this Business has issued
-        self.received_invoices = []  # Invoices this Business has received
-        self.payments_made = []  #Payments this business has made
+        self.sent_invoices = self._new_invoice_list()  # Invoices this Business has issued
+        self.received_invoices = self._new_invoice_list()  # Invoices this Business has received
+        self.payments_made = self._new_payment_list()  #Payments this business has made
+        self.open_invoices = OpenInvoiceBook()  # Received invoices not yet fully paid, by due date
+        self.rng = None  # Own source of randomness for this business's draws; None uses the run's rng
+        self.failed = False  # Set by contagion.propagate_defaults; a failed business stops trading
+
+        # Lookup indexes kept in sync by add_customer, issue_invoice and issue_payment. A business backed by a
+        # ledger looks invoices and payments up by id in the ledger and leaves the by-id indexes empty.
+        self._customers_by_id = {}
+        self._customers_by_name = {}
+        self._sent_by_id = {}
+        self._sent_by_recipient = {}  # recipient id -> list of sent invoices
+        self._received_by_id = {}
+        self._received_by_issuer = {}  # issuer id -> list of received invoices
+        self._payments_by_id = {}
+        self._payments_by_invoice = {}  # invoice id -> first payment applied to it
+        self._payments_by_payee = {}  # payee id -> list of payments made to that business
 
         if not isinstance(attributes, BusinessAttributes):
             raise TypeError("attributes must be an instance of BussinessAttributes")
+        if ledger is not None:
+            ledger.register(self)
+
+    def _new_invoice_list(self):
+        """An empty invoice list: a ledger.RowList, which keeps row numbers only, for a ledger business."""
+        return [] if self.ledger is None else self.ledger.invoice_list()
+
+    def _new_payment_list(self):
+        return [] if self.ledger is None else self.ledger.payment_list()
 
     def add_customer(self, customer):
         """Add a Business instance to the customer list if not already present."""
-        if not isinstance(customer, Business):
-            raise TypeError("customer must be an instance of Business")     
-        if customer not in self.customer_list:
-            self.customer_list.append(customer)
+        self.add_customers((customer,))
+
+    def add_customers(self, customers):
+        """Add many Business instances to the customer list, skipping those already present."""
+        for customer in customers:
+            if not isinstance(customer, Business):
+                raise TypeError("customer must be an instance of Business")
+            if not self.has_customer(customer):
+                self.customer_list.append(customer)
+                self._customers_by_id.setdefault(customer.id, customer)
+                self._customers_by_name.setdefault(customer.name, customer)
+
+    def has_customer(self, customer):
+        """Returns True if customer is in the customer list."""
+        return self._customers_by_id.get(customer.id) is customer or (
+            customer.id in self._customers_by_id and customer in self.customer_list
+        )
+
+    def issue_invoice(self, recipient, due_date, rng=random):
+        """
+        Generates and sends an invoice to a customer Business.
 
-    def issue_invoice(self, recipient, due_date):
-        """Generates and sends an invoice to a customer Business."""
+        :param due_date: Day ordinal the invoice is due on.
+        """
         if not isinstance(recipient, Business):
             raise TypeError("recipient must be an instance of Business")
-        if due_date < datetime.datetime.now().date():
-            raise ValueError("due_date cannot be in the past")
-        if recipient not in self.customer_list:
+        if not self.has_customer(recipient):
             raise ValueError(f"{recipient.name} is not a customer of {self.name}.")
 
-        amount = self.attributes.generate_invoice_amount(customer=recipient)
-        new_invoice = Invoice(issuer=self, recipient=recipient, amount=amount, due_date=due_date)
+        amount = self.attributes.generate_invoice_amount(customer=recipient, rng=rng)
+        if self.ledger is not None:
+            new_invoice = self.ledger.add_invoice(issuer=self, recipient=recipient, amount=amount, due_date=due_date)
+        else:
+            new_invoice = Invoice(issuer=self, recipient=recipient, amount=amount, due_date=due_date)
 
         # Update balance sheets
         self.balance_sheet.update_accounts_receivable(amount)
         recipient.balance_sheet.update_accounts_payable(amount)
 
-        self.sent_invoices.append(new_invoice)
-        recipient.received_invoices.append(new_invoice)
+        self._record_invoice(new_invoice)
         return new_invoice
+
+    def _record_invoice(self, invoice):
+        """Adds an invoice issued by this business to its and its recipient's lists and indexes."""
+        recipient = invoice.recipient
+        self.sent_invoices.append(invoice)
+        recipient.received_invoices.append(invoice)
+        if self.ledger is None:
+            self._sent_by_id[invoice.id] = invoice
+            recipient._received_by_id[invoice.id] = invoice
+        by_recipient = self._sent_by_recipient.get(recipient.id)
+        if by_recipient is None:
+            by_recipient = self._sent_by_recipient[recipient.id] = self._new_invoice_list()
+        by_recipient.append(invoice)
+        by_issuer = recipient._received_by_issuer.get(self.id)
+        if by_issuer is None:
+            by_issuer = recipient._received_by_issuer[self.id] = recipient._new_invoice_list()
+        by_issuer.append(invoice)
+        if invoice.status in ('issued', 'partially_paid'):
+            recipient.open_invoices.add(invoice)
         
-    def issue_payment(self, invoices, total_amount, payment_date=datetime.datetime.now(), distribution_percentages=None):
+    def issue_payment(self, invoices, total_amount, payment_date=None, distribution_percentages=None):
+        """
+        Pays one or more invoices with a single payment.
+
+        Settles in one pass over the invoices: the amounts credited to each payee
+        are netted first, so every affected balance sheet is updated once however
+        many of the invoices a payee issued. The netted amounts are recorded in
+        payment.payee_amounts, keyed by payee id.
+
+        Each invoice gets its share of total_amount, capped at its outstanding
+        balance, and the payer pays only what is applied: payment.amount is the
+        applied total and distribution_percentages are the invoices' shares of it.
+        The payer's accounts payable and the payees' cash and accounts receivable
+        move by the same amounts, so no money is created or lost.
+
+        :param payment_date: Day ordinal of the payment, recorded as the paid date of the invoices it settles.
+        :param distribution_percentages: Share of the payment going to each invoice, in
+                                         percent; in proportion to the invoices'
+                                         outstanding balances if omitted.
+        """
         if total_amount <= 0:
             raise ValueError("total_amount must be positive")
         if not invoices:
             raise ValueError("invoices must not be empty")
-        
+
+        balances = [invoice.outstanding_balance for invoice in invoices]
         if distribution_percentages is None:
-            # If no distribution is provided, split the payment evenly among invoices
-            distribution_percentages = [100 / len(invoices)] * len(invoices)
-        
-        payment = Payment(self, total_amount, payment_date, invoices, distribution_percentages)
-        
-        # Update balance sheets
-        self.balance_sheet.update_cash(-total_amount)
-        self.balance_sheet.update_accounts_payable(-sum(invoice.outstanding_balance for invoice in invoices))
-        for invoice in invoices:
-            invoice.recipient.balance_sheet.update_cash(invoice.outstanding_balance * (distribution_percentages[invoices.index(invoice)] / 100))
-            invoice.recipient.balance_sheet.update_accounts_receivable(-invoice.outstanding_balance * (distribution_percentages[invoices.index(invoice)] / 100))
-       
-        payment.apply_to_invoices()
+            # If no distribution is provided, pay every invoice the same share of what it owes
+            total_outstanding = sum(balances)
+            if total_outstanding > 0:
+                distribution_percentages = [100 * balance / total_outstanding for balance in balances]
+            else:
+                distribution_percentages = [100 / len(invoices)] * len(invoices)
+        elif len(distribution_percentages) != len(invoices):
+            raise ValueError("distribution_percentages must have one entry per invoice")
+
+        # Amount applied to each invoice and credited to each payee, netted over its invoices
+        applied = []
+        payees = {}  # payee id -> payee Business
+        payee_amounts = {}  # payee id -> amount credited
+        for invoice, balance, percentage in zip(invoices, balances, distribution_percentages):
+            amount = total_amount * (percentage / 100)
+            if amount >= balance * (1 - 1e-12):
+                amount = balance  # Settles the invoice; rounding in the shares must not leave a residue
+            applied.append(amount)
+            issuer = invoice.issuer
+            payees[issuer.id] = issuer
+            payee_amounts[issuer.id] = payee_amounts.get(issuer.id, 0) + amount
+        total_applied = sum(applied)
+        if total_applied <= 0:
+            raise ValueError("The invoices have nothing outstanding")
+        percentages = [100 * amount / total_applied for amount in applied]
+
+        if self.ledger is not None:
+            payment = self.ledger.add_payment(self, total_applied, payment_date, invoices, percentages, payee_amounts)
+        else:
+            payment = Payment(self, total_applied, payment_date, invoices, percentages)
+            payment.payee_amounts = payee_amounts
+
+        # Update balance sheets, once per business
+        self.balance_sheet.update_cash(-total_applied)
+        self.balance_sheet.update_accounts_payable(-total_applied)
+        for payee_id, amount in payee_amounts.items():
+            payee_balance_sheet = payees[payee_id].balance_sheet
+            payee_balance_sheet.update_cash(amount)
+            payee_balance_sheet.update_accounts_receivable(-amount)
+
+        for invoice, amount in zip(invoices, applied):
+            invoice.make_payment(amount, payment_date, payment)
+        self._record_payment(payment)
+        return payment
+
+    def prune_closed(self):
+        """
+        Drops closed (paid or written-off) invoices, and the payments covering
+        only closed invoices, from this business's lists and lookup indexes, for
+        runs that keep their history elsewhere (see sqlstore.SQLiteSink). A closed
+        invoice stays while a payment still covering an open one refers to it.
+        Returns the number of invoices and payments dropped; businesses backed
+        by a ledger are not pruned.
+        """
+        if self.ledger is not None:
+            # Not needed for ledger businesses: their lists and indexes hold 8-byte row numbers, not proxies, so
+            # they grow by a few dozen bytes per invoice, next to the ledger's own arrays.
+            return 0
+
+        def closed(invoice):
+            return invoice.status in ('paid', 'written_off')
+
+        def prunable(invoice):
+            return closed(invoice) and all(all(map(closed, payment.invoices)) for payment in invoice.payments)
+
+        sent = [invoice for invoice in self.sent_invoices if not prunable(invoice)]
+        received = [invoice for invoice in self.received_invoices if not prunable(invoice)]
+        payments = [payment for payment in self.payments_made if not all(map(closed, payment.invoices))]
+        dropped = (len(self.sent_invoices) - len(sent) + len(self.received_invoices) - len(received)
+                   + len(self.payments_made) - len(payments))
+
+        self.sent_invoices = sent
+        self._sent_by_id = {invoice.id: invoice for invoice in sent}
+        self._sent_by_recipient = {}
+        for invoice in sent:
+            self._sent_by_recipient.setdefault(invoice.recipient.id, []).append(invoice)
+        self.received_invoices = received
+        self._received_by_id = {invoice.id: invoice for invoice in received}
+        self._received_by_issuer = {}
+        for invoice in received:
+            self._received_by_issuer.setdefault(invoice.issuer.id, []).append(invoice)
+        self.payments_made = []
+        self._payments_by_id = {}
+        self._payments_by_invoice = {}
+        self._payments_by_payee = {}
+        for payment in payments:
+            self._record_payment(payment)
+        return dropped
+
+    def _record_payment(self, payment):
+        """Adds a payment made by this business to its payment list and indexes."""
         self.payments_made.append(payment)
+        if self.ledger is not None:
+            for payee_id in payment.payee_amounts:
+                by_payee = self._payments_by_payee.get(payee_id)
+                if by_payee is None:
+                    by_payee = self._payments_by_payee[payee_id] = self._new_payment_list()
+                by_payee.append(payment)
+            return
+        self._payments_by_id[payment.id] = payment
+        payees = set()
+        for invoice in payment.invoices:
+            self._payments_by_invoice.setdefault(invoice.id, payment)
+            if invoice.issuer.id not in payees:
+                payees.add(invoice.issuer.id)
+                self._payments_by_payee.setdefault(invoice.issuer.id, []).append(payment)
 
     def __repr__(self):
         return f"Business(id={self.id}, name='{self.name}', attributes={self.attributes})"
 
     def get_customer(self, customer_id=None, name=None):
-        if customer_id:
-            for customer in self.customer_list:
-                if customer.id == customer_id:
-                    return customer
+        if customer_id is not None:
+            customer = self._customers_by_id.get(customer_id)
+            if customer is not None:
+                return customer
         elif name:
-            for customer in self.customer_list:
-                if customer.name == name:
-                    return customer
+            customer = self._customers_by_name.get(name)
+            if customer is not None:
+                return customer
         return random.choice(self.customer_list) if self.customer_list else None
 
     def get_sent_invoice(self, invoice_id=None, recipient_id=None):
         if invoice_id:
-            for invoice in self.sent_invoices:
-                if invoice.id == invoice_id:
-                    return invoice
-        elif recipient_id:
-            return [invoice for invoice in self.sent_invoices if invoice.recipient.id == recipient_id]
+            if self.ledger is not None:
+                return self.ledger.find_invoice(invoice_id, issuer=self)
+            return self._sent_by_id.get(invoice_id)
+        elif recipient_id is not None:
+            return list(self._sent_by_recipient.get(recipient_id, ()))
         return None
 
     def get_received_invoice(self, invoice_id=None, issuer_id=None):
         if invoice_id:
-            for invoice in self.received_invoices:
-                if invoice.id == invoice_id:
-                    return invoice
-        elif issuer_id:
-            return [invoice for invoice in self.received_invoices if invoice.issuer.id == issuer_id]
+            if self.ledger is not None:
+                return self.ledger.find_invoice(invoice_id, recipient=self)
+            return self._received_by_id.get(invoice_id)
+        elif issuer_id is not None:
+            return list(self._received_by_issuer.get(issuer_id, ()))
         return None
     
-    def get_payment(self, payment_id=None, invoice_id=None):
+    def get_payment(self, payment_id=None, invoice_id=None, payee_id=None):
+        """
+        Looks up a payment by its id, the first payment applied to an invoice, or
+        all payments made to the business with id payee_id (returned as a list).
+        """
+        if self.ledger is not None and (payment_id or invoice_id):
+            if payment_id:
+                return self.ledger.find_payment(payment_id, payer=self)
+            invoice = self.ledger.find_invoice(invoice_id, recipient=self)
+            payments = invoice.payments if invoice is not None else ()
+            return next((payment for payment in payments if payment.payer is self), None)
         if payment_id:
-            for payment in self.payments_made:
-                if payment.id == payment_id:
-                    return payment
+            return self._payments_by_id.get(payment_id)
         elif invoice_id:
-            for payment in self.payments_made:
-                if any(invoice.id == invoice_id for invoice in payment.invoices):
-                    return payment
+            return self._payments_by_invoice.get(invoice_id)
+        elif payee_id is not None:
+            return list(self._payments_by_payee.get(payee_id, ()))
         return None
 
 class Invoice:
+    __slots__ = ('id', 'issuer', 'recipient', 'amount', 'due_date', 'outstanding_balance',
+                 'paid_date', 'status', 'payments')
     _id_counter = 1  # Class variable to auto-increment invoice IDs
 
     def __init__(self, issuer, recipient, amount, due_date):
@@ -199,7 +560,7 @@ class Invoice:
         self.due_date = due_date
         self.outstanding_balance = amount  # Initially, the outstanding balance is the full invoice amount
         self.paid_date = None
-        self.status = 'issued'  # Possible values: 'issued', 'partially_paid', 'paid'
+        self.status = 'issued'  # Possible values: 'issued', 'partially_paid', 'paid', 'written_off'
         self.payments = []  # List to track payments made to this invoice
 
     def make_payment(self, payment_amount, payment_date=None, payment=None):
@@ -208,18 +569,32 @@ class Invoice:
         if self.outstanding_balance <= 0:
             self.outstanding_balance = 0  # Prevent negative balance
             self.status = 'paid'
-            self.paid_date = payment_date or datetime.datetime.now()  # Record when the invoice got fully paid
+            self.paid_date = payment_date  # Record the day the invoice got fully paid
+            self.recipient.open_invoices.discard(self)
         else:
             self.status = 'partially_paid'
         if payment:
             self.payments.append(payment)  # Add the payment object to the invoice's list of payments
 
+    def write_down(self, amount):
+        """
+        Writes off part of the outstanding balance without any payment, as when
+        the recipient fails. An invoice written down to nothing is closed.
+        """
+        self.outstanding_balance -= amount
+        if self.outstanding_balance <= 0:
+            self.outstanding_balance = 0
+            self.status = 'written_off'
+            self.recipient.open_invoices.discard(self)
+
     def __repr__(self):
         return (f"Invoice(ID: {self.id}, Issuer: {self.issuer.name}, Recipient: {self.recipient.name}, "
-                f"Amount: {self.amount}, Outstanding: {self.outstanding_balance}, Due: {self.due_date}, "
+                f"Amount: {self.amount}, Outstanding: {self.outstanding_balance}, Due: {to_date(self.due_date)}, "
                 f"Status: {self.status}, Payments: {len(self.payments)})")
 
 class Payment:
+    __slots__ = ('id', 'payer', 'amount', 'payment_date', 'invoices', 'distribution_percentages',
+                 'payee_amounts')
     _id_counter = 1
 
     def __init__(self, payer, amount, payment_date, invoices, distribution_percentages):
@@ -239,4 +614,4 @@ class Payment:
 
     def __repr__(self):
         return (f"Payment(ID: {self.id}, Payer: {self.payer.name}, Amount: {self.amount}, "
-                f"Date: {self.payment_date}, Payees: {list(self.payee_amounts.keys())})")
+                f"Date: {to_date(self.payment_date)}, Payees: {list(self.payee_amounts.keys())})")
@@ -1,6 +1,12 @@
 # network.py
+import queue
+
 import networkx as nx
 import matplotlib.pyplot as plt
+import numpy as np
+from events import EventSink
+
+EDGE_METRICS = ('outstanding_invoices', 'total_payments', 'average_payments')
 
 def create_network_graph(businesses):
     network_graph = nx.DiGraph()
@@ -29,20 +35,398 @@ def calculate_edge_weight(business, customer, metric):
         total_outstanding = sum(invoice.outstanding_balance for invoice in outstanding_invoices)
         return total_outstanding
     elif metric == 'total_payments':
-        total_payments = sum(payment.amount for payment in business.payments_made if any(invoice.recipient == customer for invoice in payment.invoices))
+        # Payments the customer made against invoices from this business
+        total_payments = sum(payment.amount for payment in customer.get_payment(payee_id=business.id))
         return total_payments
     elif metric == 'average_payments':
-        payments_to_customer = [payment for payment in business.payments_made if any(invoice.recipient == customer for invoice in payment.invoices)]
-        if payments_to_customer:
-            return sum(payment.amount for payment in payments_to_customer) / len(payments_to_customer)
+        payments_from_customer = customer.get_payment(payee_id=business.id)
+        if payments_from_customer:
+            return sum(payment.amount for payment in payments_from_customer) / len(payments_from_customer)
         else:
             return 0
     else:
         raise ValueError(f"Invalid metric: {metric}")
 
-def visualize_network(network_graph, day):
+def outstanding_by_supplier(customer):
+    """Outstanding balance of customer's open invoices, summed per issuing business."""
+    outstanding = {}
+    for invoice in customer.open_invoices:
+        outstanding[invoice.issuer] = outstanding.get(invoice.issuer, 0) + invoice.outstanding_balance
+    return outstanding
+
+def payables_drifted(payable, businesses, tolerance=1e-6):
+    """
+    Businesses whose accounts payable no longer match the running totals in
+    payable (business -> amount), i.e. whose invoices changed without an event,
+    such as write-downs by contagion.propagate_defaults.
+    """
+    return [
+        business for business in businesses
+        if abs(payable.get(business, 0) - business.balance_sheet.accounts_payable)
+        > tolerance * max(abs(business.balance_sheet.accounts_payable), 1.0)
+    ]
+
+class IncrementalNetworkGraph(EventSink):
+    """
+    Network graph kept current from simulation events instead of full rebuilds.
+
+    Keeps running aggregates per supplier -> customer edge (outstanding balance,
+    total payments and payment count), updated as invoice, payment and clearing
+    events arrive, so every metric of calculate_edge_weight is readable in O(1).
+    refresh() only rewrites the nodes and edges touched since the previous
+    refresh. Pass it as (part of) the sink of start_simulation.
+
+    At the end of each day, a business whose accounts payable differ from the
+    graph's running total has had its invoices changed without an event, e.g.
+    by a hook; its incoming edges are rebuilt from its open invoices. Nodes
+    whose cash changed are refreshed too.
+    """
+
+    def __init__(self, businesses, metric='outstanding_invoices'):
+        if metric not in EDGE_METRICS:
+            raise ValueError(f"Invalid metric: {metric}")
+        self.metric = metric
+        self.graph = create_network_graph(businesses)
+        self._outstanding = {}  # (business, customer) -> outstanding balance
+        self._payments = {}  # (business, customer) -> [total payments, payment count]
+        self._suppliers = {}  # customer -> businesses with an edge to it
+        self._payable = {}  # customer -> sum of the outstanding balances of its incoming edges
+        self._dirty_nodes = set()
+        self._dirty_edges = set()
+
+        # One pass over the existing state so the graph can be attached mid-run
+        for business in businesses:
+            for customer in business.customer_list:
+                edge = (business, customer)
+                payments = customer.get_payment(payee_id=business.id)
+                self._set_outstanding(edge, sum(
+                    invoice.outstanding_balance for invoice in business.get_sent_invoice(recipient_id=customer.id)))
+                self._payments[edge] = [sum(payment.amount for payment in payments), len(payments)]
+        self.refresh()
+
+    def edge_weight(self, business, customer, metric=None):
+        """O(1) equivalent of calculate_edge_weight(business, customer, metric)."""
+        metric = metric or self.metric
+        edge = (business, customer)
+        if metric == 'outstanding_invoices':
+            return self._outstanding.get(edge, 0)
+        total, count = self._payments.get(edge, (0, 0))
+        if metric == 'total_payments':
+            return total
+        elif metric == 'average_payments':
+            return total / count if count else 0
+        raise ValueError(f"Invalid metric: {metric}")
+
+    def _set_outstanding(self, edge, amount):
+        # Rounding in long runs must not leave an edge owing less than nothing
+        amount = max(amount, 0)
+        business, customer = edge
+        if edge not in self._outstanding:
+            self._suppliers.setdefault(customer, set()).add(business)
+        self._payable[customer] = self._payable.get(customer, 0) + amount - self._outstanding.get(edge, 0)
+        self._outstanding[edge] = amount
+        self._dirty_edges.add(edge)
+
+    def invoice_issued(self, simulation_day, invoice):
+        edge = (invoice.issuer, invoice.recipient)
+        self._set_outstanding(edge, self._outstanding.get(edge, 0) + invoice.amount)
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        payer = payment.payer
+        payees = set()
+        for invoice, percentage in zip(payment.invoices, payment.distribution_percentages):
+            edge = (invoice.issuer, payer)
+            self._set_outstanding(edge, self._outstanding.get(edge, 0) - payment.amount * (percentage / 100))
+            payees.add(invoice.issuer)
+        # Like calculate_edge_weight, a payment counts once per payee it covers
+        for payee in payees:
+            totals = self._payments.setdefault((payee, payer), [0, 0])
+            totals[0] += payment.amount
+            totals[1] += 1
+            self._dirty_nodes.add(payee)
+        self._dirty_nodes.add(payer)
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        edge = (invoice.issuer, invoice.recipient)
+        self._set_outstanding(edge, self._outstanding.get(edge, 0) - amount)
+        self._dirty_nodes.update(edge)
+
+    def end_of_day(self, day, simulation_day, businesses):
+        for customer in payables_drifted(self._payable, businesses):
+            outstanding = outstanding_by_supplier(customer)
+            for supplier in self._suppliers.get(customer, set()) | outstanding.keys():
+                self._set_outstanding((supplier, customer), outstanding.get(supplier, 0))
+            # The payable may still differ from the invoices by rounding; start the running total from it
+            self._payable[customer] = customer.balance_sheet.accounts_payable
+        nodes = self.graph.nodes
+        for business in businesses:
+            if nodes[business]['size'] != business.balance_sheet.cash:
+                self._dirty_nodes.add(business)
+
+    def refresh(self):
+        """Writes the nodes and edges changed since the last refresh into self.graph."""
+        nodes = self.graph.nodes
+        for business in self._dirty_nodes:
+            nodes[business]['size'] = business.balance_sheet.cash
+        for business, customer in self._dirty_edges:
+            self.graph.add_edge(business, customer, weight=self.edge_weight(business, customer))
+        changed = len(self._dirty_nodes) + len(self._dirty_edges)
+        self._dirty_nodes.clear()
+        self._dirty_edges.clear()
+        return changed
+
+def visualize_network(network_graph, day, pos=None):
+    """
+    Draws the network in an interactive window. Pass the returned layout back in
+    as pos to warm-start the next day's layout from it instead of from scratch.
+    """
     plt.figure(figsize=(12, 8))
-    pos = nx.spring_layout(network_graph)
+    pos = nx.spring_layout(network_graph, pos=pos, iterations=10 if pos else 50)
     nx.draw(network_graph, pos, with_labels=True, node_color='skyblue', edge_color='gray', node_size=[v['size'] for v in network_graph.nodes.values()])
     plt.title(f"Business Network - Day {day}")
-    plt.show()
\ No newline at end of file
+    plt.show()
+    return pos
+
+ANIMATION_WRITERS = {'.gif': 'pillow', '.mp4': 'ffmpeg'}
+
+def sample_nodes(businesses, max_nodes):
+    """
+    Picks the at most max_nodes businesses to draw: all of them for small networks,
+    otherwise the best connected ones, which carry most of the invoice flow.
+    """
+    if len(businesses) <= max_nodes:
+        return list(businesses)
+    degree = {id(business): len(business.customer_list) for business in businesses}
+    for business in businesses:
+        for customer in business.customer_list:
+            if id(customer) in degree:
+                degree[id(customer)] += 1
+    ranked = sorted(range(len(businesses)), key=lambda i: -degree[id(businesses[i])])
+    return [businesses[i] for i in sorted(ranked[:max_nodes])]
+
+class _FrameWriter:
+    """
+    Draws frames with the object-oriented Matplotlib API on an Agg canvas, so no
+    window or pyplot state is involved, and writes them as image files or
+    animation frames. Runs in the rendering worker.
+    """
+
+    def __init__(self, output, labels, edges, positions, relayout_interval, figsize, dpi):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+
+        self.output = output
+        self.labels = labels
+        self.edges = edges
+        self.positions = positions
+        self.relayout_interval = relayout_interval
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_axis_off()
+        self.lines = LineCollection([], colors='gray', alpha=0.5)
+        self.axes.add_collection(self.lines)
+        self.nodes = self.axes.scatter(positions[:, 0], positions[:, 1], s=0)
+        self.title = self.axes.set_title('')
+        self.annotations = [
+            self.axes.annotate(label, (x, y), ha='center', va='center', fontsize=8)
+            for label, (x, y) in zip(labels or (), positions)
+        ]
+        margin = 0.1
+        self.axes.set_xlim(positions[:, 0].min() - margin, positions[:, 0].max() + margin)
+        self.axes.set_ylim(positions[:, 1].min() - margin, positions[:, 1].max() + margin)
+        self.frames = 0
+
+        self.animation = None
+        extension = output[output.rfind('.'):].lower()
+        if extension in ANIMATION_WRITERS:
+            from matplotlib import animation
+            self.animation = animation.writers[ANIMATION_WRITERS[extension]](fps=5)
+            self.animation.setup(self.figure, output, dpi=dpi)
+
+    def relayout(self, weights):
+        # Warm start: a few iterations from the current positions keep the picture stable between frames
+        graph = nx.Graph()
+        graph.add_nodes_from(range(len(self.positions)))
+        scale = weights.max() if len(weights) and weights.max() > 0 else 1
+        for (source, target), weight in zip(self.edges.tolist(), (weights / scale).tolist()):
+            graph.add_edge(source, target, weight=max(weight, 1e-3))
+        pos = nx.spring_layout(graph, pos=dict(enumerate(self.positions)), iterations=5, seed=0)
+        self.positions = np.array([pos[i] for i in range(len(self.positions))])
+        self.nodes.set_offsets(self.positions)
+        for annotation, position in zip(self.annotations, self.positions):
+            annotation.xy = position
+
+    def draw(self, day, sizes, weights):
+        if self.relayout_interval and self.frames and self.frames % self.relayout_interval == 0:
+            self.relayout(weights)
+        scale = np.abs(sizes).max() if len(sizes) and np.abs(sizes).max() > 0 else 1
+        self.nodes.set_sizes(20 + 300 * np.abs(sizes) / scale)
+        self.nodes.set_color(np.where(sizes < 0, 'salmon', 'skyblue'))
+        weight_scale = weights.max() if len(weights) and weights.max() > 0 else 1
+        self.lines.set_segments(self.positions[self.edges])
+        self.lines.set_linewidths(0.2 + 3 * weights / weight_scale)
+        self.title.set_text(f"Business Network - Day {day}")
+        if self.animation is not None:
+            self.animation.grab_frame()
+        else:
+            self.figure.savefig(self.output.format(day=day), dpi=self.dpi)
+        self.frames += 1
+
+    def close(self):
+        if self.animation is not None:
+            self.animation.finish()
+
+def _render_frames(frames, settings):
+    writer = _FrameWriter(**settings)
+    try:
+        while (frame := frames.get()) is not None:
+            writer.draw(*frame)
+    finally:
+        writer.close()
+
+class NetworkRenderer(EventSink):
+    """
+    Headless network rendering, written to per-day image files or one animation.
+
+    output is either a file name pattern with {day}, e.g. 'frames/day-{day:04d}.png',
+    or a .gif (or, with ffmpeg installed, .mp4) animation. Pass the renderer as
+    (part of) the sink of start_simulation; it draws every interval days and
+    finishes the files when the run closes it.
+
+    The layout is computed once, up front, and only warm-started from the
+    previous positions every relayout_interval frames (0 never). Networks of
+    more than max_nodes businesses are drawn as their max_nodes best connected
+    businesses and the edges between them. Node size shows cash (red when
+    negative) and edge width the edge metric, tracked from the events and
+    rebuilt when invoices change without one, as in IncrementalNetworkGraph. With background=True the frames are drawn in a
+    separate process fed through a queue of at most queue_size frames, so the
+    simulation only stops to copy a frame's arrays.
+    """
+
+    def __init__(self, businesses, output, metric='outstanding_invoices', interval=1, max_nodes=500,
+                 relayout_interval=0, background=True, queue_size=8, seed=0, figsize=(12, 8), dpi=100):
+        if metric not in EDGE_METRICS:
+            raise ValueError(f"Invalid metric: {metric}")
+        self.metric = metric
+        self.interval = interval
+        self.nodes = sample_nodes(businesses, max_nodes)
+        index = {id(business): i for i, business in enumerate(self.nodes)}
+        self._edges = {}  # (business, customer) -> position in the weight arrays
+        edges = []
+        for business in self.nodes:
+            for customer in business.customer_list:
+                if id(customer) in index:
+                    self._edges[(business, customer)] = len(edges)
+                    edges.append((index[id(business)], index[id(customer)]))
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+        # Running per-edge aggregates, as in IncrementalNetworkGraph
+        self._outstanding = np.zeros(len(edges))
+        self._payment_totals = np.zeros(len(edges))
+        self._payment_counts = np.zeros(len(edges))
+        self._incoming = {}  # drawn customer -> [(supplier, edge position)]
+        for (business, customer), i in self._edges.items():
+            self._outstanding[i] = calculate_edge_weight(business, customer, 'outstanding_invoices')
+            payments = customer.get_payment(payee_id=business.id)
+            self._payment_totals[i] = sum(payment.amount for payment in payments)
+            self._payment_counts[i] = len(payments)
+            self._incoming.setdefault(customer, []).append((business, i))
+        # Every business's payables as the events report them, to spot invoices changed without one
+        self._payable = {business: business.balance_sheet.accounts_payable for business in businesses}
+
+        graph = nx.Graph()
+        graph.add_nodes_from(range(len(self.nodes)))
+        graph.add_edges_from(edges.tolist())
+        layout = nx.spring_layout(graph, seed=seed)
+        settings = {
+            'output': output,
+            'labels': [business.name for business in self.nodes] if len(self.nodes) <= 50 else None,
+            'edges': edges,
+            'positions': np.array([layout[i] for i in range(len(self.nodes))]).reshape(-1, 2),
+            'relayout_interval': relayout_interval,
+            'figsize': figsize,
+            'dpi': dpi,
+        }
+        if background:
+            import multiprocessing
+            context = multiprocessing.get_context('spawn')
+            self._queue = context.Queue(maxsize=queue_size)
+            self._worker = context.Process(target=_render_frames, args=(self._queue, settings), daemon=True)
+            self._worker.start()
+            self._writer = None
+        else:
+            self._queue = self._worker = None
+            self._writer = _FrameWriter(**settings)
+
+    def weights(self):
+        """Current metric of every drawn edge."""
+        if self.metric == 'outstanding_invoices':
+            return self._outstanding.copy()
+        if self.metric == 'total_payments':
+            return self._payment_totals.copy()
+        return np.divide(self._payment_totals, self._payment_counts, out=np.zeros(len(self._payment_counts)),
+                         where=self._payment_counts > 0)
+
+    def _reduce_outstanding(self, invoice, amount):
+        self._payable[invoice.recipient] = self._payable.get(invoice.recipient, 0) - amount
+        i = self._edges.get((invoice.issuer, invoice.recipient))
+        if i is not None:
+            self._outstanding[i] = max(self._outstanding[i] - amount, 0)
+        return i
+
+    def invoice_issued(self, simulation_day, invoice):
+        self._payable[invoice.recipient] = self._payable.get(invoice.recipient, 0) + invoice.amount
+        i = self._edges.get((invoice.issuer, invoice.recipient))
+        if i is not None:
+            self._outstanding[i] += invoice.amount
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        payees = set()
+        for invoice, percentage in zip(payment.invoices, payment.distribution_percentages):
+            i = self._reduce_outstanding(invoice, payment.amount * (percentage / 100))
+            if i is not None:
+                payees.add(i)
+        for i in payees:
+            self._payment_totals[i] += payment.amount
+            self._payment_counts[i] += 1
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        self._reduce_outstanding(invoice, amount)
+
+    def end_of_day(self, day, simulation_day, businesses):
+        for customer in payables_drifted(self._payable, businesses):
+            if customer in self._incoming:
+                outstanding = outstanding_by_supplier(customer)
+                for supplier, i in self._incoming[customer]:
+                    self._outstanding[i] = outstanding.get(supplier, 0)
+            self._payable[customer] = customer.balance_sheet.accounts_payable
+        if day % self.interval:
+            return
+        sizes = np.array([business.balance_sheet.cash for business in self.nodes])
+        frame = (day, sizes, self.weights())
+        if self._writer is not None:
+            self._writer.draw(*frame)
+            return
+        while True:
+            try:
+                self._queue.put(frame, timeout=1)
+                return
+            except queue.Full:
+                if not self._worker.is_alive():
+                    raise RuntimeError("The network rendering worker stopped") from None
+
+    def close(self):
+        """Waits for the outstanding frames to be drawn and finishes the output files."""
+        if self._writer is not None:
+            self._writer.close()
+        elif self._worker is not None:
+            if self._worker.is_alive():
+                self._queue.put(None)
+            self._worker.join()
+            exitcode, self._worker = self._worker.exitcode, None
+            self._queue.close()
+            if exitcode:
+                raise RuntimeError(f"The network rendering worker failed with exit code {exitcode}")
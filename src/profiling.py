@@ -0,0 +1,160 @@
+"""
+Per-day, per-phase instrumentation of start_simulation.
+
+Pass a RunProfiler as the profiler of start_simulation. Each simulated day it
+times the phases of the loop: issue_invoices, process_payments,
+event_scheduler or vectorized_step (depending on the engine), graph, hooks,
+sinks and console. It counts the invoices issued and the invoices settled by
+payments that day, and with memory=True it samples the traced memory with
+tracemalloc. Without a profiler the loop only makes a few empty method calls a
+day. Example:
+
+    profiler = RunProfiler()
+    start_simulation(businesses, 365, verbose=False, profiler=profiler)
+    profiler.save('run.profile.json')
+    print(compare_profiles(load_profile('before.profile.json'), profiler.summary()))
+
+The saved file holds the totals of summary() and one row per day, so runs can
+be compared phase by phase.
+"""
+import csv
+import json
+import time
+import tracemalloc
+
+from events import EventSink
+
+PHASES = ('issue_invoices', 'process_payments', 'event_scheduler', 'vectorized_step', 'graph', 'hooks', 'sinks',
+          'console')
+COUNTERS = ('invoices_issued', 'invoices_paid')
+
+class NullProfiler:
+    """Stands in for a profiler when none is given; every call does nothing."""
+
+    def start_day(self, day):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, counter, amount):
+        pass
+
+    def end_day(self):
+        pass
+
+    def close(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+class RunProfiler(EventSink):
+    """
+    Records the seconds spent in each phase of every simulated day, the day's
+    event counts and, with memory=True, the traced memory every memory_interval
+    days. A phase is timed from the end of the previous one, so the phases of a
+    day add up to the whole day.
+    """
+
+    def __init__(self, memory=False, memory_interval=1):
+        self.memory = memory
+        self.memory_interval = memory_interval
+        self.rows = []  # One dict per day: day, seconds per phase, counters, memory
+        self._row = None
+        self._lap_start = None
+        self._started_tracing = False
+
+    def start_day(self, day):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._row = dict.fromkeys(COUNTERS, 0)
+        self._row['day'] = day
+        self.rows.append(self._row)
+        self._lap_start = time.perf_counter()
+
+    def lap(self, phase):
+        """Adds the time since the previous lap to phase."""
+        now = time.perf_counter()
+        row = self._row
+        row[phase] = row.get(phase, 0.0) + now - self._lap_start
+        self._lap_start = now
+
+    def count(self, counter, amount):
+        self._row[counter] += amount
+
+    def end_day(self):
+        row = self._row
+        if self.memory and (row['day'] % self.memory_interval == 0):
+            row['memory_current'], row['memory_peak'] = tracemalloc.get_traced_memory()
+        self._lap_start = time.perf_counter()  # Time spent in the profiler itself is not charged to a phase
+
+    def invoice_issued(self, simulation_day, invoice):
+        self._row['invoices_issued'] += 1
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        self._row['invoices_paid'] += len(payment.invoices)
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def phases(self):
+        """The phases timed in this run, in loop order."""
+        return [phase for phase in PHASES if any(phase in row for row in self.rows)]
+
+    def summary(self):
+        """Totals over the run: seconds and share of the time per phase, counters and peak memory."""
+        phases = self.phases()
+        seconds = {phase: sum(row.get(phase, 0.0) for row in self.rows) for phase in phases}
+        total = sum(seconds.values())
+        summary = {
+            'days': len(self.rows),
+            'seconds': total,
+            'phases': {phase: {'seconds': seconds[phase], 'share': seconds[phase] / total if total else 0.0}
+                       for phase in phases},
+        }
+        for counter in COUNTERS:
+            summary[counter] = sum(row[counter] for row in self.rows)
+        peaks = [row['memory_peak'] for row in self.rows if 'memory_peak' in row]
+        if peaks:
+            summary['memory_peak'] = max(peaks)
+        return summary
+
+    def save(self, path):
+        """Writes the summary and the per-day rows as .json, or only the rows as .csv."""
+        fields = ['day', *self.phases(), *COUNTERS]
+        if any('memory_current' in row for row in self.rows):
+            fields += ['memory_current', 'memory_peak']
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=fields, restval=0)
+                writer.writeheader()
+                writer.writerows(self.rows)
+        else:
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'fields': fields,
+                           'rows': [[row.get(field, 0) for field in fields] for row in self.rows]}, f)
+
+def load_profile(path):
+    """Loads the summary saved by RunProfiler.save as .json."""
+    with open(path) as f:
+        return json.load(f)['summary']
+
+def compare_profiles(baseline, candidate):
+    """
+    Compares two profile summaries phase by phase.
+
+    Returns {phase: (baseline seconds, candidate seconds, ratio)} including
+    'total', where ratio is candidate / baseline (None if the baseline is 0).
+    """
+    comparison = {}
+    phases = [phase for phase in PHASES if phase in baseline['phases'] or phase in candidate['phases']]
+    for phase in phases:
+        before = baseline['phases'].get(phase, {}).get('seconds', 0.0)
+        after = candidate['phases'].get(phase, {}).get('seconds', 0.0)
+        comparison[phase] = (before, after, after / before if before else None)
+    before, after = baseline['seconds'], candidate['seconds']
+    comparison['total'] = (before, after, after / before if before else None)
+    return comparison
@@ -0,0 +1,160 @@
+import heapq
+import math
+import random
+
+from models import to_day
+
+# Event kinds, in the order they are handled within a day: invoices are issued
+# before payments, as issue_invoices runs before process_payments.
+ISSUE, PAYMENT, DEFAULT = 0, 1, 2
+
+def payment_chance(percentage):
+    """Probability that rng.randint(1, 100) <= percentage, the test process_payments uses."""
+    return min(max(math.floor(percentage), 0), 100) / 100
+
+class EventScheduler:
+    """
+    Next-event alternative to the per-day loop in main.start_simulation.
+
+    Instead of rolling for every customer edge and every due invoice each day,
+    the scheduler draws when the next thing happens and keeps those events in a
+    priority queue keyed by day. The per-day probabilities are those of
+    issue_invoices and process_payments, so the waiting times are geometric:
+
+    - each edge's next invoice arrives after a geometric number of days with the
+      edge's daily invoice probability;
+    - an invoice's payer tries to pay it on its due date with its on-time chance,
+      then on each day up to max_payment_delay days late with half that chance,
+      then with the full chance again. The day of payment is drawn at once, one
+      geometric draw per stage it reaches.
+
+    The work done is proportional to the number of invoices, payments and
+    defaults instead of days x edges. Invoices are issued and paid through
+    Business.issue_invoice and Business.issue_payment, so the businesses end up
+    in the same state as with the object engine, though the draws differ. One
+    difference in the events sent to a sink: invoice_defaulted is sent once, on
+    the first day an invoice is past its payer's max_payment_delay, not on
+    every day it stays unpaid.
+
+    The customer edges and their probabilities are read when the scheduler is
+    created; edges added afterwards are not picked up. As in issue_invoices and
+    process_payments, a business with its own business.rng draws from it.
+    """
+
+    def __init__(self, businesses, start_day, rng=random, payment_terms=30, first_day=1, sink=None):
+        """
+        :param start_day: Day ordinal (or date) of the day before day 1; day d is start_day + d.
+        :param rng: Source of randomness, the random module or a random.Random instance.
+        :param payment_terms: Number of days between issuing an invoice and its due date.
+        :param first_day: The first day to be simulated.
+        :param sink: Optional events.EventSink receiving invoice, payment and default events.
+        """
+        self.businesses = businesses
+        self.start_day = to_day(start_day)
+        self.rng = rng
+        self.payment_terms = payment_terms
+        self.sink = sink
+        self.day = first_day - 1  # Last day processed
+        self._events = []  # Heap of (day, kind, sequence number, edge or invoice)
+        self._sequence = 0
+
+        self.edges = []  # (issuer, customer, daily invoice probability)
+        for business in businesses:
+            if not business.customer_list:
+                continue
+            # Same uniform spread of invoices_per_year over customers and days as issue_invoices
+            probability = business.attributes.invoices_per_year / len(business.customer_list) / 365.0
+            for customer in business.customer_list:
+                self.edges.append((business, customer, probability))
+        for edge in range(len(self.edges)):
+            self._schedule_issue(edge, self.day)
+
+        # Invoices already open, e.g. in businesses restored from a checkpoint
+        for business in businesses:
+            for invoice in business.open_invoices:
+                self._schedule_payment(invoice, first_day)
+
+    def _geometric(self, probability, rng):
+        """Number of daily trials up to and including the first success, or None if there never is one."""
+        if probability >= 1:
+            return 1
+        if probability <= 0:
+            return None
+        return 1 + int(math.log(1.0 - rng.random()) / math.log1p(-probability))
+
+    def _push(self, day, kind, item):
+        heapq.heappush(self._events, (day, kind, self._sequence, item))
+        self._sequence += 1
+
+    def _schedule_issue(self, edge, after_day):
+        business, _, probability = self.edges[edge]
+        wait = self._geometric(probability, business.rng or self.rng)
+        if wait is not None:
+            self._push(after_day + wait, ISSUE, edge)
+
+    def _schedule_payment(self, invoice, from_day):
+        """Draws the day, on or after from_day, on which the payer pays invoice, and schedules it."""
+        attributes = invoice.recipient.attributes
+        rng = invoice.recipient.rng or self.rng
+        due_day = invoice.due_date - self.start_day
+        last_late_day = due_day + attributes.max_payment_delay
+        on_time = payment_chance(attributes.on_time_payment_percentage)
+        late = payment_chance(attributes.on_time_payment_percentage / 2)
+
+        day = max(from_day, due_day)
+        if day == due_day:
+            if rng.random() < on_time:
+                self._push(day, PAYMENT, invoice)
+                return
+            day += 1
+        if day <= last_late_day:
+            wait = self._geometric(late, rng)
+            if wait is not None and day + wait - 1 <= last_late_day:
+                self._push(day + wait - 1, PAYMENT, invoice)
+                return
+            day = last_late_day + 1
+        # Past the maximum delay: the invoice is in default until paid, if ever
+        if day == last_late_day + 1:
+            self._push(day, DEFAULT, invoice)
+        wait = self._geometric(on_time, rng)
+        if wait is not None:
+            self._push(day + wait - 1, PAYMENT, invoice)
+
+    def simulation_day(self, day):
+        return self.start_day + day
+
+    def advance(self, day):
+        """Handles every event up to and including day. Returns the number of events handled."""
+        events = self._events
+        handled = 0
+        current_day = simulation_day = None
+        while events and events[0][0] <= day:
+            event_day, kind, _, item = heapq.heappop(events)
+            if event_day != current_day:
+                current_day, simulation_day = event_day, self.simulation_day(event_day)
+            if kind == ISSUE:
+                business, customer, _ = self.edges[item]
+                # An edge with a failed business at either end issues no more invoices
+                if not business.failed and not customer.failed:
+                    due_date = simulation_day + self.payment_terms
+                    invoice = business.issue_invoice(customer, due_date, business.rng or self.rng)
+                    if self.sink is not None:
+                        self.sink.invoice_issued(simulation_day, invoice)
+                    self._schedule_payment(invoice, event_day + 1)
+                    self._schedule_issue(item, event_day)
+            # A failed business pays nothing, so its invoices' events are dropped
+            elif not item.recipient.failed and item in item.recipient.open_invoices:
+                days_overdue = max(simulation_day - item.due_date, 0)
+                if kind == PAYMENT:
+                    payment = item.recipient.issue_payment([item], item.outstanding_balance, simulation_day)
+                    if self.sink is not None:
+                        self.sink.payment_made(simulation_day, payment, days_overdue)
+                elif self.sink is not None:
+                    self.sink.invoice_defaulted(simulation_day, item, days_overdue)
+            handled += 1
+        self.day = max(self.day, day)
+        return handled
+
+    @property
+    def num_pending_events(self):
+        return len(self._events)
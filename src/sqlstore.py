@@ -0,0 +1,222 @@
+"""
+Invoice and payment history in an SQLite database.
+
+SQLiteSink is an events.EventSink that records every invoice, payment and
+default of a run in a local SQLite file. The rows of each simulated day are
+buffered and written with one executemany per table in a single transaction
+at the end of the day. With prune_interval set, the sink also drops closed
+invoices and their payments from the businesses every prune_interval days
+(Business.prune_closed), so memory holds only the open part of the history
+and the rest lives in the database. Example:
+
+    store = SQLiteSink('run.db', prune_interval=30)
+    start_simulation(businesses, 3650, verbose=False, sink=store)
+    for row in aging_report('run.db', as_of=EPOCH.toordinal() + 3650):
+        print(row)
+
+Dates are stored as the simulation's integer day ordinals. The invoices
+table is indexed on issuer, recipient, due day and status, so reports such as
+aging_report are indexed SQL queries rather than scans over Python objects.
+"""
+import sqlite3
+
+from events import EventSink
+from models import to_day
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS businesses (
+    id INTEGER PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    issuer INTEGER NOT NULL,
+    recipient INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    issue_day INTEGER NOT NULL,
+    due_day INTEGER NOT NULL,
+    outstanding_balance REAL NOT NULL,
+    status TEXT NOT NULL,
+    paid_day INTEGER
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    payer INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    payment_day INTEGER NOT NULL,
+    days_overdue INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS allocations (
+    payment INTEGER NOT NULL,
+    invoice INTEGER NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS defaults (
+    invoice INTEGER PRIMARY KEY,
+    default_day INTEGER NOT NULL,
+    days_overdue INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clearings (
+    invoice INTEGER NOT NULL,
+    clearing_day INTEGER NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS balances (
+    day INTEGER NOT NULL,
+    business INTEGER NOT NULL,
+    cash REAL NOT NULL,
+    accounts_receivable REAL NOT NULL,
+    accounts_payable REAL NOT NULL,
+    debt REAL NOT NULL,
+    PRIMARY KEY (day, business)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS invoices_issuer ON invoices (issuer);
+CREATE INDEX IF NOT EXISTS invoices_recipient ON invoices (recipient);
+CREATE INDEX IF NOT EXISTS invoices_due_day ON invoices (due_day);
+CREATE INDEX IF NOT EXISTS invoices_status ON invoices (status, due_day);
+CREATE INDEX IF NOT EXISTS payments_payer ON payments (payer);
+CREATE INDEX IF NOT EXISTS allocations_invoice ON allocations (invoice);
+CREATE INDEX IF NOT EXISTS clearings_invoice ON clearings (invoice);
+"""
+
+OPEN_STATUSES = ('issued', 'partially_paid')
+
+class SQLiteSink(EventSink):
+    """
+    Writes a run's invoices, payments, defaults, clearings and (every
+    snapshot_interval days, 0 for never) balance sheets to the SQLite database
+    at path.
+
+    The state of the invoices in the database follows the payment and clearing
+    events. Invoices written off without an event, by
+    contagion.propagate_defaults, are brought up to date when the sink prunes
+    and when it is closed. An existing database is added to, so a run resumed
+    from a checkpoint can continue writing where it stopped.
+    """
+
+    def __init__(self, path, prune_interval=0, snapshot_interval=0):
+        self.path = path
+        self.prune_interval = prune_interval
+        self.snapshot_interval = snapshot_interval
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self._invoices = []
+        self._payments = []
+        self._allocations = []
+        self._defaults = []
+        self._clearings = []
+        self._updated = {}  # invoice id -> invoice whose balance or status changed today
+        self._open = {}  # invoice id -> [invoice, outstanding balance last written] for open invoices
+        self._known_businesses = set()
+
+    def invoice_issued(self, simulation_day, invoice):
+        self._invoices.append((invoice.id, invoice.issuer.id, invoice.recipient.id, invoice.amount,
+                               simulation_day, invoice.due_date, invoice.outstanding_balance,
+                               invoice.status, invoice.paid_date))
+        self._open[invoice.id] = [invoice, invoice.outstanding_balance]
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        self._payments.append((payment.id, payment.payer.id, payment.amount, simulation_day,
+                               days_overdue))
+        for invoice, percentage in zip(payment.invoices, payment.distribution_percentages):
+            self._allocations.append((payment.id, invoice.id, payment.amount * (percentage / 100)))
+            self._updated[invoice.id] = invoice
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        # The object engine reports a default every day; the table keeps the first
+        self._defaults.append((invoice.id, simulation_day, days_overdue))
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        self._clearings.append((invoice.id, simulation_day, amount))
+        self._updated[invoice.id] = invoice
+
+    def end_of_day(self, day, simulation_day, businesses):
+        if len(self._known_businesses) < len(businesses):
+            new = [business for business in businesses if business.id not in self._known_businesses]
+            self.connection.executemany('INSERT OR REPLACE INTO businesses VALUES (?, ?)',
+                                        [(business.id, business.name) for business in new])
+            self._known_businesses.update(business.id for business in new)
+        if self.prune_interval and day % self.prune_interval == 0:
+            self._find_updates()
+        self.flush()
+        if self.snapshot_interval and day % self.snapshot_interval == 0:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO balances VALUES (?, ?, ?, ?, ?, ?)',
+                    [(simulation_day, business.id, b.cash, b.accounts_receivable, b.accounts_payable, b.debt)
+                     for business, b in ((business, business.balance_sheet) for business in businesses)])
+        if self.prune_interval and day % self.prune_interval == 0:
+            for business in businesses:
+                business.prune_closed()
+
+    def _find_updates(self):
+        # Open invoices whose balance changed without a payment event
+        for invoice_id, (invoice, balance) in self._open.items():
+            if invoice.outstanding_balance != balance:
+                self._updated[invoice_id] = invoice
+
+    def flush(self):
+        """Writes the buffered rows in one transaction."""
+        updates = []
+        for invoice_id, invoice in self._updated.items():
+            updates.append((invoice.outstanding_balance, invoice.status, invoice.paid_date, invoice_id))
+            if invoice.status in OPEN_STATUSES:
+                if invoice_id in self._open:
+                    self._open[invoice_id][1] = invoice.outstanding_balance
+            else:
+                self._open.pop(invoice_id, None)
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO invoices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        self._invoices)
+            self.connection.executemany(
+                'UPDATE invoices SET outstanding_balance = ?, status = ?, paid_day = ? WHERE id = ?', updates)
+            self.connection.executemany('INSERT OR REPLACE INTO payments VALUES (?, ?, ?, ?, ?)', self._payments)
+            self.connection.executemany('INSERT INTO allocations VALUES (?, ?, ?)', self._allocations)
+            self.connection.executemany('INSERT OR IGNORE INTO defaults VALUES (?, ?, ?)', self._defaults)
+            self.connection.executemany('INSERT INTO clearings VALUES (?, ?, ?)', self._clearings)
+        for rows in (self._invoices, self._payments, self._allocations, self._defaults, self._clearings):
+            rows.clear()
+        self._updated.clear()
+
+    def close(self):
+        self._find_updates()
+        self.flush()
+        self.connection.close()
+
+def aging_report(database, as_of, by=None, buckets=(30, 60, 90)):
+    """
+    Ages the invoices open in database (a path or an sqlite3 connection) as of a date or day ordinal.
+
+    Each open invoice falls into 'current' (not yet due) or a bucket of days past
+    due: with the default buckets '1-30', '31-60', '61-90' and '90+'. With
+    by='issuer' the report is per business's receivables, with by='recipient'
+    per business's payables. Returns rows of (business id or None, bucket,
+    invoices, outstanding balance), oldest bucket last.
+    """
+    if by not in (None, 'issuer', 'recipient'):
+        raise ValueError(f"Invalid grouping: {by}")
+    as_of = to_day(as_of)
+    labels = ['current']
+    cases = ['WHEN ? - due_day <= 0 THEN 0']
+    parameters = [as_of]
+    lower = 1
+    for i, upper in enumerate(buckets, start=1):
+        labels.append(f"{lower}-{upper}")
+        cases.append(f"WHEN ? - due_day <= ? THEN {i}")
+        parameters += [as_of, upper]
+        lower = upper + 1
+    labels.append(f"{buckets[-1]}+")
+    group = by or 'NULL'
+    query = (f"SELECT {group}, CASE {' '.join(cases)} ELSE {len(buckets) + 1} END AS bucket, "
+             f"COUNT(*), SUM(outstanding_balance) FROM invoices "
+             f"WHERE status IN ({', '.join('?' * len(OPEN_STATUSES))}) "
+             f"GROUP BY {group}, bucket ORDER BY {group}, bucket")
+    connection = database if isinstance(database, sqlite3.Connection) else sqlite3.connect(database)
+    try:
+        rows = connection.execute(query, [*parameters, *OPEN_STATUSES]).fetchall()
+    finally:
+        if connection is not database:
+            connection.close()
+    return [(business, labels[bucket], count, total) for business, bucket, count, total in rows]
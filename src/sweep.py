@@ -0,0 +1,246 @@
+"""
+Parameter sweeps over preset mixes, network shapes and seeds, with cached results.
+
+A sweep is a base run config, as used by batch.py, plus a grid of axes: each
+axis names a config key and lists the values to try, and every combination of
+values is one cell. Keys may be dotted to vary one parameter of a nested
+setting, e.g. "topology.max_customers". Example grid file:
+
+    {
+        "presets": [["A3"], ["C3"], {"A3": 1, "F3": 1}],
+        "topology": [{"kind": "dense"}, {"kind": "scale_free", "edges_per_business": 3}],
+        "seed": [1, 2, 3]
+    }
+
+Cells run in parallel over a process pool, with the object or event engine.
+Besides the balance-sheet totals, each row holds the totals of the config's
+hooks, such as clearing_gross or contagion_failed. Output settings such as
+"events" or "database" do not change a cell's key; each cell writes them to its
+own files, with the cell's key appended to the configured path or prefix. Each cell's summary is stored in the
+cache directory under the SHA-256 of its complete config, so re-running a sweep
+after adding a value to one axis only runs the new cells. Example:
+
+    python sweep.py --config base.json --grid grid.json --cache .sweep-cache --output sweep.csv
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import batch
+from business_attributes import AttributesMenu
+from events import EventSink
+from montecarlo import CashTracker, defaulted_businesses
+
+# Bump when a change to the simulation makes cached summaries stale
+CACHE_VERSION = 3
+
+# Settings that only change what a run prints or writes, not its outcome
+OUTPUT_KEYS = ('quiet', 'visualize', 'events', 'metrics', 'aging', 'database', 'profile', 'checkpoint')
+
+def preset_grid(reliabilities='ABCDEF', volumes='12345'):
+    """
+    Lists single-preset mixes over the AttributesMenu grid, e.g. preset_grid('AF', '3')
+    gives [['A3'], ['F3']], for use as a "presets" axis.
+    """
+    mixes = [[f"{reliability}{volume}"] for reliability in reliabilities for volume in volumes]
+    for (name,) in mixes:
+        if name not in AttributesMenu.presets:
+            raise ValueError(f"Unknown preset: {name}")
+    return mixes
+
+def set_path(config, key, value):
+    """Sets config[key], where a dotted key sets a value inside nested dicts."""
+    *parents, last = key.split('.')
+    for parent in parents:
+        config[parent] = dict(config.get(parent) or {})
+        config = config[parent]
+    config[last] = value
+
+def expand_grid(base, axes):
+    """Returns one (values, config) pair per cell of the grid, values mapping axis to value."""
+    names = list(axes)
+    cells = []
+    for combination in itertools.product(*(axes[name] for name in names)):
+        config = json.loads(json.dumps(base))
+        values = dict(zip(names, combination))
+        for name, value in values.items():
+            set_path(config, name, value)
+        cells.append((values, config))
+    return cells
+
+def config_key(config):
+    """Hash identifying the outcome of a config: equal configs hash equal whatever their key order."""
+    relevant = {key: value for key, value in config.items() if key not in OUTPUT_KEYS}
+    text = json.dumps([CACHE_VERSION, relevant], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class ResultCache:
+    """Directory of cell summaries stored as <config key>.json."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached summary for key, or None."""
+        try:
+            with open(self.path(key)) as f:
+                return json.load(f)['summary']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, key, config, summary):
+        # Written to a temporary file and renamed, so an interrupted sweep never leaves half an entry
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'config': config, 'summary': summary}, f)
+        os.replace(temporary, self.path(key))
+
+# Output setting -> the key of its file path or prefix
+OUTPUT_PATHS = {'events': 'prefix', 'metrics': 'path', 'aging': 'path', 'database': 'path', 'profile': 'path',
+                'checkpoint': 'path'}
+
+class EventCounts(EventSink):
+    """Counts a run's invoices and payments as they happen, so pruning the businesses' lists cannot change them."""
+
+    def __init__(self):
+        self.invoices_issued = 0
+        self.payments_made = 0
+
+    def invoice_issued(self, simulation_day, invoice):
+        self.invoices_issued += 1
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        self.payments_made += 1
+
+def cell_outputs(config, key):
+    """
+    Returns config with the cell's key added to every output path, e.g.
+    "out/run" -> "out/run-<key>", so cells running in parallel never write to
+    the same files.
+    """
+    config = dict(config)
+    for name, field in OUTPUT_PATHS.items():
+        settings = config.get(name)
+        if isinstance(settings, dict) and settings.get(field):
+            root, extension = os.path.splitext(settings[field]) if field == 'path' else (settings[field], '')
+            config[name] = {**settings, field: f"{root}-{key[:16]}{extension}"}
+    return config
+
+def check_cell(config):
+    """
+    Raises ValueError if config cannot be run as a cell. The counts and default
+    rate of a cell are read off the businesses' invoices and payments, which the
+    vectorized engine does not keep; montecarlo.py runs vectorized replicates.
+    """
+    if config.get('engine', 'object') == 'vectorized':
+        raise ValueError("Sweeps need the object or event engine, not the vectorized one")
+    batch.check_hooks(config)
+
+def run_cell(config):
+    """
+    Runs one cell and returns its summary as a dict of numbers, including the
+    summary of each hook of the config as "<key>_<total>", e.g. "clearing_gross".
+    """
+    check_cell(config)
+    config = cell_outputs(dict(config, quiet=True, visualize=False), config_key(config))
+    tracker = CashTracker(int(config['businesses']))
+    counts = EventCounts()
+    config_hooks = {}
+    businesses = batch.run(config, hooks=[tracker], config_hooks=config_hooks, sink=counts)
+    summary = batch.summarize(businesses)
+    for name, hook in config_hooks.items():
+        for total, value in hook.summary().items():
+            summary[f"{name}_{total}"] = value
+    defaulted = defaulted_businesses(businesses, tracker.last_day)
+    summary['invoices_issued'] = counts.invoices_issued
+    summary['payments_made'] = counts.payments_made
+    summary['default_rate'] = float(defaulted.mean())
+    summary['cash_shortfall'] = float(np.maximum(-tracker.min_cash, 0).sum())
+    return summary
+
+def run_sweep(base, axes, cache_dir='.sweep-cache', processes=None):
+    """
+    Runs every cell of the grid not already in the cache.
+
+    A base config without a seed uses seed 0, so that every cell is
+    reproducible and can be cached. Returns one row per cell, in grid order:
+    a dict of the axis values, the summary, 'key' and 'cached' (whether the
+    summary came from the cache).
+    """
+    base = {**json.loads(json.dumps(batch.DEFAULT_CONFIG)), **base}
+    if base.get('seed') is None:
+        base['seed'] = 0
+    cache = ResultCache(cache_dir)
+    cells = expand_grid(base, axes)
+    keys = [config_key(config) for _, config in cells]
+    summaries = [cache.get(key) for key in keys]
+    cached = [summary is not None for summary in summaries]
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+
+    def store(computed):
+        # Every summary is cached as soon as it arrives, so an interrupted sweep keeps its progress
+        for i, summary in zip(missing, computed):
+            cache.put(keys[i], cells[i][1], summary)
+            summaries[i] = summary
+
+    configs = [cells[i][1] for i in missing]
+    for config in configs:
+        check_cell(config)
+    if processes == 1 or len(configs) <= 1:
+        store(map(run_cell, configs))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            store(pool.map(run_cell, configs))
+
+    return [
+        {**values, **summary, 'key': key, 'cached': was_cached}
+        for (values, _), summary, key, was_cached in zip(cells, summaries, keys, cached)
+    ]
+
+def write_rows(rows, output):
+    """Writes sweep rows to a .csv or .json file, nested axis values as JSON."""
+    if output.endswith('.json'):
+        with open(output, 'w') as f:
+            json.dump(rows, f, indent=2)
+        return
+    fields = list(rows[0]) if rows else []
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                             for key, value in row.items()})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a cached parameter sweep over run configs.")
+    parser.add_argument('--config', help="JSON or TOML base run config, as used by batch.py")
+    parser.add_argument('--grid', required=True, help="JSON or TOML file mapping config keys to lists of values")
+    parser.add_argument('--cache', default='.sweep-cache', help="directory of cached cell results")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--output', help="write the rows to a .csv or .json file instead of stdout")
+    args = parser.parse_args(argv)
+
+    base = batch.load_config(args.config) if args.config else {}
+    rows = run_sweep(base, batch.load_config(args.grid), cache_dir=args.cache, processes=args.processes)
+    if args.output:
+        write_rows(rows, args.output)
+    else:
+        json.dump(rows, sys.stdout)
+        print()
+    computed = sum(not row['cached'] for row in rows)
+    print(f"{len(rows)} cells, {computed} computed, {len(rows) - computed} from the cache", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import unittest
+import datetime
+import os
+import random
+import tempfile
+import numpy as np
+from analytics import AgingTracker, aging_table, bucket_index, days_outstanding, invoice_columns
+from main import start_simulation
+from test_engine import build_network
+
+START = datetime.date(2024, 6, 1)
+
+class TestAnalytics(unittest.TestCase):
+    def test_bucket_index(self):
+        np.testing.assert_array_equal(bucket_index([-5, 0, 1, 30, 31, 60, 61]), [0, 0, 1, 1, 2, 2, 3])
+
+    def test_days_outstanding(self):
+        dso = days_outstanding([100, 200, 300, 300], [100, 100, 0, 0], window=2)
+        np.testing.assert_allclose(dso, [1.0, 2.0, 6.0, np.nan])
+
+    def test_tracker_matches_open_invoices(self):
+        businesses = build_network(4, invoices_per_year=365 * 2, on_time_payment_percentage=30, max_payment_delay=60)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'aging.npz')
+            tracker = AgingTracker(businesses, 120, path=path)
+            start_simulation(businesses, 120, verbose=False, rng=random.Random(3), sink=tracker, start_date=START)
+            with np.load(path) as saved:
+                np.testing.assert_array_equal(saved['aging_balance'], tracker.aging_balance)
+                self.assertEqual(saved['business_dso'].shape, (120, 4))
+
+        # The tracker's aging equals a pass over the businesses' open invoices on the last day
+        as_of = START + datetime.timedelta(days=120)
+        expected = aging_table(invoice_columns(businesses), as_of, by='issuer')
+        table = tracker.aging(by='issuer')
+        self.assertEqual(table['labels'], ['current', '1-30', '31-60', '60+'])
+        np.testing.assert_array_equal(table['business_id'], expected['business_id'])
+        np.testing.assert_array_equal(table['count'], expected['count'])
+        np.testing.assert_allclose(table['balance'], expected['balance'])
+        self.assertGreater(table['balance'][:, 1:].sum(), 0)  # Some invoices are overdue
+        np.testing.assert_allclose(tracker.aging_balance[-1].sum(),
+                                   sum(b.balance_sheet.accounts_receivable for b in businesses))
+        # Businesses with receivables have a DSO; the last one has no customers
+        receivable = [b.balance_sheet.accounts_receivable for b in businesses]
+        np.testing.assert_allclose(tracker.business_dso[-1, :3] * tracker._sales_window.sum(axis=0)[:3] / 30,
+                                   receivable[:3])
+        self.assertTrue(np.isnan(tracker.business_dso[-1, 3]))
+
+    def test_tracker_follows_clearing_and_write_downs(self):
+        from contagion import ContagionHook
+        from netting import ClearingHook
+        businesses = build_network(6, invoices_per_year=365, on_time_payment_percentage=30, max_payment_delay=60)
+        tracker = AgingTracker(businesses, 90)
+        contagion = ContagionHook(interval=5)
+        clearing = ClearingHook(interval=7, sink=tracker)
+        start_simulation(businesses, 90, verbose=False, rng=random.Random(2), sink=tracker, start_date=START,
+                         hooks=[contagion, clearing])
+        self.assertGreater(contagion.summary()['failed'], 0)
+        self.assertGreater(clearing.summary()['invoices_cleared'], 0)
+
+        expected = aging_table(invoice_columns(businesses), START + datetime.timedelta(days=90), by='recipient')
+        table = tracker.aging(by='recipient')
+        np.testing.assert_array_equal(table['count'], expected['count'])
+        np.testing.assert_allclose(table['balance'], expected['balance'])
+        self.assertLessEqual(len(tracker._invoices), 2 * len(tracker._slots) + 1)
+
+    def test_network_dso(self):
+        businesses = build_network(4, invoices_per_year=365 * 3)
+        tracker = AgingTracker(businesses, 45)
+        start_simulation(businesses, 45, verbose=False, rng=random.Random(1), sink=tracker, start_date=START)
+        # On-time payers pay on the due date, 30 days after issue
+        self.assertAlmostEqual(tracker.dso[-1], 30.0)
+        self.assertAlmostEqual(tracker.dpo[-1], 30.0)
+        np.testing.assert_array_equal(tracker.aging_balance[:, 1:], 0)
+
+    def test_ledger_columns(self):
+        from ledger import Ledger
+        from main import build_businesses
+        ledger = Ledger()
+        businesses = build_businesses(['A3', 'C3', 'F3'], ledger=ledger)
+        for business in businesses:
+            for customer in businesses:
+                if customer is not business:
+                    business.add_customer(customer)
+                    business.attributes.set_customer_average(customer, 1000)
+        start_simulation(businesses, 60, verbose=False, rng=random.Random(4), start_date=START)
+        as_of = START + datetime.timedelta(days=60)
+        from_ledger = aging_table(invoice_columns(ledger), as_of, by='recipient')
+        from_objects = aging_table(invoice_columns(businesses), as_of, by='recipient')
+        np.testing.assert_array_equal(from_ledger['count'], from_objects['count'])
+        np.testing.assert_allclose(from_ledger['balance'], from_objects['balance'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+import numpy as np
+from batch import DEFAULT_CONFIG, build_hooks, config_from_args, main, parse_args, parse_preset_args, run, summarize
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.config = {**json.loads(json.dumps(DEFAULT_CONFIG)), 'businesses': 8, 'presets': ['F3', 'C3'],
+                       'days': 60, 'seed': 5, 'quiet': True}
+
+    def test_parse_preset_args(self):
+        self.assertEqual(parse_preset_args(['a1', 'C3']), ['A1', 'C3'])
+        self.assertEqual(parse_preset_args(['a1=2', 'C3=1']), {'A1': 2.0, 'C3': 1.0})
+
+    def test_flags_override_the_config_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.json')
+            with open(path, 'w') as f:
+                json.dump({'businesses': 50, 'days': 90, 'seed': 1,
+                           'topology': {'kind': 'scale_free', 'edges_per_business': 3},
+                           'events': {'prefix': 'out/run', 'buffer_size': 100},
+                           'financing': {'credit_rate': 0.05}}, f)
+
+            config = config_from_args(parse_args(['--config', path, '--days', '30', '--presets', 'A3=2', 'F3=1',
+                                                  '--events-format', 'csv', '--credit-limit', '1000',
+                                                  '--clearing-interval', '7', '--topology-param', 'seed=4']))
+            self.assertEqual(config['businesses'], 50)
+            self.assertEqual(config['days'], 30)
+            self.assertEqual(config['seed'], 1)
+            self.assertEqual(config['engine'], 'object')
+            self.assertEqual(config['presets'], {'A3': 2.0, 'F3': 1.0})
+            self.assertEqual(config['topology'], {'kind': 'scale_free', 'edges_per_business': 3, 'seed': 4})
+            self.assertEqual(config['events'], {'prefix': 'out/run', 'buffer_size': 100, 'format': 'csv'})
+            self.assertEqual(config['financing'], {'credit_rate': 0.05, 'credit_limit': 1000.0})
+            self.assertEqual(config['clearing'], {'interval': 7})
+            self.assertIsNone(config['contagion'])
+
+            # Another topology kind drops the parameters of the configured one
+            config = config_from_args(parse_args(['--config', path, '--topology', 'sparse_random']))
+            self.assertEqual(config['topology'], {'kind': 'sparse_random'})
+
+        config = config_from_args(parse_args(['--engine', 'event', '--seed', '3', '--checkpoint', 'run.ckpt',
+                                              '--database', 'run.db', '--prune-interval', '30',
+                                              '--render', 'run.gif']))
+        self.assertEqual(config['businesses'], DEFAULT_CONFIG['businesses'])
+        self.assertEqual((config['engine'], config['seed']), ('event', 3))
+        self.assertEqual(config['checkpoint'], {'path': 'run.ckpt'})
+        self.assertEqual(config['database'], {'path': 'run.db', 'prune_interval': 30})
+        self.assertEqual(config['visualize'], 'run.gif')
+
+    def test_seed_and_engines(self):
+        first = summarize(run(self.config))
+        self.assertEqual(summarize(run(self.config)), first)
+        self.assertNotEqual(summarize(run(dict(self.config, seed=6))), first)
+        for engine in ('object', 'vectorized', 'event'):
+            summary = summarize(run(dict(self.config, engine=engine)))
+            self.assertAlmostEqual(summary['cash'], 0.0, places=3)
+            self.assertAlmostEqual(summary['accounts_receivable'], summary['accounts_payable'], places=3)
+            self.assertGreater(summary['accounts_receivable'], 0)
+
+    def test_output_options(self):
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'run')
+            config = dict(self.config, events={'prefix': prefix, 'format': 'csv'},
+                          metrics={'path': f"{prefix}.metrics.npz"}, aging={'path': f"{prefix}.aging.npz"},
+                          database={'path': f"{prefix}.db"}, checkpoint={'path': f"{prefix}.ckpt", 'interval': 30})
+            run(config)
+            for suffix in ('.events.csv', '.snapshots.csv', '.db', '.ckpt'):
+                self.assertTrue(os.path.exists(prefix + suffix), suffix)
+            with np.load(f"{prefix}.metrics.npz") as metrics, np.load(f"{prefix}.aging.npz") as aging:
+                self.assertEqual(len(metrics['day']), 60)
+                self.assertEqual(len(aging['day']), 60)
+                self.assertGreater(metrics['invoices_issued'].sum(), 0)
+
+            # Resuming from the checkpoint continues to the new last day
+            resumed = run(dict(self.config, resume=f"{prefix}.ckpt", days=90))
+            self.assertEqual(summarize(resumed), summarize(run(dict(self.config, days=90))))
+
+    def test_each_hook_key_takes_effect(self):
+        base = summarize(run(self.config))
+        settings = {'clearing': {'interval': 7}, 'contagion': {'interval': 1}, 'financing': {'credit_limit': 50000}}
+        for key, setting in settings.items():
+            hooks = {}
+            summary = summarize(run(dict(self.config, **{key: setting}), config_hooks=hooks))
+            self.assertEqual(list(hooks), [key])
+            self.assertNotEqual(summary, base, key)
+            if key == 'financing':
+                self.assertGreater(summary['debt'], 0)
+                self.assertGreater(hooks[key].summary()['drawn'], 0)
+            else:
+                self.assertEqual(hooks[key].summary()['rounds'], 60 // setting['interval'])
+
+        hooks = build_hooks(dict(self.config, **settings))
+        self.assertEqual(list(hooks), ['clearing', 'financing', 'contagion'])
+        self.assertEqual(hooks['contagion'].credit_limit, 50000)
+        with self.assertRaises(ValueError):
+            run(dict(self.config, engine='vectorized', clearing={'interval': 7}))
+        with self.assertRaises(ValueError):
+            run(dict(self.config, financing={'factoring_discount': 0.03}, checkpoint={'path': 'run.ckpt'}))
+
+    def test_vectorized_runs_cannot_be_checkpointed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run-{day}.ckpt')
+            config = config_from_args(parse_args(['--engine', 'vectorized', '--checkpoint', path, '--quiet']))
+            with self.assertRaises(ValueError):
+                run(config)
+            self.assertEqual(os.listdir(directory), [])
+            with self.assertRaises(ValueError):
+                run(dict(self.config, engine='vectorized', resume=os.path.join(directory, 'run-30.ckpt')))
+
+    def test_main_prints_the_summary(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(['--businesses', '6', '--days', '20', '--seed', '2', '--quiet', '--clearing-interval', '5'])
+        summary = json.loads(output.getvalue())
+        self.assertEqual(summary['businesses'], 6)
+        self.assertEqual(summary['clearing']['rounds'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
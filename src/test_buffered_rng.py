@@ -0,0 +1,58 @@
+import unittest
+import datetime
+import os
+import random
+import tempfile
+import numpy as np
+from buffered_rng import BufferedRNG, seed_businesses
+from checkpoint import Checkpointer, resume
+from main import build_businesses, connect_businesses, start_simulation
+
+class TestBufferedRNG(unittest.TestCase):
+    def test_blocks_follow_the_numpy_stream(self):
+        rng = BufferedRNG(5, block_size=3)
+        expected = np.random.default_rng(5).random(7)
+        self.assertEqual([rng.random() for _ in range(7)], expected.tolist())
+
+        rng = BufferedRNG(5, block_size=4)
+        expected = 10 + 2 * np.random.default_rng(5).standard_normal(4)
+        self.assertEqual([rng.normalvariate(10, 2) for _ in range(4)], expected.tolist())
+
+    def test_randint_and_state(self):
+        rng = BufferedRNG(1, block_size=16)
+        values = [rng.randint(1, 100) for _ in range(1000)]
+        self.assertEqual(min(values), 1)
+        self.assertEqual(max(values), 100)
+        self.assertLess(rng.getrandbits(64), 2 ** 64)
+
+        state = rng.getstate()
+        draws = [rng.random() for _ in range(40)]
+        rng.setstate(state)
+        self.assertEqual([rng.random() for _ in range(40)], draws)
+
+    def test_business_streams_are_reproducible(self):
+        results = []
+        for _ in range(2):
+            businesses = build_businesses(['D3', 'B4', 'F2', 'A5'])
+            connect_businesses(businesses, rng=random.Random(1))
+            seed_businesses(businesses, 9)
+            random.seed()  # The global stream must not matter
+            start_simulation(businesses, 60, verbose=False)
+            results.append([(len(b.sent_invoices), b.balance_sheet.cash) for b in businesses])
+        self.assertEqual(results[0], results[1])
+
+    def test_checkpoint_keeps_business_streams(self):
+        businesses = build_businesses(['D3', 'B4', 'F2', 'A5'])
+        connect_businesses(businesses, rng=random.Random(1))
+        seed_businesses(businesses, 4, block_size=64)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run-{day}.ckpt')
+            start_simulation(businesses, 60, verbose=False, start_date=datetime.date.today(),
+                             hooks=[Checkpointer(path, None, interval=30)])
+            resumed = resume(path.format(day=30), 60, verbose=False)
+        for original, restored in zip(businesses, resumed):
+            self.assertEqual(len(restored.payments_made), len(original.payments_made))
+            self.assertAlmostEqual(restored.balance_sheet.cash, original.balance_sheet.cash, places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+# test_business_attributes.py
+import unittest
+from business_attributes import AttributesMenu
+from models import Business, CustomerAverages
+
+class TestPresetAttributes(unittest.TestCase):
+    def test_businesses_of_one_preset_keep_their_own_averages(self):
+        customer = Business(id=3, name='Customer', attributes=AttributesMenu.get_attribute('C2'))
+        first = Business(id=1, name='First', attributes=AttributesMenu.get_attribute('A3'))
+        second = Business(id=2, name='Second', attributes=AttributesMenu.get_attribute('A3'))
+        first.attributes.set_customer_average(customer, 5000)
+
+        self.assertIs(first.attributes.preset, second.attributes.preset)
+        self.assertEqual(first.attributes.customer_averages[customer], 5000)
+        self.assertNotIn(customer, second.attributes.customer_averages)
+
+        second.attributes.on_time_payment_percentage = 10
+        self.assertEqual(first.attributes.on_time_payment_percentage, 100)
+
+    def test_presets_cannot_be_changed(self):
+        with self.assertRaises(AttributeError):
+            AttributesMenu.presets['A3'].on_time_payment_percentage = 10
+
+    def test_customer_averages(self):
+        averages = CustomerAverages({'a': 1.0, 'b': 2.0, 'c': 3.0})
+        averages['b'] = 20.0
+        del averages['a']
+        self.assertEqual(dict(averages), {'b': 20.0, 'c': 3.0})
+        self.assertEqual(averages.get('a', 0), 0)
+        averages['d'] = 4.0
+        self.assertEqual(dict(averages), {'b': 20.0, 'c': 3.0, 'd': 4.0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import datetime
+import os
+import random
+import tempfile
+from main import build_businesses, connect_businesses, start_simulation
+from checkpoint import Checkpointer, fork, load_checkpoint, resume, save_checkpoint
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'run-{day}.ckpt')
+        self.start_date = datetime.date.today()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, seed=11):
+        rng = random.Random(seed)
+        businesses = build_businesses(['D3', 'B4', 'F2', 'A5', 'C1'])
+        connect_businesses(businesses, rng=rng)
+        return businesses, rng
+
+    def test_resumed_run_matches_uninterrupted_run(self):
+        businesses, rng = self.build()
+        start_simulation(businesses, 90, verbose=False, rng=rng, start_date=self.start_date,
+                         hooks=[Checkpointer(self.path, rng, interval=45)])
+
+        resumed = resume(self.path.format(day=45), 90, verbose=False)
+        for original, restored in zip(businesses, resumed):
+            self.assertEqual(restored.name, original.name)
+            self.assertEqual([c.id for c in restored.customer_list], [c.id for c in original.customer_list])
+            self.assertEqual(len(restored.sent_invoices), len(original.sent_invoices))
+            self.assertEqual(len(restored.payments_made), len(original.payments_made))
+            self.assertEqual(len(restored.open_invoices), len(original.open_invoices))
+            self.assertAlmostEqual(restored.balance_sheet.cash, original.balance_sheet.cash, places=6)
+            self.assertAlmostEqual(restored.balance_sheet.accounts_payable,
+                                   original.balance_sheet.accounts_payable, places=6)
+
+    def test_restore_round_trip(self):
+        businesses, rng = self.build()
+        start_simulation(businesses, 60, verbose=False, rng=rng, start_date=self.start_date)
+        path = self.path.format(day=60)
+        save_checkpoint(path, businesses, 60, self.start_date, rng)
+
+        checkpoint = load_checkpoint(path)
+        self.assertEqual(checkpoint.day, 60)
+        self.assertEqual(checkpoint.start_date, self.start_date)
+        self.assertEqual(checkpoint.rng().random(), rng.random())
+        restored = checkpoint.restore()
+        for original, copy in zip(businesses, restored):
+            self.assertEqual([i.id for i in copy.received_invoices], [i.id for i in original.received_invoices])
+            self.assertEqual(sorted(i.id for i in copy.open_invoices), sorted(i.id for i in original.open_invoices))
+            self.assertEqual(copy.attributes.max_payment_delay, original.attributes.max_payment_delay)
+            for customer, restored_customer in zip(original.customer_list, copy.customer_list):
+                self.assertEqual(copy.attributes.customer_averages[restored_customer],
+                                 original.attributes.customer_averages[customer])
+            for payment in original.payments_made:
+                copied = copy.get_payment(payment_id=payment.id)
+                self.assertAlmostEqual(copied.amount, payment.amount)
+                self.assertEqual([i.id for i in copied.invoices], [i.id for i in payment.invoices])
+
+    def test_fork_branches_are_independent(self):
+        businesses, rng = self.build()
+        start_simulation(businesses, 30, verbose=False, rng=rng, start_date=self.start_date)
+        path = self.path.format(day=30)
+        save_checkpoint(path, businesses, 30, self.start_date, rng, include_history=False)
+
+        (first, first_rng), (second, second_rng) = fork(path, [1, 2])
+        self.assertIsNot(first[0], second[0])
+        self.assertNotEqual(first_rng.random(), second_rng.random())
+        self.assertEqual(sum(len(b.sent_invoices) for b in first), sum(len(b.open_invoices) for b in businesses))
+        first[0].attributes.on_time_payment_percentage = 0
+        self.assertNotEqual(second[0].attributes.on_time_payment_percentage, 0)
+
+if __name__ == '__main__':
+    unittest.main()
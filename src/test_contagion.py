@@ -0,0 +1,96 @@
+import unittest
+import random
+import numpy as np
+from models import EPOCH, Business, BusinessAttributes
+from main import build_businesses, connect_businesses, process_payments, start_simulation
+from contagion import ContagionHook, available_assets, clearing_vector, propagate_defaults
+
+class TestContagion(unittest.TestCase):
+    def setUp(self):
+        self.businesses = []
+        for i in range(3):
+            attributes = BusinessAttributes(invoices_per_year=365, customer_averages={},
+                                            on_time_payment_percentage=80, max_payment_delay=30)
+            self.businesses.append(Business(id=i, name=f"Business {i + 1}", attributes=attributes))
+        self.due_date = EPOCH.toordinal() + 30
+
+    def invoice(self, issuer, recipient, average):
+        issuer, recipient = self.businesses[issuer], self.businesses[recipient]
+        issuer.add_customer(recipient)
+        issuer.attributes.set_customer_average(recipient, average)
+        return issuer.issue_invoice(recipient, self.due_date, random.Random(0))
+
+    def test_clearing_vector_fixed_point(self):
+        # 0 owes 1 and 2 10 each, 1 owes 2 10; 0 has 10 in cash, 1 has nothing
+        payments, obligations, _ = clearing_vector(np.array([0, 0, 1]), np.array([1, 2, 2]),
+                                                   np.array([10.0, 10.0, 10.0]), np.array([10.0, 0.0, 0.0]))
+        np.testing.assert_allclose(obligations, [20, 10, 0])
+        np.testing.assert_allclose(payments, [10, 5, 0])
+
+    def test_default_cascades_down_a_chain(self):
+        # 0 owes 1 and 1 owes 2 the same amount; only 0 cannot pay on its own
+        first = self.invoice(1, 0, 1000)
+        second = self.invoice(2, 1, 1000)
+        self.businesses[0].balance_sheet.update_cash(first.amount / 4)
+        result = propagate_defaults(self.businesses, due_by=self.due_date)
+
+        self.assertEqual(result.failed, self.businesses[:2])
+        self.assertEqual(result.fundamental, [self.businesses[0]])
+        self.assertEqual(result.contagious, [self.businesses[1]])
+        self.assertAlmostEqual(result.recovery_rates[self.businesses[0]], 0.25)
+        self.assertAlmostEqual(result.recovery_rates[self.businesses[1]], 0.25)
+        self.assertAlmostEqual(first.outstanding_balance, first.amount / 4)
+        self.assertAlmostEqual(result.write_downs, 0.75 * (first.amount + second.amount))
+        self.assertAlmostEqual(self.businesses[2].balance_sheet.accounts_receivable, second.amount / 4)
+        self.assertAlmostEqual(self.businesses[0].balance_sheet.accounts_payable, first.amount / 4)
+        self.assertFalse(self.businesses[2].failed)
+
+        # Failed businesses are not assessed again
+        self.assertEqual(propagate_defaults(self.businesses).failed, [])
+
+        # and pay nothing more: their written-down invoices stay open
+        process_payments(self.businesses, self.due_date, verbose=False, rng=random.Random(0))
+        self.assertEqual(self.businesses[0].payments_made, [])
+        self.assertAlmostEqual(first.outstanding_balance, first.amount / 4)
+
+    def test_credit_line_keeps_a_solvent_business_trading(self):
+        # As in the chain above, but 1 has a credit line covering what it owes 2
+        first = self.invoice(1, 0, 1000)
+        second = self.invoice(2, 1, 1000)
+        self.businesses[0].balance_sheet.update_cash(first.amount / 4)
+        credit_limit = np.array([0.0, second.amount, 0.0])
+        np.testing.assert_allclose(available_assets(self.businesses, credit_limit),
+                                   [first.amount / 4, second.amount, 0.0])
+        result = propagate_defaults(self.businesses, due_by=self.due_date, credit_limit=credit_limit)
+
+        self.assertEqual(result.failed, [self.businesses[0]])
+        self.assertEqual(result.contagious, [])
+        self.assertFalse(self.businesses[1].failed)
+        self.assertAlmostEqual(second.outstanding_balance, second.amount)
+
+        # Credit already used, as debt or overdraft, no longer counts
+        self.businesses[1].balance_sheet.update_debt(second.amount / 2)
+        self.businesses[2].balance_sheet.update_cash(-100)
+        np.testing.assert_allclose(available_assets(self.businesses, credit_limit)[1:], [second.amount / 2, 0.0])
+
+    def test_hook_keeps_balance_sheets_consistent(self):
+        rng = random.Random(3)
+        businesses = build_businesses(['A3', 'B4', 'C2', 'D1', 'E5', 'F3'] * 2)
+        connect_businesses(businesses, rng=rng)
+        contagion = ContagionHook(interval=7)
+        start_simulation(businesses, 180, verbose=False, rng=rng, hooks=[contagion])
+
+        summary = contagion.summary()
+        self.assertEqual(summary['rounds'], 180 // 7)
+        self.assertEqual(summary['failed'], sum(b.failed for b in businesses))
+        self.assertAlmostEqual(sum(b.balance_sheet.cash for b in businesses), 0.0, places=3)
+        self.assertAlmostEqual(sum(b.balance_sheet.accounts_receivable for b in businesses),
+                               sum(b.balance_sheet.accounts_payable for b in businesses), places=3)
+        # Failed businesses stop invoicing: nothing they sent falls due after the payment terms
+        for day, result in contagion.results:
+            for business in result.failed:
+                last_due = EPOCH.toordinal() + day + 30
+                self.assertTrue(all(invoice.due_date <= last_due for invoice in business.sent_invoices))
+
+if __name__ == '__main__':
+    unittest.main()
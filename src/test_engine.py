@@ -0,0 +1,72 @@
+import unittest
+import random
+import numpy as np
+from models import EPOCH, Business, BusinessAttributes
+from engine import VectorizedEngine
+from main import issue_invoices, process_payments
+
+def build_network(num_businesses, invoices_per_year, on_time_payment_percentage=100, max_payment_delay=0):
+    businesses = []
+    for i in range(num_businesses):
+        attributes = BusinessAttributes(
+            invoices_per_year=invoices_per_year,
+            customer_averages={},
+            on_time_payment_percentage=on_time_payment_percentage,
+            max_payment_delay=max_payment_delay
+        )
+        businesses.append(Business(id=i, name=f"Business {i + 1}", attributes=attributes))
+    for i, business in enumerate(businesses):
+        for customer in businesses[i + 1:]:
+            business.add_customer(customer)
+            business.attributes.set_customer_average(customer, 1000 * (i + 1))
+    return businesses
+
+class TestVectorizedEngine(unittest.TestCase):
+    def test_balance_sheets_stay_consistent(self):
+        businesses = build_network(5, invoices_per_year=365, on_time_payment_percentage=70, max_payment_delay=30)
+        engine = VectorizedEngine(businesses, rng=np.random.default_rng(1))
+        for day in range(1, 91):
+            engine.step(day)
+
+        sheets = engine.balance_sheets()
+        self.assertAlmostEqual(sheets['cash'].sum(), 0.0, places=6)
+        self.assertAlmostEqual(sheets['accounts_receivable'].sum(), sheets['accounts_payable'].sum(), places=6)
+        self.assertAlmostEqual(sheets['accounts_receivable'].sum(), engine.invoice_outstanding.sum(), places=6)
+        self.assertEqual(engine.invoices_issued, engine.payments_made + engine.num_open_invoices)
+
+    def test_matches_object_model_when_deterministic(self):
+        # Every edge invoices every day and every invoice is paid on its due date,
+        # so both engines must agree on invoice and payment counts and on the
+        # balance-sheet identities regardless of the drawn amounts.
+        num_days = 45
+        object_businesses = build_network(4, invoices_per_year=365 * 3)
+        vector_businesses = build_network(4, invoices_per_year=365 * 3)
+        num_edges = sum(len(b.customer_list) for b in object_businesses)
+
+        rng = random.Random(7)
+        start = EPOCH.toordinal()
+        for day in range(1, num_days + 1):
+            simulation_day = start + day
+            issue_invoices(object_businesses, simulation_day, rng)
+            process_payments(object_businesses, simulation_day, verbose=False, rng=rng)
+
+        engine = VectorizedEngine(vector_businesses, rng=np.random.default_rng(7))
+        for day in range(1, num_days + 1):
+            engine.step(day)
+        engine.sync_balance_sheets()
+
+        object_invoices = sum(len(b.sent_invoices) for b in object_businesses)
+        object_open = sum(1 for b in object_businesses for i in b.sent_invoices if i.status != 'paid')
+        self.assertEqual(object_invoices, num_edges * num_days)
+        self.assertEqual(engine.invoices_issued, object_invoices)
+        self.assertEqual(engine.num_open_invoices, object_open)
+
+        for businesses in (object_businesses, vector_businesses):
+            self.assertAlmostEqual(sum(b.balance_sheet.cash for b in businesses), 0.0, places=4)
+            # The first business only sells and the last one only buys
+            self.assertEqual(businesses[0].balance_sheet.accounts_payable, 0)
+            self.assertEqual(businesses[-1].balance_sheet.accounts_receivable, 0)
+            self.assertGreater(businesses[0].balance_sheet.cash, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import contextlib
+from main import build_businesses, connect_businesses, start_simulation
+from events import FileEventSink
+
+class TestEventSinks(unittest.TestCase):
+    def run_simulation(self, **kwargs):
+        rng = random.Random(3)
+        businesses = build_businesses(['D3', 'B4', 'F2', 'A5'])
+        connect_businesses(businesses, rng=rng)
+        start_simulation(businesses, 90, rng=rng, **kwargs)
+        return businesses
+
+    def test_file_sink_records_every_event(self):
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'run')
+            businesses = self.run_simulation(verbose=False, sink=FileEventSink(prefix, format='csv', buffer_size=7))
+
+            with open(prefix + '.events.csv') as f:
+                events = list(csv.DictReader(f))
+            issued = [e for e in events if e['event'] == 'invoice_issued']
+            payments = [e for e in events if e['event'] == 'payment']
+            self.assertEqual(len(issued), sum(len(b.sent_invoices) for b in businesses))
+            self.assertEqual(len(payments), sum(len(b.payments_made) for b in businesses))
+
+            with open(prefix + '.snapshots.csv') as f:
+                snapshots = list(csv.DictReader(f))
+            self.assertEqual(len(snapshots), 90 * len(businesses))
+            self.assertAlmostEqual(float(snapshots[-1]['cash']), businesses[-1].balance_sheet.cash)
+
+    def test_ndjson_format_and_quiet_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'run')
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.run_simulation(verbose=False, sink=FileEventSink(prefix, snapshot_interval=0))
+            self.assertEqual(output.getvalue(), '')
+            self.assertFalse(os.path.exists(prefix + '.snapshots.ndjson'))
+            with open(prefix + '.events.ndjson') as f:
+                first = json.loads(f.readline())
+            self.assertEqual(first['event'], 'invoice_issued')
+
+if __name__ == '__main__':
+    unittest.main()
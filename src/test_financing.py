@@ -0,0 +1,103 @@
+import unittest
+import random
+from models import EPOCH, Business, BusinessAttributes
+from main import build_businesses, connect_businesses, start_simulation
+from financing import DAYS_PER_YEAR, FinancingHook
+
+class TestFinancing(unittest.TestCase):
+    def setUp(self):
+        self.businesses = []
+        for i in range(3):
+            attributes = BusinessAttributes(invoices_per_year=365, customer_averages={},
+                                            on_time_payment_percentage=80, max_payment_delay=30)
+            self.businesses.append(Business(id=i, name=f"Business {i + 1}", attributes=attributes))
+        self.day = EPOCH.toordinal()
+
+    def invoice(self, issuer, recipient, average):
+        issuer, recipient = self.businesses[issuer], self.businesses[recipient]
+        issuer.add_customer(recipient)
+        issuer.attributes.set_customer_average(recipient, average)
+        return issuer.issue_invoice(recipient, self.day + 30, random.Random(0))
+
+    def test_credit_line_draws_and_repays(self):
+        first, second, third = (business.balance_sheet for business in self.businesses)
+        first.update_cash(-1000)
+        second.update_cash(-1000)
+        second.update_accounts_receivable(500)
+        third.update_cash(-5000)
+        financing = FinancingHook(credit_limit=[2000, 2000, 2000], borrowing_base=None, credit_rate=0.1,
+                                  overdraft_rate=0.365)
+        financing(1, self.day, self.businesses)
+
+        self.assertAlmostEqual(first.cash, 0.0)
+        self.assertAlmostEqual(first.debt, 1000)
+        self.assertAlmostEqual(third.debt, 2000)
+        self.assertAlmostEqual(third.cash, -3000 * 1.001)  # Overdraft interest on the rest
+        self.assertAlmostEqual(financing.totals['drawn'], 4000)
+
+        # Interest accrues on the debt, and surplus cash repays it
+        first.update_cash(1500)
+        financing(2, self.day, self.businesses)
+        self.assertAlmostEqual(financing.totals['interest'], 4000 * 0.1 / DAYS_PER_YEAR)
+        self.assertAlmostEqual(first.debt, 0.0)
+        self.assertAlmostEqual(first.cash, 500 - 1000 * 0.1 / DAYS_PER_YEAR)
+
+        # A borrowing base limits the line to a share of receivables
+        second.debt = 0.0
+        second.cash = -1000.0
+        FinancingHook(credit_limit=2000, borrowing_base=0.5, overdraft_rate=0)(3, self.day, self.businesses)
+        self.assertAlmostEqual(second.debt, 250)
+        self.assertAlmostEqual(second.cash, -750)
+
+    def test_factoring_with_recourse(self):
+        sold = self.invoice(0, 1, 1000)
+        seller, payer = self.businesses[0], self.businesses[1]
+        seller.balance_sheet.update_cash(-100)
+        financing = FinancingHook(factoring_discount=0.05, overdraft_rate=0)
+        financing(1, self.day, self.businesses)
+
+        self.assertAlmostEqual(seller.balance_sheet.cash, -100 + 0.95 * sold.amount)
+        self.assertAlmostEqual(seller.balance_sheet.accounts_receivable, 0.0)
+        self.assertAlmostEqual(financing.totals['factoring_fees'], 0.05 * sold.amount)
+        self.assertEqual(financing.summary()['factored_open'], sold.amount)
+
+        # The payment on the sold invoice is passed on to the factor
+        payer.issue_payment([sold], sold.outstanding_balance)
+        financing(2, self.day, self.businesses)
+        self.assertAlmostEqual(seller.balance_sheet.cash, -100 + 0.95 * sold.amount)
+        self.assertAlmostEqual(seller.balance_sheet.accounts_receivable, 0.0)
+        self.assertEqual(financing.summary()['factored_open'], 0)
+
+    def test_factoring_sells_open_invoices_due_last(self):
+        seller = self.businesses[0]
+        paid = self.invoice(0, 1, 1000)
+        self.businesses[1].issue_payment([paid], paid.amount)
+        owed_to_other = self.invoice(2, 1, 1000)
+        # Issued first but due last, so it goes before the newer invoice
+        late = seller.issue_invoice(self.businesses[1], self.day + 40, random.Random(0))
+        early = self.invoice(0, 2, 1000)
+        seller.balance_sheet.update_cash(-paid.amount - 100)  # Covered by the latest invoice alone
+        financing = FinancingHook(factoring_discount=0.05, overdraft_rate=0)
+        financing(1, self.day, self.businesses)
+
+        self.assertEqual(financing.totals['invoices_factored'], 1)
+        self.assertEqual([invoice for invoice, _ in financing._factored.values()], [late])
+        self.assertNotIn(early.id, financing._factored)
+        self.assertNotIn(owed_to_other.id, financing._factored)
+
+    def test_run_keeps_debt_consistent(self):
+        rng = random.Random(8)
+        businesses = build_businesses(['F3', 'E4', 'A5', 'D2', 'B3', 'C1'] * 2)
+        connect_businesses(businesses, rng=rng)
+        financing = FinancingHook(credit_limit=20_000, factoring_discount=0.03)
+        start_simulation(businesses, 120, verbose=False, rng=rng, hooks=[financing])
+
+        totals = financing.totals
+        self.assertGreater(totals['drawn'], 0)
+        self.assertAlmostEqual(sum(b.balance_sheet.debt for b in businesses),
+                               totals['drawn'] - totals['repaid'] + totals['interest'], places=4)
+        for business in businesses:
+            self.assertLessEqual(business.balance_sheet.debt, 20_000 * (1 + 0.08 * 120 / DAYS_PER_YEAR))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from models import EPOCH, Business, BusinessAttributes
+from ledger import Ledger, LedgerInvoice, RowList
+
+class TestLedger(unittest.TestCase):
+    def setUp(self):
+        self.ledger = Ledger(capacity=2)
+        self.attributes = BusinessAttributes(
+            invoices_per_year=365,
+            customer_averages={},
+            on_time_payment_percentage=80,
+            max_payment_delay=30
+        )
+        self.business_a = Business(id=1, name='Business A', attributes=self.attributes, ledger=self.ledger)
+        self.business_b = Business(id=2, name='Business B', attributes=self.attributes, ledger=self.ledger)
+        self.attributes.set_customer_average(self.business_b, 2000)
+        self.business_a.add_customer(self.business_b)
+        self.due_date = EPOCH.toordinal() + 30
+
+    def test_invoice_proxy_api(self):
+        invoice = self.business_a.issue_invoice(self.business_b, self.due_date)
+        self.assertIsInstance(invoice, LedgerInvoice)
+        self.assertIs(invoice.issuer, self.business_a)
+        self.assertIs(invoice.recipient, self.business_b)
+        self.assertEqual(invoice.due_date, self.due_date)
+        self.assertEqual(invoice.outstanding_balance, invoice.amount)
+        self.assertEqual(invoice.status, 'issued')
+        self.assertIsNone(invoice.paid_date)
+        self.assertEqual(self.ledger.invoice(invoice.id), invoice)
+        self.assertEqual(self.business_a.get_sent_invoice(invoice_id=invoice.id), invoice)
+        self.assertEqual(self.business_b.get_received_invoice(invoice_id=invoice.id), invoice)
+        self.assertIsNone(self.business_b.get_sent_invoice(invoice_id=invoice.id))
+        self.assertEqual(self.business_b.get_received_invoice(issuer_id=self.business_a.id), [invoice])
+
+    def test_payments_update_columns(self):
+        invoices = [self.business_a.issue_invoice(self.business_b, self.due_date) for _ in range(5)]
+        total = sum(invoice.amount for invoice in invoices)
+        payment_date = self.due_date + 1
+        for invoice in invoices[:2]:
+            self.business_b.issue_payment([invoice], invoice.amount, payment_date)
+        payment = self.business_b.payments_made[0]
+
+        self.assertEqual(payment.invoices, invoices[:1])
+        self.assertEqual(payment.payment_date, payment_date)
+        self.assertEqual(invoices[0].payments, [payment])
+        for invoice in invoices[:2]:
+            self.assertEqual(invoice.status, 'paid')
+            self.assertEqual(invoice.paid_date, payment_date)
+        self.assertEqual(len(self.business_b.open_invoices), 3)
+        self.assertAlmostEqual(self.business_a.balance_sheet.cash, invoices[0].amount + invoices[1].amount)
+        self.assertAlmostEqual(self.business_a.balance_sheet.accounts_receivable,
+                               total - invoices[0].amount - invoices[1].amount)
+        self.assertEqual(self.ledger.invoices.size, 5)
+        self.assertEqual(payment.payee_amounts, {1: invoices[0].amount})
+
+    def test_lists_keep_rows_and_payments_are_chained_per_invoice(self):
+        invoices = [self.business_a.issue_invoice(self.business_b, self.due_date) for _ in range(3)]
+        self.assertIsInstance(self.business_a.sent_invoices, RowList)
+        self.assertEqual(list(self.business_a.sent_invoices), invoices)
+        self.assertEqual(list(reversed(self.business_b.received_invoices)), invoices[::-1])
+        self.assertIn(invoices[1], self.business_b.received_invoices)
+
+        # Two partial payments of the first invoice, the second shared with the third invoice
+        first = self.business_b.issue_payment([invoices[0]], invoices[0].amount / 2, self.due_date)
+        second = self.business_b.issue_payment([invoices[2], invoices[0]], invoices[0].amount + invoices[2].amount,
+                                               self.due_date + 1)
+        self.assertEqual(invoices[0].payments, [first, second])
+        self.assertEqual(invoices[1].payments, [])
+        self.assertEqual(invoices[2].payments, [second])
+        self.assertEqual(self.business_b.payments_made, [first, second])
+        self.assertEqual(self.business_b.get_payment(invoice_id=invoices[0].id), first)
+        self.assertEqual(self.business_b.get_payment(invoice_id=invoices[2].id), second)
+        self.assertEqual(self.business_b.get_payment(payment_id=second.id), second)
+        self.assertIsNone(self.business_a.get_payment(payment_id=second.id))
+        self.assertEqual(self.business_b.get_payment(payee_id=self.business_a.id), [first, second])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import os
+import random
+import tempfile
+import numpy as np
+from main import start_simulation
+from metrics import MetricsRecorder
+from test_engine import build_network
+
+class TestMetricsRecorder(unittest.TestCase):
+    def test_records_every_day(self):
+        businesses = build_network(4, invoices_per_year=365 * 3)
+        metrics = MetricsRecorder(businesses, 45)
+        start_simulation(businesses, 45, verbose=False, rng=random.Random(1), sink=metrics)
+
+        # Every edge invoices every day and on-time payers pay on the due date
+        num_edges = sum(len(b.customer_list) for b in businesses)
+        np.testing.assert_array_equal(metrics.invoices_issued, num_edges)
+        np.testing.assert_array_equal(metrics.invoices_paid, [0] * 30 + [num_edges] * 15)
+        np.testing.assert_array_equal(metrics.invoices_overdue, 0)
+        self.assertEqual(metrics.cash.shape, (45, 4))
+        np.testing.assert_allclose(metrics.cash[-1], [b.balance_sheet.cash for b in businesses])
+        np.testing.assert_allclose(metrics.accounts_receivable.sum(axis=1), metrics.accounts_payable.sum(axis=1))
+        # 30 days of sales are outstanding once the first invoices fall due
+        self.assertAlmostEqual(metrics.dso[-1], 30.0)
+
+    def test_defaults_counted_once_and_saved(self):
+        businesses = build_network(3, invoices_per_year=365 * 2, on_time_payment_percentage=0, max_payment_delay=10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.npz')
+            metrics = MetricsRecorder(businesses, 100, path=path)
+            start_simulation(businesses, 100, verbose=False, rng=random.Random(2), sink=metrics)
+            with np.load(path) as saved:
+                np.testing.assert_array_equal(saved['invoices_defaulted'], metrics.invoices_defaulted)
+                np.testing.assert_array_equal(saved['debt'], metrics.debt)
+                self.assertEqual(saved['cash'].shape, (100, 3))
+
+        # Nothing is paid; each invoice defaults once, 41 days after it was issued
+        self.assertEqual(metrics.invoices_paid.sum(), 0)
+        np.testing.assert_array_equal(metrics.invoices_defaulted[41:], metrics.invoices_issued[:59])
+        self.assertEqual(metrics.invoices_defaulted[:41].sum(), 0)
+        self.assertEqual(metrics.invoices_overdue[-1], metrics.invoices_issued[:69].sum())
+
+if __name__ == '__main__':
+    unittest.main()
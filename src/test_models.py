@@ -2,7 +2,7 @@
 import unittest
 import datetime
 import logging
-from models import Business, BusinessAttributes, Invoice
+from models import EPOCH, Business, BusinessAttributes, Invoice, to_date, to_day
 
 class TestBusinessModel(unittest.TestCase):
     def setUp(self):
@@ -28,7 +28,7 @@ class TestBusinessModel(unittest.TestCase):
 
     def test_issue_invoice(self):
         self.business_a.add_customer(self.business_b)
-        due_date = datetime.datetime.now() + datetime.timedelta(days=30)
+        due_date = EPOCH.toordinal() + 30
         self.business_a.issue_invoice(self.business_b, due_date)
         self.assertEqual(len(self.business_a.sent_invoices), 1)
         self.assertEqual(len(self.business_b.received_invoices), 1)
@@ -59,7 +59,7 @@ class TestBusinessModel(unittest.TestCase):
     def test_invoice_and_payment_tracking(self):
         # Simulate issuing an invoice and making a payment
         self.business_a.add_customer(self.business_b)
-        due_date = datetime.datetime.now() + datetime.timedelta(days=30)
+        due_date = EPOCH.toordinal() + 30
         invoice = self.business_a.issue_invoice(self.business_b, due_date)
         self.business_b.issue_payment([invoice], invoice.amount)
         
@@ -71,5 +71,106 @@ class TestBusinessModel(unittest.TestCase):
         self.assertIn(invoice, self.business_b.received_invoices, "Invoice should be in the receiver's received invoices list")
         self.assertTrue(invoice.status=="paid", "Invoice should be marked as paid")
 
+    def test_partial_and_excess_payment(self):
+        business_c = Business(id=3, name='Business C', attributes=self.attributes)
+        self.business_a.add_customer(self.business_b)
+        business_c.add_customer(self.business_b)
+        due_date = EPOCH.toordinal() + 30
+        first = self.business_a.issue_invoice(self.business_b, due_date)
+        second = business_c.issue_invoice(self.business_b, due_date)
+        total = first.amount + second.amount
+
+        # Half the total pays half of each invoice
+        self.business_b.issue_payment([first, second], total / 2)
+        self.assertEqual((first.status, second.status), ('partially_paid', 'partially_paid'))
+        self.assertAlmostEqual(self.business_a.balance_sheet.accounts_receivable, first.outstanding_balance)
+        self.assertAlmostEqual(self.business_b.balance_sheet.accounts_payable, total / 2)
+
+        # Paying more than is owed only moves what is owed
+        payment = self.business_b.issue_payment([first, second], total, distribution_percentages=[50, 50])
+        self.assertEqual((first.status, second.status), ('paid', 'paid'))
+        self.assertAlmostEqual(payment.amount, total / 2)
+        self.assertAlmostEqual(self.business_b.balance_sheet.cash, -total)
+        self.assertAlmostEqual(self.business_b.balance_sheet.accounts_payable, 0)
+        self.assertAlmostEqual(self.business_a.balance_sheet.cash + business_c.balance_sheet.cash, total)
+
+    def test_day_ordinals(self):
+        self.assertEqual(to_day(EPOCH), EPOCH.toordinal())
+        self.assertEqual(to_date(to_day(EPOCH) + 31), datetime.date(2024, 2, 1))
+        self.assertEqual(to_day(42), 42)
+        self.assertIsNone(to_date(None))
+
+        # Dates are plain day numbers, unrelated to the machine's clock
+        self.business_a.add_customer(self.business_b)
+        invoice = self.business_a.issue_invoice(self.business_b, 100)
+        self.business_b.issue_payment([invoice], invoice.amount, 95)
+        self.assertEqual((invoice.due_date, invoice.paid_date), (100, 95))
+
+    def test_open_invoice_book(self):
+        self.business_a.add_customer(self.business_b)
+        today = EPOCH.toordinal()
+        later = self.business_a.issue_invoice(self.business_b, today + 30)
+        sooner = self.business_a.issue_invoice(self.business_b, today + 10)
+        book = self.business_b.open_invoices
+        self.assertEqual(len(book), 2)
+        self.assertEqual(book.due_invoices(today + 9), [])
+        self.assertEqual(book.due_invoices(today + 10), [sooner])
+        self.assertEqual(book.due_invoices(today + 45), [sooner, later])
+
+        # Paying an invoice removes it from the book
+        self.business_b.issue_payment([sooner], sooner.amount)
+        self.assertNotIn(sooner, book)
+        self.assertEqual(book.due_invoices(today + 45), [later])
+        self.assertEqual(len(self.business_a.open_invoices), 0)
+
+    def test_lookup_indexes(self):
+        self.business_a.add_customer(self.business_b)
+        self.business_a.add_customer(self.business_b)
+        self.assertEqual(self.business_a.customer_list, [self.business_b])
+        self.assertIs(self.business_a.get_customer(customer_id=2), self.business_b)
+        self.assertIs(self.business_a.get_customer(name='Business B'), self.business_b)
+
+        due_date = EPOCH.toordinal() + 30
+        first = self.business_a.issue_invoice(self.business_b, due_date)
+        second = self.business_a.issue_invoice(self.business_b, due_date)
+        self.assertIs(self.business_a.get_sent_invoice(invoice_id=second.id), second)
+        self.assertEqual(self.business_a.get_sent_invoice(recipient_id=2), [first, second])
+        self.assertIs(self.business_b.get_received_invoice(invoice_id=first.id), first)
+        self.assertEqual(self.business_b.get_received_invoice(issuer_id=1), [first, second])
+
+        self.business_b.issue_payment([first, second], first.amount + second.amount)
+        payment = self.business_b.payments_made[0]
+        self.assertIs(self.business_b.get_payment(payment_id=payment.id), payment)
+        self.assertIs(self.business_b.get_payment(invoice_id=second.id), payment)
+        self.assertEqual(self.business_b.get_payment(payee_id=1), [payment])
+
+    def test_bulk_payment(self):
+        business_c = Business(id=3, name='Business C', attributes=self.attributes)
+        self.business_a.add_customer(self.business_b)
+        business_c.add_customer(self.business_b)
+        due_date = EPOCH.toordinal() + 30
+        invoices = [issuer.issue_invoice(self.business_b, due_date) for issuer in [self.business_a, business_c] * 200]
+        from_a = sum(invoice.amount for invoice in invoices[::2])
+        from_c = sum(invoice.amount for invoice in invoices[1::2])
+
+        payment = self.business_b.issue_payment(invoices, from_a + from_c)
+        self.assertEqual(set(payment.payee_amounts), {1, 3})
+        # Paying the invoices' total settles every one of them
+        self.assertTrue(all(invoice.status == 'paid' for invoice in invoices))
+        self.assertEqual(len(self.business_b.open_invoices), 0)
+        self.assertAlmostEqual(payment.payee_amounts[1], from_a)
+        self.assertAlmostEqual(payment.payee_amounts[3], from_c)
+        self.assertAlmostEqual(self.business_b.balance_sheet.cash, -(from_a + from_c))
+        self.assertAlmostEqual(self.business_b.balance_sheet.accounts_payable, 0)
+        self.assertAlmostEqual(self.business_a.balance_sheet.cash, from_a)
+        self.assertAlmostEqual(self.business_a.balance_sheet.accounts_receivable, 0)
+        self.assertAlmostEqual(business_c.balance_sheet.cash, from_c)
+        self.assertAlmostEqual(business_c.balance_sheet.accounts_receivable, 0)
+        businesses = [self.business_a, self.business_b, business_c]
+        self.assertAlmostEqual(sum(b.balance_sheet.cash for b in businesses), 0, places=6)
+        self.assertEqual(self.business_b.get_payment(payee_id=3), [payment])
+        with self.assertRaises(ValueError):
+            self.business_b.issue_payment(invoices, 1, distribution_percentages=[100])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
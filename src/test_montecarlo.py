@@ -0,0 +1,57 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+import numpy as np
+import batch
+from montecarlo import main, replicate_seeds, run_replicate, run_replicates
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.config = {**json.loads(json.dumps(batch.DEFAULT_CONFIG)), 'businesses': 6, 'presets': ['F3', 'C3'],
+                       'days': 60, 'seed': 2}
+
+    def assert_results_equal(self, first, second):
+        self.assertEqual(sorted(first), sorted(second))
+        for key in first:
+            np.testing.assert_array_equal(first[key], second[key], err_msg=key)
+
+    def test_same_seed_reproduces_the_replicates(self):
+        first = run_replicates(self.config, 3, seed=7, processes=1)
+        self.assertEqual(first['cash'].shape, (3, 6))
+        self.assertEqual(first['default_rate'].shape, (3,))
+        self.assert_results_equal(run_replicates(self.config, 3, seed=7, processes=1), first)
+        # Worker processes run the same replicates as a single process
+        self.assert_results_equal(run_replicates(self.config, 3, seed=7, processes=2), first)
+
+    def test_replicates_are_independent(self):
+        results = run_replicates(self.config, 4, seed=7, processes=1)
+        self.assertEqual(len(set(results['seed'].tolist())), 4)
+        self.assertEqual(len({tuple(cash) for cash in results['cash'].tolist()}), 4)
+        # A replicate's outcome depends only on its own seed, not on how many runs there are
+        fewer = run_replicates(self.config, 2, seed=7, processes=1)
+        np.testing.assert_array_equal(fewer['cash'], results['cash'][:2])
+        np.testing.assert_array_equal(fewer['seed'], results['seed'][:2])
+        self.assertNotEqual(replicate_seeds(8, 2), replicate_seeds(7, 2))
+
+        seed = int(results['seed'][1])
+        replicate = run_replicate(self.config, seed)
+        np.testing.assert_array_equal(replicate['cash'], results['cash'][1])
+        self.assertEqual(replicate['invoices_issued'], results['invoices_issued'][1])
+
+    def test_saved_output_matches_the_runs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, 'run.json')
+            output = os.path.join(directory, 'replicates.npz')
+            with open(config_path, 'w') as f:
+                json.dump(self.config, f)
+            with contextlib.redirect_stdout(io.StringIO()):
+                main(['--config', config_path, '--runs', '3', '--seed', '5', '--processes', '1',
+                      '--output', output])
+            with np.load(output) as saved:
+                self.assert_results_equal(dict(saved), run_replicates(self.config, 3, seed=5, processes=1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import random
+import numpy as np
+from models import EPOCH, Business, BusinessAttributes
+from main import build_businesses, connect_businesses, start_simulation
+from events import EventSink
+from contagion import propagate_defaults
+from netting import ClearingHook, clear, settlement_transfers
+
+class ClearedInvoices(EventSink):
+    def __init__(self):
+        self.cleared = []
+
+    def invoice_cleared(self, simulation_day, invoice, amount):
+        self.cleared.append((simulation_day, invoice, amount))
+
+class TestNetting(unittest.TestCase):
+    def setUp(self):
+        self.businesses = []
+        for i in range(3):
+            attributes = BusinessAttributes(invoices_per_year=365, customer_averages={},
+                                            on_time_payment_percentage=80, max_payment_delay=30)
+            self.businesses.append(Business(id=i, name=f"Business {i + 1}", attributes=attributes))
+        self.due_date = EPOCH.toordinal() + 30
+
+    def invoice(self, issuer, recipient, average):
+        issuer, recipient = self.businesses[issuer], self.businesses[recipient]
+        issuer.add_customer(recipient)
+        issuer.attributes.set_customer_average(recipient, average)
+        return issuer.issue_invoice(recipient, self.due_date, random.Random(0))
+
+    def test_cycle_clears_without_cash(self):
+        # The same rng seed draws the same relative variation, so all three amounts are equal
+        invoices = [self.invoice(0, 1, 1000), self.invoice(1, 2, 1000), self.invoice(2, 0, 1000)]
+        result = clear(self.businesses, simulation_day=self.due_date)
+
+        self.assertEqual(result.invoices_cleared, 3)
+        self.assertAlmostEqual(result.multilateral_net, 0.0, places=6)
+        self.assertAlmostEqual(result.savings, 1.0)
+        self.assertEqual(result.transfers, [])
+        for business, invoice in zip(self.businesses, invoices):
+            self.assertEqual(invoice.status, 'paid')
+            self.assertEqual(invoice.paid_date, self.due_date)
+            self.assertEqual(len(business.open_invoices), 0)
+            self.assertAlmostEqual(business.balance_sheet.cash, 0.0, places=6)
+            self.assertAlmostEqual(business.balance_sheet.accounts_receivable, 0.0, places=6)
+            self.assertAlmostEqual(business.balance_sheet.accounts_payable, 0.0, places=6)
+
+    def test_net_positions_settle_with_few_transfers(self):
+        first = self.invoice(0, 1, 3000)
+        second = self.invoice(1, 2, 1000)
+        later = self.due_date + 1
+        result = clear(self.businesses, due_by=self.due_date)
+
+        self.assertAlmostEqual(result.gross, first.amount + second.amount)
+        self.assertAlmostEqual(result.multilateral_net, first.amount)
+        self.assertEqual(len(result.transfers), 2)
+        self.assertAlmostEqual(self.businesses[0].balance_sheet.cash, first.amount)
+        self.assertAlmostEqual(self.businesses[1].balance_sheet.cash, second.amount - first.amount)
+        self.assertAlmostEqual(self.businesses[2].balance_sheet.cash, -second.amount)
+        self.assertEqual(clear(self.businesses, due_by=later).invoices_cleared, 0)
+
+        positions = np.random.default_rng(1).normal(size=1000)
+        positions -= positions.mean()
+        payers, payees, amounts = settlement_transfers(positions)
+        self.assertLessEqual(len(amounts), 999)
+        settled = np.bincount(payees, weights=amounts, minlength=1000) - np.bincount(payers, weights=amounts,
+                                                                                      minlength=1000)
+        np.testing.assert_allclose(settled, positions, atol=1e-9)
+
+    def test_failed_businesses_are_not_cleared(self):
+        # 0 owes 1, and 1 and 2 owe each other; 0 cannot pay and fails
+        owed_by_failed = self.invoice(1, 0, 1000)
+        between_solvent = [self.invoice(2, 1, 1000), self.invoice(1, 2, 1000)]
+        self.businesses[0].balance_sheet.update_cash(owed_by_failed.amount / 4)
+        self.assertEqual(propagate_defaults(self.businesses, due_by=self.due_date).failed, [self.businesses[0]])
+        written_down = owed_by_failed.outstanding_balance
+        cash = self.businesses[0].balance_sheet.cash
+
+        result = clear(self.businesses, due_by=self.due_date, simulation_day=self.due_date)
+        self.assertEqual(result.invoices_cleared, 2)
+        self.assertTrue(all(invoice.status == 'paid' for invoice in between_solvent))
+        self.assertEqual(owed_by_failed.status, 'issued')
+        self.assertAlmostEqual(owed_by_failed.outstanding_balance, written_down)
+        self.assertEqual(self.businesses[0].balance_sheet.cash, cash)
+        self.assertIn(owed_by_failed, self.businesses[0].open_invoices)
+
+    def test_clearing_hook_keeps_accounts_balanced(self):
+        rng = random.Random(4)
+        businesses = build_businesses(['A1', 'B2', 'C3', 'D4', 'E5', 'F1'] * 2)
+        connect_businesses(businesses, rng=rng)
+        sink = ClearedInvoices()
+        clearing = ClearingHook(interval=7, sink=sink)
+        start_simulation(businesses, 90, verbose=False, rng=rng, hooks=[clearing])
+
+        summary = clearing.summary()
+        self.assertEqual(summary['rounds'], 12)
+        self.assertGreater(summary['invoices_cleared'], 0)
+        self.assertLessEqual(summary['multilateral_net'], summary['bilateral_net'] + 1e-6)
+        self.assertAlmostEqual(sum(b.balance_sheet.cash for b in businesses), 0.0, places=3)
+        self.assertAlmostEqual(sum(b.balance_sheet.accounts_receivable for b in businesses),
+                               sum(b.balance_sheet.accounts_payable for b in businesses), places=3)
+
+        # Only invoices due by the clearing day are cleared, and the sink sees every settlement
+        self.assertEqual(len(sink.cleared), summary['invoices_cleared'])
+        self.assertAlmostEqual(sum(amount for _, _, amount in sink.cleared), summary['gross'], places=6)
+        for simulation_day, invoice, amount in sink.cleared:
+            self.assertLessEqual(invoice.due_date, simulation_day)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import os
+import random
+import tempfile
+from contagion import ContagionHook
+from events import combine_sinks
+from main import build_businesses, connect_businesses, start_simulation
+from netting import ClearingHook
+from network import EDGE_METRICS, IncrementalNetworkGraph, NetworkRenderer, calculate_edge_weight, sample_nodes
+
+class TestIncrementalNetworkGraph(unittest.TestCase):
+    def test_matches_full_recomputation(self):
+        rng = random.Random(11)
+        businesses = build_businesses(['C3', 'B4', 'E2', 'A3', 'D5'])
+        connect_businesses(businesses, rng=rng)
+        start_simulation(businesses, 20, verbose=False, rng=rng)
+
+        # Attached mid-run: starts from the existing invoices and payments
+        tracker = IncrementalNetworkGraph(businesses)
+        start_simulation(businesses, 60, verbose=False, rng=rng, sink=tracker)
+        self.assertGreater(tracker.refresh(), 0)
+        self.assertEqual(tracker.refresh(), 0)
+
+        for business in businesses:
+            self.assertEqual(tracker.graph.nodes[business]['size'], business.balance_sheet.cash)
+            for customer in business.customer_list:
+                for metric in EDGE_METRICS:
+                    self.assertAlmostEqual(tracker.edge_weight(business, customer, metric),
+                                           calculate_edge_weight(business, customer, metric), places=6)
+                self.assertAlmostEqual(tracker.graph.edges[business, customer]['weight'],
+                                       calculate_edge_weight(business, customer, 'outstanding_invoices'), places=6)
+
+    def test_follows_invoices_changed_by_hooks(self):
+        rng = random.Random(3)
+        businesses = build_businesses(['A3', 'B4', 'C2', 'D1', 'E5', 'F3'] * 2)
+        connect_businesses(businesses, rng=rng)
+        tracker = IncrementalNetworkGraph(businesses)
+        renderer = NetworkRenderer(businesses, 'unused-{day}.png', interval=1000, background=False)
+        # The graph is told about clearings, the renderer is not; neither hears of contagion's write-downs
+        hooks = [ContagionHook(interval=5), ClearingHook(interval=7, sink=tracker)]
+        start_simulation(businesses, 120, verbose=False, rng=rng, hooks=hooks, sink=combine_sinks(tracker, renderer))
+        tracker.refresh()
+        self.assertGreater(hooks[0].summary()['write_downs'], 0)
+        self.assertGreater(hooks[1].summary()['invoices_cleared'], 0)
+
+        for business in businesses:
+            self.assertEqual(tracker.graph.nodes[business]['size'], business.balance_sheet.cash)
+            for customer in business.customer_list:
+                expected = calculate_edge_weight(business, customer, 'outstanding_invoices')
+                self.assertAlmostEqual(tracker.graph.edges[business, customer]['weight'], expected, places=6)
+                self.assertAlmostEqual(renderer._outstanding[renderer._edges[business, customer]], expected,
+                                       places=6)
+        self.assertGreaterEqual(renderer._outstanding.min(), 0)
+
+class TestNetworkRenderer(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(4)
+        self.businesses = build_businesses(['C3', 'B4', 'E2', 'A3', 'D5', 'F1'])
+        connect_businesses(self.businesses, rng=self.rng)
+
+    def test_writes_daily_frames(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pattern = os.path.join(directory, 'day-{day:03d}.png')
+            renderer = NetworkRenderer(self.businesses, pattern, interval=5, relayout_interval=2, background=False)
+            start_simulation(self.businesses, 20, verbose=False, rng=self.rng, sink=renderer)
+            self.assertEqual(sorted(os.listdir(directory)), [f"day-{day:03d}.png" for day in (5, 10, 15, 20)])
+            for business, customer in renderer._edges:
+                self.assertAlmostEqual(renderer._outstanding[renderer._edges[business, customer]],
+                                       calculate_edge_weight(business, customer, 'outstanding_invoices'), places=6)
+
+    def test_background_animation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.gif')
+            start_simulation(self.businesses, 10, verbose=False, rng=self.rng, visualize=path)
+            self.assertGreater(os.path.getsize(path), 0)
+
+    def test_large_networks_are_sampled(self):
+        businesses = build_businesses(['A3'] * 40)
+        for business in businesses[1:10]:
+            business.add_customer(businesses[0])
+        sampled = sample_nodes(businesses, 5)
+        self.assertEqual(len(sampled), 5)
+        self.assertIs(sampled[0], businesses[0])
+        self.assertEqual(sample_nodes(businesses[:3], 5), businesses[:3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import os
+import random
+import tempfile
+from main import build_businesses, connect_businesses, start_simulation
+from profiling import RunProfiler, compare_profiles, load_profile
+
+class TestRunProfiler(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(6)
+        self.businesses = build_businesses(['C3', 'B4', 'E2', 'A3', 'D5'])
+        connect_businesses(self.businesses, rng=self.rng)
+
+    def test_breakdown_per_day_and_phase(self):
+        profiler = RunProfiler(memory=True, memory_interval=10)
+        start_simulation(self.businesses, 50, verbose=False, rng=self.rng, profiler=profiler)
+
+        self.assertEqual([row['day'] for row in profiler.rows], list(range(1, 51)))
+        self.assertEqual(profiler.phases(), ['issue_invoices', 'process_payments', 'hooks', 'sinks', 'console'])
+        summary = profiler.summary()
+        self.assertEqual(summary['invoices_issued'], sum(len(b.sent_invoices) for b in self.businesses))
+        self.assertEqual(summary['invoices_paid'], sum(len(b.payments_made) for b in self.businesses))
+        self.assertAlmostEqual(sum(phase['share'] for phase in summary['phases'].values()), 1.0)
+        self.assertEqual(sum('memory_peak' in row for row in profiler.rows), 5)
+        self.assertGreater(summary['memory_peak'], 0)
+
+    def test_save_and_compare(self):
+        profilers = []
+        for engine in ('object', 'event'):
+            profiler = RunProfiler()
+            start_simulation(self.businesses, 20, engine=engine, verbose=False, rng=self.rng, profiler=profiler)
+            profilers.append(profiler)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'object.json')
+            profilers[0].save(path)
+            profilers[1].save(os.path.join(directory, 'event.csv'))
+            baseline = load_profile(path)
+        self.assertEqual(baseline['days'], 20)
+
+        comparison = compare_profiles(baseline, profilers[1].summary())
+        self.assertEqual(comparison['issue_invoices'][1], 0.0)
+        self.assertIsNone(comparison['event_scheduler'][2])
+        self.assertAlmostEqual(comparison['total'][0], baseline['seconds'])
+
+if __name__ == '__main__':
+    unittest.main()
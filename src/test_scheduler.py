@@ -0,0 +1,73 @@
+import unittest
+import random
+from events import EventSink
+from main import build_businesses, connect_businesses, start_simulation
+from models import EPOCH
+from scheduler import EventScheduler
+from test_engine import build_network
+
+class EventCounter(EventSink):
+    def __init__(self):
+        self.issued = []
+        self.paid = []
+        self.defaulted = []
+
+    def invoice_issued(self, simulation_day, invoice):
+        self.issued.append((simulation_day, invoice))
+
+    def payment_made(self, simulation_day, payment, days_overdue):
+        self.paid.append((simulation_day, payment, days_overdue))
+
+    def invoice_defaulted(self, simulation_day, invoice, days_overdue):
+        self.defaulted.append((simulation_day, invoice, days_overdue))
+
+class TestEventScheduler(unittest.TestCase):
+    def setUp(self):
+        self.start_day = EPOCH.toordinal()
+
+    def test_on_time_payers_pay_on_due_date(self):
+        businesses = build_network(4, invoices_per_year=365 * 3)
+        sink = EventCounter()
+        scheduler = EventScheduler(businesses, self.start_day, rng=random.Random(1), sink=sink)
+        scheduler.advance(45)
+
+        # Every edge invoices every day, as in the deterministic object-engine test
+        num_edges = sum(len(b.customer_list) for b in businesses)
+        self.assertEqual(len(sink.issued), num_edges * 45)
+        self.assertEqual(len(sink.paid), num_edges * 15)
+        for simulation_day, payment, days_overdue in sink.paid:
+            self.assertEqual(days_overdue, 0)
+            self.assertEqual(payment.invoices[0].due_date, simulation_day)
+        self.assertAlmostEqual(sum(b.balance_sheet.cash for b in businesses), 0.0, places=4)
+        self.assertEqual(sink.defaulted, [])
+
+    def test_non_payers_default_once(self):
+        businesses = build_network(3, invoices_per_year=36.5, on_time_payment_percentage=0, max_payment_delay=10)
+        sink = EventCounter()
+        scheduler = EventScheduler(businesses, self.start_day, rng=random.Random(2), sink=sink)
+        scheduler.advance(200)
+
+        self.assertEqual(sink.paid, [])
+        defaulted = [invoice for _, invoice, _ in sink.defaulted]
+        self.assertEqual(len(defaulted), len(set(defaulted)))
+        self.assertEqual(len(defaulted), sum(1 for _, invoice in sink.issued if invoice.due_date <= self.start_day
+                                             + 200 - 11))
+        for _, _, days_overdue in sink.defaulted:
+            self.assertEqual(days_overdue, 11)
+
+    def test_issue_rate_matches_object_engine(self):
+        counts = {}
+        for engine in ('object', 'event'):
+            rng = random.Random(5)
+            businesses = build_businesses(['A3', 'B4', 'C2', 'D1', 'E5', 'F3'] * 3)
+            connect_businesses(businesses, rng=rng)
+            start_simulation(businesses, 365, engine=engine, verbose=False, rng=rng)
+            counts[engine] = (sum(len(b.sent_invoices) for b in businesses),
+                              sum(len(b.payments_made) for b in businesses))
+            self.assertAlmostEqual(sum(b.balance_sheet.cash for b in businesses), 0.0, places=3)
+        # The same expected number of invoices and payments, within sampling noise
+        for object_count, event_count in zip(counts['object'], counts['event']):
+            self.assertLess(abs(object_count - event_count), 0.1 * object_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+from main import build_businesses, connect_businesses, start_simulation
+from netting import ClearingHook
+from sqlstore import SQLiteSink, aging_report
+
+class TestSQLiteSink(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'run.db')
+        self.rng = random.Random(9)
+        self.businesses = build_businesses(['C3', 'B4', 'E2', 'A3', 'D5', 'F4'])
+        connect_businesses(self.businesses, rng=self.rng)
+        self.start_date = datetime.date.today()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_database_matches_objects(self):
+        start_simulation(self.businesses, 90, verbose=False, rng=self.rng, start_date=self.start_date,
+                         sink=SQLiteSink(self.path, snapshot_interval=30))
+        connection = sqlite3.connect(self.path)
+        invoices = {invoice.id: invoice for business in self.businesses for invoice in business.sent_invoices}
+        rows = connection.execute('SELECT id, outstanding_balance, status FROM invoices').fetchall()
+        self.assertEqual(len(rows), len(invoices))
+        for invoice_id, outstanding_balance, status in rows:
+            self.assertAlmostEqual(outstanding_balance, invoices[invoice_id].outstanding_balance)
+            self.assertEqual(status, invoices[invoice_id].status)
+        payments = sum(len(business.payments_made) for business in self.businesses)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM payments').fetchone()[0], payments)
+        self.assertEqual(connection.execute('SELECT COUNT(DISTINCT day) FROM balances').fetchone()[0], 3)
+
+        # The receivables aging adds up to the outstanding receivables
+        as_of = self.start_date + datetime.timedelta(days=90)
+        report = aging_report(connection, as_of, by='issuer')
+        for business in self.businesses:
+            total = sum(row[3] for row in report if row[0] == business.id)
+            self.assertAlmostEqual(total, business.balance_sheet.accounts_receivable, places=4)
+        self.assertEqual({row[1] for row in aging_report(connection, as_of)} - {'current', '1-30', '31-60', '61-90',
+                                                                                '90+'}, set())
+        connection.close()
+
+    def test_pruning_keeps_only_open_history(self):
+        clearing = ClearingHook(interval=10, horizon=0)
+        start_simulation(self.businesses, 120, verbose=False, rng=self.rng, start_date=self.start_date,
+                         hooks=[clearing], sink=SQLiteSink(self.path, prune_interval=30))
+        kept = [invoice for business in self.businesses for invoice in business.sent_invoices]
+        open_invoices = sum(len(business.open_invoices) for business in self.businesses)
+        self.assertEqual(sum(invoice.status not in ('paid', 'written_off') for invoice in kept), open_invoices)
+
+        # Everything, including invoices cleared without payment events, is in the database
+        connection = sqlite3.connect(self.path)
+        issued = connection.execute('SELECT COUNT(*) FROM invoices').fetchone()[0]
+        still_open = connection.execute(
+            "SELECT COUNT(*) FROM invoices WHERE status IN ('issued', 'partially_paid')").fetchone()[0]
+        connection.close()
+        self.assertGreater(issued, len(kept))
+        self.assertEqual(still_open, open_invoices)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+from sweep import config_key, expand_grid, preset_grid, run_cell, run_sweep
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.base = {'businesses': 6, 'days': 40, 'topology': {'kind': 'dense', 'max_customers': 3}}
+
+    def test_grid_and_keys(self):
+        self.assertEqual(preset_grid('AF', '3'), [['A3'], ['F3']])
+        cells = expand_grid(self.base, {'presets': preset_grid('AF', '3'), 'topology.max_customers': [2, 4]})
+        self.assertEqual(len(cells), 4)
+        values, config = cells[1]
+        self.assertEqual(values, {'presets': ['A3'], 'topology.max_customers': 4})
+        self.assertEqual(config['topology'], {'kind': 'dense', 'max_customers': 4})
+        self.assertEqual(self.base['topology']['max_customers'], 3)
+
+        reordered = dict(reversed(list(config.items())))
+        self.assertEqual(config_key(reordered), config_key(config))
+        self.assertEqual(config_key(dict(config, quiet=True)), config_key(config))
+        self.assertNotEqual(config_key(dict(config, seed=1)), config_key(config))
+
+    def test_rerun_computes_only_new_cells(self):
+        with tempfile.TemporaryDirectory() as directory:
+            axes = {'presets': [['A3'], ['F3']], 'seed': [1, 2]}
+            first = run_sweep(self.base, axes, cache_dir=directory, processes=1)
+            self.assertEqual([row['cached'] for row in first], [False] * 4)
+            self.assertEqual(len(os.listdir(directory)), 4)
+
+            axes['seed'].append(3)
+            second = run_sweep(self.base, axes, cache_dir=directory, processes=1)
+            self.assertEqual([row['cached'] for row in second], [True, True, False] * 2)
+            self.assertEqual(second[0]['invoices_issued'], first[0]['invoices_issued'])
+            self.assertEqual(second[0]['cash'], first[0]['cash'])
+            self.assertEqual(second[2]['seed'], 3)
+            self.assertEqual(len(os.listdir(directory)), 6)
+
+    def test_hook_axes_change_the_outcome(self):
+        with tempfile.TemporaryDirectory() as directory:
+            axes = {'contagion': [None, {'interval': 1}], 'financing.credit_limit': [0.0, 50000.0]}
+            base = dict(self.base, presets=['F3'], days=90)
+            rows = run_sweep(base, axes, cache_dir=directory, processes=1)
+            self.assertEqual(len({(row['cash'], row['debt'], row['failed']) for row in rows}), 4)
+            without_contagion, with_contagion = rows[0], rows[2]
+            self.assertNotIn('contagion_failed', without_contagion)
+            self.assertEqual(with_contagion['contagion_failed'], with_contagion['failed'])
+            self.assertGreater(with_contagion['failed'], 0)
+            self.assertEqual(rows[0]['debt'], 0)
+            self.assertGreater(rows[1]['financing_drawn'], 0)
+
+            with self.assertRaises(ValueError):
+                run_sweep(self.base, {'engine': ['vectorized']}, cache_dir=directory, processes=1)
+
+    def test_outputs_do_not_change_the_cell(self):
+        config = {**self.base, 'presets': ['C3'], 'days': 60, 'seed': 1}
+        plain = run_cell(config)
+        with tempfile.TemporaryDirectory() as directory:
+            # Pruning closed invoices from memory must not change what the cell reports
+            database = {'path': os.path.join(directory, 'run.db'), 'prune_interval': 10}
+            self.assertEqual(run_cell(dict(config, database=database)), plain)
+
+            # Each cell writes its events to its own files
+            events = {'prefix': os.path.join(directory, 'run'), 'format': 'csv', 'snapshot_interval': 0}
+            rows = run_sweep(dict(config, events=events), {'seed': [1, 2]}, cache_dir=os.path.join(directory, 'cache'),
+                             processes=1)
+            names = sorted(name for name in os.listdir(directory) if name.endswith('.events.csv'))
+            self.assertEqual(names, sorted(f"run-{row['key'][:16]}.events.csv" for row in rows))
+        self.assertGreater(plain['payments_made'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
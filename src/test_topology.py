@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+import topology
+from main import build_businesses, connect_businesses
+
+class TestTopology(unittest.TestCase):
+    def test_generators_produce_simple_graphs(self):
+        for kind, generator in topology.GENERATORS.items():
+            issuers, customers = generator(200, rng=np.random.default_rng(3))
+            self.assertEqual(len(issuers), len(customers), kind)
+            self.assertFalse(np.any(issuers == customers), kind)
+            self.assertEqual(len(np.unique(issuers * 200 + customers)), len(issuers), kind)
+            self.assertTrue(np.all((issuers >= 0) & (issuers < 200)), kind)
+
+    def test_dense_matches_original_setup_network(self):
+        businesses = build_businesses(['A1', 'C3', 'F5', 'B2', 'D4'])
+        connect_businesses(businesses)
+        for i, business in enumerate(businesses):
+            self.assertEqual(sorted(c.id for c in business.customer_list), list(range(i + 1, len(businesses))))
+            for customer in business.customer_list:
+                self.assertTrue(1_000 <= business.attributes.customer_averages[customer] <= 100_000)
+
+    def test_dense_max_customers(self):
+        issuers, _ = topology.dense(30, max_customers=4, rng=np.random.default_rng(1))
+        self.assertLessEqual(np.bincount(issuers).max(), 4)
+
+        # Each business gets max_customers distinct later businesses, or all of them if fewer
+        n = 50_000
+        issuers, customers = topology.dense(n, max_customers=6, rng=np.random.default_rng(2))
+        np.testing.assert_array_equal(np.bincount(issuers, minlength=n), np.minimum(n - 1 - np.arange(n), 6))
+        self.assertTrue(np.all(customers > issuers))
+        self.assertEqual(len(np.unique(issuers * n + customers)), len(issuers))
+
+    def test_connect_network_fills_customer_lists(self):
+        businesses = build_businesses(['A3'] * 500)
+        topology.connect_network(businesses, 'scale_free', rng=np.random.default_rng(5), edges_per_business=2)
+        self.assertEqual(sum(len(b.customer_list) for b in businesses), 2 * 498)
+        # Preferential attachment concentrates customers on a few suppliers
+        self.assertGreater(max(len(b.customer_list) for b in businesses), 20)
+
+if __name__ == '__main__':
+    unittest.main()
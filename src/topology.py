@@ -0,0 +1,196 @@
+import numpy as np
+
+def as_generator(rng=None):
+    """
+    Returns a numpy.random.Generator for rng, which may already be one, the
+    random module or a random.Random instance (seeded from it), or None.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        return np.random.default_rng()
+    return np.random.default_rng(rng.getrandbits(64))
+
+def _unique_edges(issuers, customers, num_businesses):
+    """Drops self-loops and duplicate edges, keeping the first occurrence of each."""
+    keep = issuers != customers
+    issuers, customers = issuers[keep], customers[keep]
+    _, first = np.unique(issuers * num_businesses + customers, return_index=True)
+    first.sort()
+    return issuers[first], customers[first]
+
+def _first_per_issuer(issuers, customers, max_customers, num_businesses):
+    """Keeps the first max_customers edges of each issuer, in the order given."""
+    by_issuer = np.argsort(issuers, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(np.bincount(issuers, minlength=num_businesses))[:-1]))
+    rank = np.empty(len(issuers), dtype=np.int64)
+    rank[by_issuer] = np.arange(len(issuers)) - starts[issuers[by_issuer]]
+    keep = rank < max_customers
+    return issuers[keep], customers[keep]
+
+def dense(num_businesses, max_customers=None, rng=None):
+    """
+    The original setup_network topology: every pair is connected once, from the
+    earlier business (supplier) to the later one (customer), in random order.
+
+    :param max_customers: Optional cap on customers per business. Each business
+                          then gets max_customers of the later businesses (all
+                          of them if fewer), picked uniformly, in O(edges) time
+                          and memory rather than O(num_businesses ** 2).
+    """
+    rng = as_generator(rng)
+    if max_customers is None:
+        issuers, customers = np.triu_indices(num_businesses, k=1)
+        order = rng.permutation(len(issuers))
+        return issuers[order].astype(np.int64), customers[order].astype(np.int64)
+
+    # Businesses with at most 2 * max_customers later ones: shuffle all their pairs and keep the first
+    # max_customers of each. The rest draw their customers at random, redrawing duplicates; as at least
+    # half of every draw is new, that takes a few rounds.
+    tail = min(num_businesses, 2 * max_customers + 1)
+    first_tail = num_businesses - tail
+    issuers, customers = np.triu_indices(tail, k=1)
+    order = rng.permutation(len(issuers))
+    tail_issuers, tail_customers = _first_per_issuer(issuers[order] + first_tail, customers[order] + first_tail,
+                                                     max_customers, num_businesses)
+
+    head = np.arange(first_tail, dtype=np.int64)
+    head_issuers = np.repeat(head, max_customers)
+    later = num_businesses - 1 - head_issuers
+    head_customers = np.empty(len(head_issuers), dtype=np.int64)
+    redraw = np.arange(len(head_issuers))
+    while len(redraw):
+        head_customers[redraw] = head_issuers[redraw] + 1 + rng.integers(0, later[redraw])
+        _, first = np.unique(head_issuers * num_businesses + head_customers, return_index=True)
+        duplicate = np.ones(len(head_issuers), dtype=bool)
+        duplicate[first] = False
+        redraw = np.flatnonzero(duplicate)
+
+    issuers = np.concatenate((head_issuers, tail_issuers.astype(np.int64)))
+    customers = np.concatenate((head_customers, tail_customers.astype(np.int64)))
+    order = rng.permutation(len(issuers))
+    return issuers[order], customers[order]
+
+def sparse_random(num_businesses, mean_customers=5, rng=None):
+    """Directed Erdős–Rényi style graph with about mean_customers customers per business."""
+    rng = as_generator(rng)
+    num_edges = int(round(num_businesses * mean_customers))
+    issuers = rng.integers(0, num_businesses, size=num_edges)
+    customers = rng.integers(0, num_businesses, size=num_edges)
+    return _unique_edges(issuers, customers, num_businesses)
+
+def scale_free(num_businesses, edges_per_business=2, rng=None):
+    """
+    Preferential attachment (Barabási–Albert): each new business becomes a customer
+    of edges_per_business existing businesses picked in proportion to their degree,
+    so a few suppliers end up with very many customers.
+    """
+    rng = as_generator(rng)
+    m = edges_per_business
+    if num_businesses <= m:
+        return dense(num_businesses, rng=rng)
+
+    num_edges = m * (num_businesses - m)
+    issuers = np.empty(num_edges, dtype=np.int64)
+    customers = np.empty(num_edges, dtype=np.int64)
+    # Every business appears here once per edge it has, so uniform picks are degree-weighted
+    repeated = np.empty(2 * num_edges, dtype=np.int64)
+    size = 0
+    draws = rng.random(2 * num_edges).tolist()
+    draw = 0
+
+    targets = list(range(m))
+    for k, new in enumerate(range(m, num_businesses)):
+        start = k * m
+        issuers[start:start + m] = targets
+        customers[start:start + m] = new
+        repeated[size:size + m] = targets
+        repeated[size + m:size + 2 * m] = new
+        size += 2 * m
+
+        chosen = set()
+        while len(chosen) < m:
+            if draw == len(draws):
+                draws = rng.random(2 * num_edges).tolist()
+                draw = 0
+            chosen.add(int(repeated[int(draws[draw] * size)]))
+            draw += 1
+        targets = list(chosen)
+    return issuers, customers
+
+def small_world(num_businesses, neighbors=4, rewire_probability=0.1, rng=None):
+    """
+    Watts–Strogatz: a ring where each business supplies its next neighbors // 2
+    businesses, with each edge's customer rewired at random with rewire_probability.
+    """
+    rng = as_generator(rng)
+    offsets = np.arange(1, neighbors // 2 + 1)
+    issuers = np.repeat(np.arange(num_businesses), len(offsets))
+    customers = (issuers + np.tile(offsets, num_businesses)) % num_businesses
+    rewire = rng.random(len(customers)) < rewire_probability
+    customers[rewire] = rng.integers(0, num_businesses, size=int(rewire.sum()))
+    return _unique_edges(issuers, customers, num_businesses)
+
+def tiered_supply_chain(num_businesses, tiers=3, customers_per_business=3, rng=None):
+    """
+    Splits businesses into consecutive tiers; each business in a tier supplies
+    customers_per_business random businesses in the next tier downstream.
+    """
+    rng = as_generator(rng)
+    tier_members = np.array_split(np.arange(num_businesses), tiers)
+    issuer_parts, customer_parts = [], []
+    for upstream, downstream in zip(tier_members, tier_members[1:]):
+        if len(upstream) == 0 or len(downstream) == 0:
+            continue
+        per_business = min(customers_per_business, len(downstream))
+        issuer_parts.append(np.repeat(upstream, per_business))
+        customer_parts.append(downstream[rng.integers(0, len(downstream), size=len(upstream) * per_business)])
+    if not issuer_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return _unique_edges(np.concatenate(issuer_parts), np.concatenate(customer_parts), num_businesses)
+
+GENERATORS = {
+    'dense': dense,
+    'sparse_random': sparse_random,
+    'scale_free': scale_free,
+    'small_world': small_world,
+    'tiered': tiered_supply_chain,
+}
+
+def invoice_averages(issuer_invoices_per_year, customer_invoices_per_year, rng=None):
+    """Vectorized main.adjust_invoice_amount for arrays of issuer and customer invoice volumes."""
+    rng = as_generator(rng)
+    base_amount = rng.integers(1_000, 10_001, size=len(issuer_invoices_per_year))
+    amounts = base_amount * (365 / issuer_invoices_per_year) * (customer_invoices_per_year / 365)
+    return np.clip(amounts, 1_000, 100_000)
+
+def connect(businesses, issuers, customers, rng=None):
+    """
+    Establishes the customer relationships given as aligned arrays of indexes into
+    businesses, filling customer_list and customer_averages one business at a time.
+    """
+    rng = as_generator(rng)
+    issuers = np.asarray(issuers, dtype=np.int64)
+    customers = np.asarray(customers, dtype=np.int64)
+    invoices_per_year = np.array([b.attributes.invoices_per_year for b in businesses], dtype=np.float64)
+    averages = invoice_averages(invoices_per_year[issuers], invoices_per_year[customers], rng)
+
+    order = np.argsort(issuers, kind='stable')
+    ends = np.cumsum(np.bincount(issuers, minlength=len(businesses)))
+    customers = customers[order].tolist()
+    averages = averages[order].tolist()
+    start = 0
+    for business, end in zip(businesses, ends.tolist()):
+        if end > start:
+            business_customers = [businesses[j] for j in customers[start:end]]
+            business.add_customers(business_customers)
+            business.attributes.set_customer_averages(business_customers, averages[start:end])
+        start = end
+
+def connect_network(businesses, kind='sparse_random', rng=None, **params):
+    """Generates a topology of the given kind over businesses and connects them."""
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown topology: {kind}")
+    rng = as_generator(rng)
+    issuers, customers = GENERATORS[kind](len(businesses), rng=rng, **params)
+    connect(businesses, issuers, customers, rng)